@@ -0,0 +1,133 @@
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, List, Sequence, Tuple
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = registry.histogram(
+    "ielts_inference_batch_size",
+    "Items per batched model call",
+    ("batcher",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+BATCH_WAIT_SECONDS = registry.histogram(
+    "ielts_inference_batch_wait_seconds",
+    "Time an item waited in the batching queue before its batch ran",
+    ("batcher",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+BATCH_RUN_SECONDS = registry.histogram(
+    "ielts_inference_batch_run_seconds",
+    "Model time per batched call",
+    ("batcher",),
+)
+
+
+class MicroBatcher:
+    """Collect single-item model calls from many threads and run them as batches.
+
+    Callers block in __call__ while a worker thread gathers items for up to
+    max_wait_ms (or until max_batch_size), calls batch_fn once per group of
+    compatible items and hands each caller its own result. Items only share
+    a batch when their group key matches (e.g. the same zero-shot labels).
+    The window is skipped when no other caller is waiting, so a lone request
+    pays no batching delay. With max_wait_ms <= 0 batching is off and calls
+    run inline.
+    """
+
+    def __init__(self, name: str, batch_fn: Callable[[List[Any], Hashable], Sequence[Any]],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+        # Threads currently blocked on a result from this batcher
+        self._callers = 0
+        self._callers_lock = threading.Lock()
+
+    def __call__(self, item: Any, group: Hashable = None) -> Any:
+        return self.map([item], group)[0]
+
+    def map(self, items: Sequence[Any], group: Hashable = None) -> List[Any]:
+        """Results for several items; one caller's items always share a batch"""
+        if not items:
+            return []
+        if self.max_wait <= 0:
+            return list(self.batch_fn(list(items), group))
+        futures = [Future() for _ in items]
+        self._ensure_worker()
+        with self._callers_lock:
+            self._callers += 1
+        try:
+            self._queue.put((list(items), group, futures, time.perf_counter()))
+            return [future.result() for future in futures]
+        finally:
+            with self._callers_lock:
+                self._callers -= 1
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=f"batcher-{self.name}", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            requests = [self._queue.get()]
+            size = len(requests[0][0])
+            # The first request opens a short window for others to join
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch_size:
+                try:
+                    request = self._queue.get_nowait()
+                except queue.Empty:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0 or not self._others_waiting(len(requests)):
+                        break
+                    try:
+                        request = self._queue.get(timeout=min(remaining, 0.0005))
+                    except queue.Empty:
+                        continue
+                requests.append(request)
+                size += len(request[0])
+            self._execute(requests)
+
+    def _others_waiting(self, queued_callers: int) -> bool:
+        """True while some blocked caller has not queued its request yet"""
+        with self._callers_lock:
+            return self._callers > queued_callers
+
+    def _execute(self, requests: List[tuple]) -> None:
+        started = time.perf_counter()
+        groups: "OrderedDict[Hashable, Tuple[List[Any], List[Future]]]" = OrderedDict()
+        for items, group, futures, enqueued in requests:
+            batch_items, batch_futures = groups.setdefault(group, ([], []))
+            batch_items.extend(items)
+            batch_futures.extend(futures)
+            BATCH_WAIT_SECONDS.observe(started - enqueued, batcher=self.name)
+
+        for group, (items, futures) in groups.items():
+            BATCH_SIZE.observe(len(items), batcher=self.name)
+            try:
+                with BATCH_RUN_SECONDS.time(batcher=self.name):
+                    results = self.batch_fn(items, group)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name} returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                logger.error(f"Batched {self.name} call failed: {e}")
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future, result in zip(futures, results):
+                future.set_result(result)
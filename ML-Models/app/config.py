@@ -0,0 +1,122 @@
+import os
+
+# Operational settings, overridable through the environment
+
+# Shared secret for admin-only features (request profiling, cache control).
+# Admin features are disabled when unset.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Request profiling
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.001"))  # seconds
+
+# Grading deadlines. A request's budget (its budget_ms field, else this
+# default; 0 disables) bounds the whole response; each analyzer also has its
+# own cap. Components that miss the deadline finish in the background.
+GRADING_BUDGET_MS = int(os.getenv("GRADING_BUDGET_MS", "0"))
+STAGE_TIMEOUTS_MS = {
+    "grammar": int(os.getenv("STAGE_TIMEOUT_GRAMMAR_MS", "15000")),
+    "lexical": int(os.getenv("STAGE_TIMEOUT_LEXICAL_MS", "10000")),
+    "coherence": int(os.getenv("STAGE_TIMEOUT_COHERENCE_MS", "10000")),
+    "task_achievement": int(os.getenv("STAGE_TIMEOUT_TASK_ACHIEVEMENT_MS", "30000")),
+}
+GRADING_WORKERS = int(os.getenv("GRADING_WORKERS", "8"))
+
+# Result cache: in-memory LRU entries (0 disables the cache entirely)
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+# Bump when scoring changes in a way the weights/engine fingerprint can't see
+SCORER_RELEASE = os.getenv("SCORER_RELEASE", "1")
+
+# Micro-batching of MiniLM encodes and zero-shot NLI across concurrent
+# requests: how long the first caller waits for company, and the batch cap.
+# A max wait of 0 turns batching off.
+INFERENCE_BATCH_MAX_WAIT_MS = float(os.getenv("INFERENCE_BATCH_MAX_WAIT_MS", "5"))
+INFERENCE_BATCH_MAX_SIZE = int(os.getenv("INFERENCE_BATCH_MAX_SIZE", "32"))
+
+# Shared model server (python -m app.model_server). When set, API workers
+# send spaCy / MiniLM / zero-shot work to this Unix socket instead of
+# loading the models themselves.
+MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET")
+MODEL_SERVER_TIMEOUT_S = float(os.getenv("MODEL_SERVER_TIMEOUT_S", "60"))
+
+# Durable grading queue (python -m app.worker). A worker that stops renewing
+# its lease for JOB_LEASE_SECONDS loses the job to another worker; failed
+# attempts are retried with exponential backoff from JOB_RETRY_DELAY_SECONDS.
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_DELAY_SECONDS = float(os.getenv("JOB_RETRY_DELAY_SECONDS", "10"))
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))
+WORKER_POLL_INTERVAL_S = float(os.getenv("WORKER_POLL_INTERVAL_S", "1.0"))
+
+# Analyzer scheduling between priority classes (interactive API requests,
+# bulk queue/rescoring work). Workers are shared in proportion to the
+# weights; reserved workers are only ever used by their own class.
+SCHEDULER_WEIGHTS = os.getenv("SCHEDULER_WEIGHTS", "interactive=4,bulk=1")
+SCHEDULER_RESERVED = os.getenv("SCHEDULER_RESERVED", "interactive=2")
+
+# Persist each graded submission's spaCy DocBin, LanguageTool matches,
+# embeddings (float16) and zero-shot outputs so it can be re-scored
+# without model inference (python -m app.rescore --from-signals)
+STORE_SIGNALS = os.getenv("STORE_SIGNALS", "1") == "1"
+
+# Paging for GET /api/submissions/{id}/grammar-errors
+GRAMMAR_ERRORS_PAGE_SIZE = int(os.getenv("GRAMMAR_ERRORS_PAGE_SIZE", "20"))
+GRAMMAR_ERRORS_MAX_PAGE_SIZE = int(os.getenv("GRAMMAR_ERRORS_MAX_PAGE_SIZE", "100"))
+
+# In-process spelling check (symmetric-delete index, memory-mapped). When the
+# index exists, or SPELLING_WORDLIST ('word count' lines) is set to build it
+# at startup, LanguageTool runs with its spelling rules disabled.
+SPELLING_INDEX_PATH = os.getenv("SPELLING_INDEX_PATH", "./spelling.idx")
+SPELLING_WORDLIST = os.getenv("SPELLING_WORDLIST")
+SPELLING_MAX_EDIT = int(os.getenv("SPELLING_MAX_EDIT", "2"))
+SPELLING_PREFIX_LENGTH = int(os.getenv("SPELLING_PREFIX_LENGTH", "7"))
+
+# LanguageTool rule profile: all / strict / ielts-core (see grammar_service.RULE_PROFILES)
+GRAMMAR_RULE_PROFILE = os.getenv("GRAMMAR_RULE_PROFILE", "all")
+
+# LanguageTool backends per locale. The default locale starts with the API;
+# others start on first use, stay warm while they carry LANGUAGETOOL_WARM_SHARE
+# of the checks in the traffic window, and are closed after being idle for
+# LANGUAGETOOL_IDLE_SECONDS otherwise.
+GRAMMAR_DEFAULT_LOCALE = os.getenv("GRAMMAR_DEFAULT_LOCALE", "en-GB")
+LANGUAGETOOL_IDLE_SECONDS = float(os.getenv("LANGUAGETOOL_IDLE_SECONDS", "600"))
+LANGUAGETOOL_WARM_SHARE = float(os.getenv("LANGUAGETOOL_WARM_SHARE", "0.1"))
+LANGUAGETOOL_TRAFFIC_WINDOW_S = float(os.getenv("LANGUAGETOOL_TRAFFIC_WINDOW_S", "3600"))
+LANGUAGETOOL_MAX_INSTANCES = int(os.getenv("LANGUAGETOOL_MAX_INSTANCES", "3"))
+
+# Long essays are scored in overlapping word windows instead of being
+# truncated at the model's sequence limit (MiniLM: 256 word pieces,
+# zero-shot NLI: 1024). Window scores are pooled with mean or max.
+ENCODE_WINDOW_WORDS = int(os.getenv("ENCODE_WINDOW_WORDS", "160"))
+ZERO_SHOT_WINDOW_WORDS = int(os.getenv("ZERO_SHOT_WINDOW_WORDS", "400"))
+WINDOW_OVERLAP = float(os.getenv("WINDOW_OVERLAP", "0.25"))  # share of a window repeated in the next
+WINDOW_POOLING_SIMILARITY = os.getenv("WINDOW_POOLING_SIMILARITY", "mean")  # essay vs question
+WINDOW_POOLING_ELEMENTS = os.getenv("WINDOW_POOLING_ELEMENTS", "max")  # task elements (e.g. a conclusion)
+
+# Input size. Submissions above MAX_TEXT_CHARS are rejected; in fast mode the
+# lexical and coherence analyzers process texts above STREAM_THRESHOLD_CHARS
+# one paragraph chunk (at most STREAM_CHUNK_CHARS) at a time, so their memory
+# is bounded by the chunk instead of the essay. The parser-based modes always
+# parse the whole essay, since a cut can change the parse.
+MAX_TEXT_CHARS = int(os.getenv("MAX_TEXT_CHARS", "100000"))
+STREAM_THRESHOLD_CHARS = int(os.getenv("STREAM_THRESHOLD_CHARS", "20000"))
+STREAM_CHUNK_CHARS = int(os.getenv("STREAM_CHUNK_CHARS", "5000"))
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "8"))
+
+# Near-duplicate detection. Every stored essay's MinHash signature (over
+# SIMILARITY_SHINGLE_WORDS-word shingles) is banded into an LSH index that is
+# appended to SIMILARITY_INDEX_PATH as rows are graded. Submissions report up to
+# SIMILARITY_TOP_K earlier essays at or above SIMILARITY_MIN_JACCARD; rows
+# written by other processes (the queue worker) are picked up every
+# SIMILARITY_SYNC_SECONDS. Each sync re-reads the last SIMILARITY_SYNC_OVERLAP
+# ids below the newest one it saw, so a row whose id was allocated earlier but
+# committed later is still indexed.
+SIMILARITY_ENABLED = os.getenv("SIMILARITY_ENABLED", "1") == "1"
+SIMILARITY_INDEX_PATH = os.getenv("SIMILARITY_INDEX_PATH", "./similarity.idx")
+SIMILARITY_NUM_PERM = int(os.getenv("SIMILARITY_NUM_PERM", "128"))
+SIMILARITY_BANDS = int(os.getenv("SIMILARITY_BANDS", "32"))  # 4 rows each: candidates from about Jaccard 0.4
+SIMILARITY_SHINGLE_WORDS = int(os.getenv("SIMILARITY_SHINGLE_WORDS", "5"))
+SIMILARITY_MIN_JACCARD = float(os.getenv("SIMILARITY_MIN_JACCARD", "0.5"))
+SIMILARITY_TOP_K = int(os.getenv("SIMILARITY_TOP_K", "5"))
+SIMILARITY_SYNC_SECONDS = float(os.getenv("SIMILARITY_SYNC_SECONDS", "30"))
+SIMILARITY_SYNC_OVERLAP = int(os.getenv("SIMILARITY_SYNC_OVERLAP", "1000"))
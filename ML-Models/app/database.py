@@ -16,4 +16,28 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def add_missing_columns(bind=engine):
+    """Add nullable columns (and their indexes) declared on the models but missing from existing tables.
+
+    create_all only creates tables, so databases created before a column was
+    added would otherwise fail on every query touching it.
+    """
+    from sqlalchemy import inspect, text
+
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    with bind.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in present and column.nullable:
+                    column_type = column.type.compile(dialect=bind.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+            indexed = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexed:
+                    index.create(connection)
@@ -0,0 +1,107 @@
+"""Savings from score-only grading (SubmissionCreate.include=[]).
+
+Runs every analyzer stage over the dataset essays twice, once for the full
+response and once for band scores only, and reports per-analyzer time,
+response size and band agreement (bands must not change).
+
+    python -m app.evaluatiuon.field_selection_benchmark --mode standard --limit 100
+    python -m app.evaluatiuon.field_selection_benchmark --include feedback
+"""
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .load_test import load_corpus, percentile
+from ..schemas.submission import SubmissionCreate
+from ..services.grading_pipeline import ANALYZERS, GradingPipeline
+
+RESULTS_DIR = Path(__file__).parent / 'benchmark_results'
+
+
+def run_include(pipeline, items: List[Dict[str, Any]], mode: str,
+                include: Optional[List[str]]) -> Dict[str, Dict[str, List[float]]]:
+    """Per-analyzer seconds, bands and JSON bytes for each essay under one include setting"""
+    runs = {name: {'seconds': [], 'scores': [], 'bytes': []} for name in ANALYZERS}
+    for item in items:
+        submission = SubmissionCreate(**item, mode=mode, include=include)
+        for name in ANALYZERS:
+            start = time.perf_counter()
+            analysis = pipeline._run_stage(name, submission, mode)
+            runs[name]['seconds'].append(time.perf_counter() - start)
+            runs[name]['scores'].append(GradingPipeline.component_score(name, analysis))
+            runs[name]['bytes'].append(len(json.dumps(analysis, default=str)))
+    return runs
+
+
+def compare(run: Dict[str, List[float]], reference: Dict[str, List[float]]) -> Dict[str, Any]:
+    """Timing and size against the full response, plus band agreement"""
+    mean, reference_mean = statistics.mean(run['seconds']), statistics.mean(reference['seconds'])
+    summary = {
+        'essays': len(run['seconds']),
+        'ms': {
+            'mean': mean * 1000,
+            'p50': percentile(run['seconds'], 50) * 1000,
+            'p95': percentile(run['seconds'], 95) * 1000,
+        },
+        'full_mean_ms': reference_mean * 1000,
+        'speedup': reference_mean / mean if mean else None,
+        'mean_bytes': statistics.mean(run['bytes']),
+        'full_mean_bytes': statistics.mean(reference['bytes']),
+    }
+    if 'scores' in run:
+        summary['same_band'] = sum(a == b for a, b in zip(run['scores'], reference['scores'])) / len(run['scores'])
+    return summary
+
+
+def benchmark_include(pipeline, items: List[Dict[str, Any]], mode: str,
+                      include: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """compare() per analyzer and for the four stages together"""
+    include = include or []
+    pipeline._run_stage(ANALYZERS[0], SubmissionCreate(**items[0], mode=mode), mode)  # warm-up
+    reference = run_include(pipeline, items, mode, None)
+    run = run_include(pipeline, items, mode, include)
+    results = {name: compare(run[name], reference[name]) for name in ANALYZERS}
+
+    def total(runs):
+        return {key: [sum(values) for values in zip(*(runs[name][key] for name in ANALYZERS))]
+                for key in ('seconds', 'bytes')}
+    results['total'] = compare(total(run), total(reference))
+    return results
+
+
+def print_report(results: Dict[str, Dict[str, Any]]) -> None:
+    print(f"{'analyzer':<17} {'full ms':>9} {'ms':>9} {'p95 ms':>9} {'speedup':>8} {'full KB':>8} {'KB':>7} {'same band':>10}")
+    for name, r in results.items():
+        same = f"{r['same_band']:>10.1%}" if 'same_band' in r else f"{'':>10}"
+        print(f"{name:<17} {r['full_mean_ms']:>9.1f} {r['ms']['mean']:>9.1f} {r['ms']['p95']:>9.1f} "
+              f"{r['speedup']:>7.2f}x {r['full_mean_bytes'] / 1024:>8.1f} {r['mean_bytes'] / 1024:>7.1f} {same}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Score-only grading benchmark')
+    parser.add_argument('--mode', default='full', choices=['fast', 'standard', 'full'])
+    parser.add_argument('--include', default='', help='Comma-separated sections to keep (default: scores only)')
+    parser.add_argument('--limit', type=int, default=50, help='Only use the first N essays')
+    parser.add_argument('--output', default=str(RESULTS_DIR / 'field_selection.json'), help='Where to write results')
+    args = parser.parse_args(argv)
+
+    items = [
+        {key: item[key] for key in ('text', 'task_type', 'question_number', 'question_desc')}
+        for item in load_corpus()
+    ][:args.limit]
+    include = [s.strip() for s in args.include.split(',') if s.strip()]
+    print(f"Grading {len(items)} essays in {args.mode} mode, full vs include={include}...")
+    results = benchmark_include(GradingPipeline.load(), items, args.mode, include)
+    print_report(results)
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump({'mode': args.mode, 'include': include, 'results': results}, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
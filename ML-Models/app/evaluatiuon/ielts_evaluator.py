@@ -6,16 +6,20 @@ from pathlib import Path
 import sys
 import os
 import json
+import time
 import logging
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score, confusion_matrix
 
-# Add parent directory to path to import the services
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# Add the ML-Models root to path so the services resolve as part of the app package
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from services.grammar_service import GrammarService
-from services.lexical_service import LexicalService
-from services.taskachievement_service import TaskAchievementService
-from services.CoherenceCohensionService import CoherenceCohesionService
+from app.services.grammar_service import GrammarService
+from app.services.lexical_service import LexicalService
+from app.services.taskachievement_service import TaskAchievementService
+from app.services.CoherenceCohensionService import CoherenceCohesionService
+from app.services.grading_pipeline import GRADING_MODES, MODE_ENGINES, SCORER_VERSION
+from app.evaluatiuon.load_test import git_commit
+from app.profiling import SamplingProfiler
 
 
 class IELTSEvaluator:
@@ -33,6 +37,9 @@ class IELTSEvaluator:
         }
         
         self.data_path = Path(__file__).parent.parent / 'data' / 'OriginalSet.csv'
+        if not self.data_path.exists():
+            # Fall back to the dataset shipped with the repo
+            self.data_path = Path(__file__).parent.parent / 'data' / 'ielts_writing_dataset.csv'
         
         self.df = pd.read_csv(self.data_path)
         self.df = self.df.dropna(subset=['Essay', 'Overall'])
@@ -66,23 +73,25 @@ class IELTSEvaluator:
         else:
             return obj
             
-    def calculate_combined_score(self, essay, question, task_type):
+    def calculate_combined_score(self, essay, question, task_type="argument", mode="full"):
         """Calculate the combined score using all services with weights."""
         try:
-            grammar_score = self.grammar_service.analyze_grammar(essay)
-            lexical_score = self.lexical_service.analyze_lexical(essay)
+            grammar_score = self.grammar_service.analyze_grammar(essay, mode=mode)
+            lexical_score = self.lexical_service.analyze_lexical(essay, mode=mode)
             
             task_result = self.task_achievement_service.analyze_task_achievement(
                 text=essay, 
                 task_type=task_type,
-                question_desc=question
+                question_desc=question,
+                mode=mode
             )
             task_score = task_result.get('band_score', 0)
             
-            coherence_score = self.coherence_service.analyze_coherence_cohesion(essay)
+            coherence_score = self.coherence_service.analyze_coherence_cohesion(essay, mode=mode)
             
             if isinstance(grammar_score, dict):
-                grammar_score = grammar_score.get('overall_score', 0)
+                # The grammar service reports its band under 'score'
+                grammar_score = grammar_score.get('score', grammar_score.get('overall_score', 0))
             if isinstance(lexical_score, dict):
                 lexical_score = lexical_score.get('overall_score', 0)
             if isinstance(coherence_score, dict):
@@ -119,6 +128,77 @@ class IELTSEvaluator:
         """Calculate percentage difference between actual and predicted scores."""
         return abs(actual - predicted) / actual * 100 if actual != 0 else 0
         
+    def _map_task_type(self, row):
+        tt = int(row.get('Task_Type', 1))
+        if tt == 1:
+            return "problem_solution"
+        elif tt == 2:
+            return "argument"
+        return "discussion"
+
+    def compare_modes(self, modes=GRADING_MODES, sample_size=None):
+        """Latency and accuracy (MAE against Overall) of each grading mode on the same essays."""
+        rows = self.df if sample_size is None else self.df.head(sample_size)
+        # Tied to the code it measured, so a committed report can be checked against its commit
+        report = {'samples': len(rows), 'commit': git_commit(), 'scorer_version': SCORER_VERSION, 'modes': {}}
+
+        for mode in modes:
+            # Warm up once so one-off lazy loads don't count against the first essay
+            first = rows.iloc[0]
+            self.calculate_combined_score(first['Essay'], first['Question'], self._map_task_type(first), mode)
+
+            latencies, actual, predicted = [], [], []
+            for _, row in rows.iterrows():
+                start = time.perf_counter()
+                score, _ = self.calculate_combined_score(row['Essay'], row['Question'], self._map_task_type(row), mode)
+                latencies.append(time.perf_counter() - start)
+                actual.append(float(row['Overall']))
+                predicted.append(self.round_to_nearest_half(score))
+
+            report['modes'][mode] = {
+                'engines': MODE_ENGINES[mode],
+                'latency_mean_ms': float(np.mean(latencies) * 1000),
+                'latency_p50_ms': float(np.percentile(latencies, 50) * 1000),
+                'latency_p95_ms': float(np.percentile(latencies, 95) * 1000),
+                'mae': float(mean_absolute_error(actual, predicted)),
+                'within_half_band_percent': float(np.mean(np.abs(np.array(actual) - np.array(predicted)) <= 0.5) * 100),
+            }
+            print(f"{mode:9s} mean={report['modes'][mode]['latency_mean_ms']:9.1f} ms  "
+                  f"MAE={report['modes'][mode]['mae']:.3f}")
+
+        if 'full' in report['modes']:
+            baseline = report['modes']['full']['latency_mean_ms']
+            for data in report['modes'].values():
+                data['speedup_vs_full'] = baseline / data['latency_mean_ms'] if data['latency_mean_ms'] else None
+
+        with open(self.output_dir / 'mode_report.json', 'w') as f:
+            json.dump(self._convert_to_serializable(report), f, indent=2)
+        with open(self.output_dir / 'grading_modes.md', 'w') as f:
+            f.write(self._mode_table(report))
+        return report
+
+    @staticmethod
+    def _mode_table(report):
+        """Markdown table of a compare_modes report"""
+        lines = [
+            f"# Grading modes ({report['samples']} essays)",
+            "",
+            f"Measured at commit `{report.get('commit') or 'unknown'}` (scorer `{report.get('scorer_version')}`) with",
+            f"`python app/evaluatiuon/ielts_evaluator.py --modes {','.join(report['modes'])} --sample-size {report['samples']}`.",
+            "",
+            "| Mode | Grammar | Lexical | Coherence | Task achievement | Mean ms | p95 ms | Speed-up | MAE | Within 0.5 band |",
+            "|---|---|---|---|---|---|---|---|---|---|",
+        ]
+        for mode, data in report['modes'].items():
+            engines = data['engines']
+            speedup = data.get('speedup_vs_full')
+            lines.append(
+                f"| {mode} | {engines['grammar']} | {engines['lexical']} | {engines['coherence']} | "
+                f"{engines['task_achievement']} | {data['latency_mean_ms']:.1f} | {data['latency_p95_ms']:.1f} | "
+                f"{f'{speedup:.1f}x' if speedup else '-'} | {data['mae']:.3f} | {data['within_half_band_percent']:.1f}% |"
+            )
+        return "\n".join(lines) + "\n"
+
     def run_benchmark(self, sample_size=None):
         """Run a comprehensive benchmark and generate reports."""
         if sample_size is None:
@@ -151,13 +231,7 @@ class IELTSEvaluator:
             question = row['Question']
             actual_score = float(row['Overall'])
             
-            tt = int(row.get('Task_Type', 1))
-            if tt == 1:
-                mapped_task_type = "problem_solution"
-            elif tt == 2:
-                mapped_task_type = "argument"
-            else:
-                mapped_task_type = "discussion"
+            mapped_task_type = self._map_task_type(row)
             
             # Get component actual scores if available
             if 'Range_Accuracy' in row and pd.notna(row['Range_Accuracy']):
@@ -554,11 +628,17 @@ def main():
     parser.add_argument('--evaluate', action='store_true', help='Evaluate a single essay')
     parser.add_argument('--essay-file', type=str, help='File containing the essay to evaluate')
     parser.add_argument('--question', type=str, help='Essay question or prompt')
+    parser.add_argument('--modes', type=str, default=None,
+                        help='Compare grading modes, e.g. fast,standard,full (latency + MAE report)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Run under the sampling profiler and save speedscope/collapsed stacks')
     
     args = parser.parse_args()
     
     evaluator = IELTSEvaluator()
     
+    profiler = SamplingProfiler().start() if args.profile else None
+    
     if args.test:
         evaluator.run_unit_tests()
     
@@ -566,6 +646,16 @@ def main():
         print(f"Running benchmark with {args.sample_size if args.sample_size else 'all'} samples...")
         evaluator.run_benchmark(args.sample_size)
     
+    if args.modes:
+        modes = [m.strip() for m in args.modes.split(',') if m.strip()]
+        unknown = set(modes) - set(GRADING_MODES)
+        if unknown:
+            print(f"Error: unknown modes {sorted(unknown)}; choose from {', '.join(GRADING_MODES)}")
+            return
+        print(f"Comparing grading modes {', '.join(modes)}...")
+        evaluator.compare_modes(modes, args.sample_size)
+        print(f"Mode report saved to {evaluator.output_dir / 'grading_modes.md'}")
+    
     if args.evaluate:
         if not args.essay_file or not args.question:
             print("Error: --essay-file and --question are required for evaluation")
@@ -580,7 +670,17 @@ def main():
         except FileNotFoundError:
             print(f"Error: Essay file not found: {args.essay_file}")
     
-    if not (args.test or args.benchmark or args.evaluate):
+    if profiler is not None:
+        profiler.stop()
+        saved = profiler.save(str(evaluator.output_dir / 'profiles'))
+        print(f"\nProfile saved ({profiler.sample_count} samples over {profiler.duration:.1f}s):")
+        print(f"  Speedscope: {saved['speedscope']}")
+        print(f"  Collapsed stacks: {saved['collapsed']}")
+        print("Top functions by self time:")
+        for entry in profiler.top_functions(10):
+            print(f"  {entry['self_seconds']:8.3f}s  {entry['function']}")
+    
+    if not (args.test or args.benchmark or args.evaluate or args.modes):
         parser.print_help()
 
 
@@ -0,0 +1,344 @@
+"""Corpus-replay load generator for the grading API.
+
+Replays essays/questions from the IELTS dataset (optionally length-scaled)
+against a running instance and reports throughput, latency percentiles,
+error rate and per-analyzer time scraped from /metrics.
+
+    python -m app.evaluatiuon.load_test --url http://localhost:8000 \\
+        --concurrency 8 --rate 4 --duration 60 --scales 0.5,1,2
+"""
+import argparse
+import csv
+import json
+import queue
+import random
+import re
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+DATA_PATH = Path(__file__).parent.parent / 'data' / 'ielts_writing_dataset.csv'
+RESULTS_DIR = Path(__file__).parent / 'benchmark_results' / 'loadtest'
+
+TASK_TYPES = {'1': 'problem_solution', '2': 'argument'}
+
+_SAMPLE_RE = re.compile(r'^(\w+)(?:\{(.*)\})?\s+(\S+)$')
+_LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def load_corpus(path: Path = DATA_PATH) -> List[Dict[str, Any]]:
+    """Read essays and questions from the dataset CSV"""
+    corpus = []
+    with open(path, encoding='utf-8') as f:
+        for idx, row in enumerate(csv.DictReader(f)):
+            essay = (row.get('Essay') or '').strip()
+            if not essay:
+                continue
+            corpus.append({
+                'text': essay,
+                'task_type': TASK_TYPES.get((row.get('Task_Type') or '').strip(), 'discussion'),
+                'question_number': idx,
+                'question_desc': (row.get('Question') or '').strip() or None,
+            })
+    return corpus
+
+
+def scale_text(text: str, factor: float) -> str:
+    """Synthesize a variant of roughly `factor` times the original word count"""
+    if factor == 1:
+        return text
+    paragraphs = [p for p in text.split('\n\n') if p.strip()] or [text]
+    words_wanted = max(1, int(len(text.split()) * factor))
+    out, words = [], 0
+    while words < words_wanted:
+        for paragraph in paragraphs:
+            out.append(paragraph)
+            words += len(paragraph.split())
+            if words >= words_wanted:
+                break
+    scaled = '\n\n'.join(out)
+    if factor < 1:
+        scaled = ' '.join(scaled.split(' ')[:words_wanted])
+    return scaled
+
+
+def build_payloads(corpus: List[Dict[str, Any]], scales: List[float]) -> List[Dict[str, Any]]:
+    payloads = []
+    for factor in scales:
+        for item in corpus:
+            payloads.append({**item, 'text': scale_text(item['text'], factor), '_scale': factor})
+    return payloads
+
+
+def parse_metrics(text: str) -> Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float]:
+    """Parse Prometheus text exposition into {(name, labels): value}"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        match = _SAMPLE_RE.match(line)
+        if not match:
+            continue
+        name, labels, value = match.groups()
+        label_items = tuple(sorted(_LABEL_RE.findall(labels or '')))
+        try:
+            samples[(name, label_items)] = float(value)
+        except ValueError:
+            continue
+    return samples
+
+
+def stage_deltas(before: Dict, after: Dict) -> Dict[str, Dict[str, float]]:
+    """Per-stage time spent during the run, from stage histogram sums/counts"""
+    stages = {}
+    for (name, labels), value in after.items():
+        if name != 'ielts_stage_duration_seconds_sum':
+            continue
+        label_map = dict(labels)
+        key = f"{label_map.get('service')}.{label_map.get('stage')}"
+        count_key = ('ielts_stage_duration_seconds_count', labels)
+        total = value - before.get((name, labels), 0.0)
+        count = after.get(count_key, 0.0) - before.get(count_key, 0.0)
+        if count > 0:
+            stages[key] = {
+                'calls': int(count),
+                'total_seconds': round(total, 4),
+                'mean_seconds': round(total / count, 4),
+            }
+    return dict(sorted(stages.items(), key=lambda kv: kv[1]['total_seconds'], reverse=True))
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class LoadTester:
+    def __init__(self, url: str, payloads: List[Dict[str, Any]], concurrency: int = 4,
+                 rate: float = 0.0, duration: Optional[float] = None,
+                 total_requests: Optional[int] = None, timeout: float = 120.0, seed: int = 0):
+        self.url = url.rstrip('/')
+        self.payloads = payloads
+        self.concurrency = concurrency
+        self.rate = rate
+        self.duration = duration
+        self.total_requests = total_requests
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        self.results: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def _get(self, path: str) -> str:
+        with urllib.request.urlopen(self.url + path, timeout=self.timeout) as resp:
+            return resp.read().decode('utf-8')
+
+    def scrape_metrics(self) -> Dict:
+        try:
+            return parse_metrics(self._get('/metrics'))
+        except (urllib.error.URLError, OSError):
+            return {}
+
+    def _send(self, payload: Dict[str, Any], scheduled_at: float) -> None:
+        body = json.dumps({k: v for k, v in payload.items() if not k.startswith('_')}).encode('utf-8')
+        request = urllib.request.Request(
+            self.url + '/api/submit-writing', data=body,
+            headers={'Content-Type': 'application/json'}, method='POST'
+        )
+        status, error = None, None
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as resp:
+                resp.read()
+                status = resp.status
+        except urllib.error.HTTPError as e:
+            status, error = e.code, f"HTTP {e.code}"
+        except Exception as e:
+            error = type(e).__name__
+        finished = time.perf_counter()
+        with self._lock:
+            self.results.append({
+                # Measured from the scheduled arrival so queueing delay isn't hidden
+                'latency': finished - scheduled_at,
+                'status': status,
+                'ok': error is None and status is not None and status < 400,
+                'error': error,
+                'scale': payload.get('_scale', 1),
+                'words': len(payload['text'].split()),
+            })
+
+    def _arrivals(self, start: float):
+        """Yield (scheduled_time, payload); Poisson arrivals when a rate is set"""
+        sent, next_at = 0, start
+        while True:
+            if self.total_requests is not None and sent >= self.total_requests:
+                return
+            if self.duration is not None and next_at - start >= self.duration:
+                return
+            yield next_at, self.payloads[sent % len(self.payloads)]
+            sent += 1
+            if self.rate > 0:
+                next_at += self.random.expovariate(self.rate)
+
+    def run(self) -> Dict[str, Any]:
+        self.random.shuffle(self.payloads)
+        before = self.scrape_metrics()
+        work: queue.Queue = queue.Queue(maxsize=self.concurrency * 4)
+
+        def worker():
+            while True:
+                item = work.get()
+                if item is None:
+                    return
+                scheduled_at, payload = item
+                if self.rate <= 0:
+                    scheduled_at = time.perf_counter()
+                self._send(payload, scheduled_at)
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+
+        start = time.perf_counter()
+        for scheduled_at, payload in self._arrivals(start):
+            delay = scheduled_at - time.perf_counter()
+            if self.rate > 0 and delay > 0:
+                time.sleep(delay)
+            work.put((scheduled_at, payload))
+        for _ in threads:
+            work.put(None)
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        after = self.scrape_metrics()
+        return self.summarize(elapsed, before, after)
+
+    def summarize(self, elapsed: float, before: Dict, after: Dict) -> Dict[str, Any]:
+        latencies = [r['latency'] for r in self.results if r['ok']]
+        errors = [r for r in self.results if not r['ok']]
+        by_scale = {}
+        for factor in sorted({r['scale'] for r in self.results}):
+            scaled = [r['latency'] for r in self.results if r['ok'] and r['scale'] == factor]
+            by_scale[str(factor)] = {
+                'requests': sum(1 for r in self.results if r['scale'] == factor),
+                'p50': percentile(scaled, 50),
+                'p95': percentile(scaled, 95),
+            }
+        error_kinds = {}
+        for r in errors:
+            error_kinds[r['error']] = error_kinds.get(r['error'], 0) + 1
+
+        return {
+            'requests': len(self.results),
+            'elapsed_seconds': round(elapsed, 3),
+            'throughput_rps': round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+            'error_rate': len(errors) / len(self.results) if self.results else 0.0,
+            'errors': error_kinds,
+            'latency_seconds': {
+                'mean': sum(latencies) / len(latencies) if latencies else None,
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'max': max(latencies) if latencies else None,
+            },
+            'latency_by_scale': by_scale,
+            'stages': stage_deltas(before, after),
+        }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).parent,
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print the headline deltas between two saved runs"""
+    print(f"\nComparison against {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    rows = [('throughput_rps', current['summary']['throughput_rps'], baseline['summary']['throughput_rps'])]
+    for pct in ('p50', 'p95', 'p99'):
+        rows.append((pct, current['summary']['latency_seconds'][pct], baseline['summary']['latency_seconds'][pct]))
+    rows.append(('error_rate', current['summary']['error_rate'], baseline['summary']['error_rate']))
+    for name, now, then in rows:
+        if now is None or then is None:
+            continue
+        change = ((now - then) / then * 100) if then else 0.0
+        print(f"  {name:15s} {then:10.4f} -> {now:10.4f} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay the IELTS corpus against a running grading API')
+    parser.add_argument('--url', default='http://localhost:8000', help='Base URL of the API')
+    parser.add_argument('--dataset', default=str(DATA_PATH), help='CSV with Essay/Question/Task_Type columns')
+    parser.add_argument('--concurrency', type=int, default=4, help='Number of concurrent client workers')
+    parser.add_argument('--rate', type=float, default=0.0,
+                        help='Open-loop arrival rate in requests/s (0 = closed loop, as fast as workers allow)')
+    parser.add_argument('--duration', type=float, default=None, help='Stop scheduling after N seconds')
+    parser.add_argument('--requests', type=int, default=None, help='Stop after N requests')
+    parser.add_argument('--scales', default='1', help='Comma-separated essay length factors, e.g. 0.5,1,2,4')
+    parser.add_argument('--limit', type=int, default=None, help='Use only the first N essays')
+    parser.add_argument('--timeout', type=float, default=120.0, help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=0, help='Shuffle/arrival seed')
+    parser.add_argument('--output', default=None, help='Where to write the JSON result')
+    parser.add_argument('--compare', default=None, help='Previous result JSON to compare against')
+    args = parser.parse_args()
+
+    if args.duration is None and args.requests is None:
+        args.requests = 100
+
+    corpus = load_corpus(Path(args.dataset))[:args.limit]
+    scales = [float(s) for s in args.scales.split(',') if s.strip()]
+    payloads = build_payloads(corpus, scales)
+
+    tester = LoadTester(
+        args.url, payloads, concurrency=args.concurrency, rate=args.rate,
+        duration=args.duration, total_requests=args.requests, timeout=args.timeout, seed=args.seed
+    )
+    print(f"Replaying {len(payloads)} payloads against {args.url} "
+          f"(concurrency={args.concurrency}, rate={args.rate or 'closed-loop'})...")
+    summary = tester.run()
+
+    timestamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    commit = git_commit()
+    result = {
+        'timestamp': timestamp,
+        'commit': commit,
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        'summary': summary,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{timestamp}_{commit or 'unknown'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+
+    latency = summary['latency_seconds']
+    print(f"\nRequests: {summary['requests']}  Errors: {summary['error_rate']:.2%}")
+    print(f"Throughput: {summary['throughput_rps']:.2f} req/s")
+    if latency['p50'] is not None:
+        print(f"Latency p50/p95/p99: {latency['p50']:.3f}s / {latency['p95']:.3f}s / {latency['p99']:.3f}s")
+    if summary['stages']:
+        print("Time per stage (server side):")
+        for stage, stats in list(summary['stages'].items())[:15]:
+            print(f"  {stage:45s} {stats['mean_seconds']:8.4f}s x {stats['calls']}")
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(result, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+"""Memory accounting for the grading services.
+
+Loads the services directly (no API) and reports:
+  * steady-state RSS contributed by each model (spaCy copies, MiniLM,
+    zero-shot, and the LanguageTool JVM, which lives in its own process)
+  * peak Python allocation per analyzer call (tracemalloc)
+  * growth over N requests, including spaCy StringStore/vocab growth
+    from unseen tokens
+
+    python -m app.evaluatiuon.memory_profile --requests 2000 --sample-every 100
+"""
+import argparse
+import gc
+import json
+import random
+import string
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from ..metrics import MODEL_RSS_BYTES, rss_bytes
+from .load_test import load_corpus
+
+RESULTS_DIR = Path(__file__).parent / 'benchmark_results'
+
+MB = 1024 * 1024
+
+
+def _mb(value: float) -> float:
+    return round(value / MB, 2)
+
+
+def jvm_pid(grammar_service) -> int:
+    """PID of the LanguageTool server spawned by the grammar service, if local"""
+    server = getattr(getattr(grammar_service, 'tool', None), '_server', None)
+    return getattr(server, 'pid', None)
+
+
+def load_services(names: List[str]) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """Construct services one at a time, recording the RSS each adds"""
+    from ..services.grammar_service import GrammarService
+    from ..services.lexical_service import LexicalService
+    from ..services.CoherenceCohensionService import CoherenceCohesionService
+    from ..services.taskachievement_service import TaskAchievementService
+
+    factories = {
+        'grammar': GrammarService,
+        'lexical': LexicalService,
+        'coherence': CoherenceCohesionService,
+        'task_achievement': TaskAchievementService,
+    }
+    services, construction = {}, {}
+    for name in names:
+        gc.collect()
+        before = rss_bytes()
+        services[name] = factories[name]()
+        gc.collect()
+        construction[name] = rss_bytes() - before
+    return services, construction
+
+
+def model_report(services: Dict[str, Any], construction: Dict[str, int]) -> Dict[str, Any]:
+    """Per-model RSS (from the load hooks), per-service totals and the JVM"""
+    with MODEL_RSS_BYTES._lock:
+        per_model = {labels[0]: value for labels, value in MODEL_RSS_BYTES._values.items()}
+    report = {
+        'process_rss_mb': _mb(rss_bytes()),
+        'models_mb': {model: _mb(value) for model, value in sorted(per_model.items(), key=lambda kv: -kv[1])},
+        'service_construction_mb': {name: _mb(value) for name, value in construction.items()},
+    }
+    if 'grammar' in services:
+        pid = jvm_pid(services['grammar'])
+        report['languagetool_jvm_mb'] = _mb(rss_bytes(pid)) if pid else None
+    return report
+
+
+def analyzer_calls(services: Dict[str, Any]) -> Dict[str, Callable[[Dict[str, Any]], Any]]:
+    calls = {}
+    if 'grammar' in services:
+        calls['grammar'] = lambda item: services['grammar'].analyze_grammar(item['text'])
+    if 'lexical' in services:
+        calls['lexical'] = lambda item: services['lexical'].analyze_lexical(item['text'])
+    if 'coherence' in services:
+        calls['coherence'] = lambda item: services['coherence'].analyze_coherence_cohesion(item['text'])
+    if 'task_achievement' in services:
+        calls['task_achievement'] = lambda item: services['task_achievement'].analyze_task_achievement(
+            text=item['text'], task_type=item['task_type'], question_desc=item['question_desc']
+        )
+    return calls
+
+
+def peak_allocations(calls: Dict[str, Callable], corpus: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Peak traced allocation and RSS delta of one call per analyzer, per essay"""
+    results = {}
+    tracemalloc.start()
+    try:
+        for name, call in calls.items():
+            peaks, rss_deltas = [], []
+            for item in corpus:
+                gc.collect()
+                tracemalloc.reset_peak()
+                before_traced = tracemalloc.get_traced_memory()[0]
+                before_rss = rss_bytes()
+                call(item)
+                peaks.append(tracemalloc.get_traced_memory()[1] - before_traced)
+                rss_deltas.append(rss_bytes() - before_rss)
+            results[name] = {
+                'peak_alloc_mb_max': _mb(max(peaks)),
+                'peak_alloc_mb_mean': _mb(sum(peaks) / len(peaks)),
+                'rss_delta_mb_max': _mb(max(rss_deltas)),
+            }
+    finally:
+        tracemalloc.stop()
+    return results
+
+
+def mutate(text: str, rng: random.Random, rate: float = 0.05) -> str:
+    """Inject unseen pseudo-words so the run exercises StringStore growth like real typos do"""
+    words = text.split(' ')
+    for i in range(len(words)):
+        if rng.random() < rate:
+            words[i] = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10)))
+    return ' '.join(words)
+
+
+def string_store_sizes(services: Dict[str, Any]) -> Dict[str, int]:
+    sizes = {}
+    for name, service in services.items():
+        nlp = getattr(service, 'nlp', None)
+        if nlp is not None:
+            sizes[f'{name}.strings'] = len(nlp.vocab.strings)
+            sizes[f'{name}.lexemes'] = len(nlp.vocab)
+    return sizes
+
+
+def growth(services: Dict[str, Any], calls: Dict[str, Callable], corpus: List[Dict[str, Any]],
+           requests: int, sample_every: int, mutation_rate: float, seed: int = 0) -> Dict[str, Any]:
+    """Run N requests through every analyzer and sample memory as it goes"""
+    rng = random.Random(seed)
+    pid = jvm_pid(services['grammar']) if 'grammar' in services else None
+    samples = []
+    for i in range(requests + 1):
+        if i % sample_every == 0:
+            gc.collect()
+            sample = {'request': i, 'rss_mb': _mb(rss_bytes()), **string_store_sizes(services)}
+            if pid:
+                sample['jvm_rss_mb'] = _mb(rss_bytes(pid))
+            samples.append(sample)
+            print(f"  after {i:6d} requests: rss={sample['rss_mb']} MB")
+        if i == requests:
+            break
+        base = corpus[i % len(corpus)]
+        item = {**base, 'text': mutate(base['text'], rng, mutation_rate)}
+        for call in calls.values():
+            call(item)
+
+    summary = {'samples': samples}
+    if len(samples) >= 2:
+        first, last = samples[0], samples[-1]
+        span = last['request'] - first['request']
+        # Skip the first sample: warm-up allocations aren't growth
+        steady = samples[1] if len(samples) > 2 else first
+        steady_span = last['request'] - steady['request'] or span
+        summary['rss_growth_kb_per_request'] = round((last['rss_mb'] - steady['rss_mb']) * 1024 / steady_span, 3)
+        for key in last:
+            if key.endswith('.strings') or key.endswith('.lexemes'):
+                summary[f'{key}_growth_per_request'] = round((last[key] - first[key]) / span, 3)
+        if 'jvm_rss_mb' in last:
+            summary['jvm_growth_kb_per_request'] = round((last['jvm_rss_mb'] - steady['jvm_rss_mb']) * 1024 / steady_span, 3)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory accounting for the grading services')
+    parser.add_argument('--analyzers', default='grammar,lexical,coherence,task_achievement',
+                        help='Comma-separated services to load')
+    parser.add_argument('--requests', type=int, default=2000, help='Requests for the growth measurement (0 skips it)')
+    parser.add_argument('--sample-every', type=int, default=100, help='Sample memory every N requests')
+    parser.add_argument('--mutation-rate', type=float, default=0.05, help='Fraction of words replaced by unseen tokens')
+    parser.add_argument('--output', default=str(RESULTS_DIR / 'memory_report.json'), help='Where to write the report')
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    names = [n.strip() for n in args.analyzers.split(',') if n.strip()]
+    baseline_rss = rss_bytes()
+    services, construction = load_services(names)
+
+    report = {'baseline_rss_mb': _mb(baseline_rss), 'models': model_report(services, construction)}
+    print("\nSteady-state RSS by model (MB):")
+    for model, value in report['models']['models_mb'].items():
+        print(f"  {model:40s} {value:10.1f}")
+    if report['models'].get('languagetool_jvm_mb') is not None:
+        print(f"  {'languagetool JVM (separate process)':40s} {report['models']['languagetool_jvm_mb']:10.1f}")
+
+    calls = analyzer_calls(services)
+    report['per_call'] = peak_allocations(calls, corpus)
+    print("\nPeak allocation per analyzer call (MB):")
+    for name, stats in report['per_call'].items():
+        print(f"  {name:20s} max={stats['peak_alloc_mb_max']:8.2f} mean={stats['peak_alloc_mb_mean']:8.2f}")
+
+    if args.requests > 0:
+        print(f"\nMeasuring growth over {args.requests} requests...")
+        report['growth'] = growth(services, calls, corpus, args.requests, args.sample_every, args.mutation_rate)
+        for key, value in report['growth'].items():
+            if key != 'samples':
+                print(f"  {key}: {value}")
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport saved to {output}")
+
+
+if __name__ == '__main__':
+    main()
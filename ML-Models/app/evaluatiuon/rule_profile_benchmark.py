@@ -0,0 +1,101 @@
+"""Check time and score agreement of the LanguageTool rule profiles.
+
+Runs the grammar check over the dataset essays once per profile on a single
+LanguageTool instance, then compares each profile's grammar bands with the
+reference profile ("all", the stock rule set).
+
+    python -m app.evaluatiuon.rule_profile_benchmark --limit 200
+    python -m app.evaluatiuon.rule_profile_benchmark --profiles all,ielts-core
+"""
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .load_test import load_corpus, percentile
+
+RESULTS_DIR = Path(__file__).parent / 'benchmark_results'
+REFERENCE_PROFILE = 'all'
+
+
+def run_profile(service, texts: List[str], profile: str) -> Dict[str, Any]:
+    """Per-essay check seconds, grammar bands and error counts under one profile"""
+    service.set_rule_profile(profile)
+    service._languagetool_check(texts[0])  # warm-up: the first check after a rule change is slower
+    seconds, scores, errors = [], [], []
+    for text in texts:
+        start = time.perf_counter()
+        matches = service._with_spelling(text, service._languagetool_check(text))
+        seconds.append(time.perf_counter() - start)
+        result = service.score_matches(text, matches)
+        scores.append(result['score'])
+        errors.append(result['raw_error_count'])
+    return {'seconds': seconds, 'scores': scores, 'errors': errors}
+
+
+def compare(run: Dict[str, Any], reference: Dict[str, Any]) -> Dict[str, Any]:
+    """Timing summary plus band agreement with the reference run"""
+    diffs = [abs(a - b) for a, b in zip(run['scores'], reference['scores'])]
+    mean = statistics.mean(run['seconds'])
+    return {
+        'essays': len(run['seconds']),
+        'check_ms': {
+            'mean': mean * 1000,
+            'p50': percentile(run['seconds'], 50) * 1000,
+            'p95': percentile(run['seconds'], 95) * 1000,
+        },
+        'speedup': statistics.mean(reference['seconds']) / mean if mean else None,
+        'mean_errors': statistics.mean(run['errors']),
+        'agreement': {
+            'exact': sum(d == 0 for d in diffs) / len(diffs),
+            'within_half_band': sum(d <= 0.5 for d in diffs) / len(diffs),
+            'mean_abs_diff': statistics.mean(diffs),
+            'max_abs_diff': max(diffs),
+        },
+    }
+
+
+def benchmark_profiles(service, texts: List[str], profiles: List[str],
+                       reference: str = REFERENCE_PROFILE) -> Dict[str, Dict[str, Any]]:
+    """compare() summary for every profile (the reference is always run first)"""
+    runs = {reference: run_profile(service, texts, reference)}
+    for profile in profiles:
+        if profile not in runs:
+            runs[profile] = run_profile(service, texts, profile)
+    return {profile: compare(run, runs[reference]) for profile, run in runs.items()}
+
+
+def print_report(results: Dict[str, Dict[str, Any]]) -> None:
+    print(f"{'profile':<12} {'mean ms':>9} {'p95 ms':>9} {'speedup':>8} {'errors':>7} {'exact':>7} {'±0.5':>7} {'MAE':>6}")
+    for profile, r in results.items():
+        a = r['agreement']
+        print(f"{profile:<12} {r['check_ms']['mean']:>9.1f} {r['check_ms']['p95']:>9.1f} "
+              f"{r['speedup']:>7.2f}x {r['mean_errors']:>7.1f} {a['exact']:>7.1%} "
+              f"{a['within_half_band']:>7.1%} {a['mean_abs_diff']:>6.2f}")
+
+
+def main(argv: Optional[List[str]] = None):
+    from ..services.grammar_service import GrammarService, RULE_PROFILES
+
+    parser = argparse.ArgumentParser(description='LanguageTool rule profile benchmark')
+    parser.add_argument('--profiles', default=','.join(RULE_PROFILES), help='Comma-separated profiles to compare')
+    parser.add_argument('--limit', type=int, default=None, help='Only use the first N essays')
+    parser.add_argument('--output', default=str(RESULTS_DIR / 'rule_profiles.json'), help='Where to write results')
+    args = parser.parse_args(argv)
+
+    texts = [item['text'] for item in load_corpus()][:args.limit]
+    profiles = [p.strip() for p in args.profiles.split(',') if p.strip()]
+    print(f"Checking {len(texts)} essays with profiles {', '.join(profiles)}...")
+    results = benchmark_profiles(GrammarService(), texts, profiles)
+    print_report(results)
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""Per-analyzer micro-benchmarks with essay-length scaling curves.
+
+Times each analyzer on synthetic essays from 50 to 5,000 words (and the
+task achievement analyzer on prompts of increasing size), fits the scaling
+exponent k in t ~ n^k, and compares against a stored baseline.
+
+    python -m app.evaluatiuon.scaling_benchmark --repeats 3
+    python -m app.evaluatiuon.scaling_benchmark --save-baseline
+"""
+import argparse
+import json
+import math
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .load_test import load_corpus
+
+RESULTS_DIR = Path(__file__).parent / 'benchmark_results'
+BASELINE_PATH = RESULTS_DIR / 'scaling_baseline.json'
+
+ESSAY_SIZES = [50, 100, 250, 500, 1000, 2500, 5000]
+PROMPT_SIZES = [10, 25, 50, 100, 200]
+ANALYZERS = ['grammar', 'lexical', 'coherence', 'task_achievement']
+
+# Regression thresholds: exponent growth and slowdown at the largest size
+EXPONENT_TOLERANCE = 0.15
+TIME_TOLERANCE = 0.25
+
+
+def make_text(paragraphs: List[str], words: int) -> str:
+    """Concatenate corpus paragraphs until the text reaches `words` words"""
+    out, count, i = [], 0, 0
+    while count < words:
+        paragraph = paragraphs[i % len(paragraphs)]
+        remaining = words - count
+        tokens = paragraph.split()
+        if len(tokens) > remaining:
+            paragraph = ' '.join(tokens[:remaining])
+            tokens = tokens[:remaining]
+        out.append(paragraph)
+        count += len(tokens)
+        i += 1
+    return '\n\n'.join(out)
+
+
+def fit_exponent(sizes: List[float], seconds: List[float]) -> Optional[float]:
+    """Least-squares slope of log(time) against log(size)"""
+    points = [(math.log(n), math.log(t)) for n, t in zip(sizes, seconds) if n > 0 and t > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if var_x == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+
+def time_call(func: Callable[[], object], repeats: int) -> float:
+    """Median wall time of `repeats` calls after one warm-up call"""
+    func()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def build_analyzers(names: List[str]) -> Dict[str, Callable[[str, str], object]]:
+    """Instantiate only the requested services; each callable takes (essay, prompt)"""
+    analyzers = {}
+    if 'grammar' in names:
+        from ..services.grammar_service import GrammarService
+        grammar = GrammarService()
+        analyzers['grammar'] = lambda essay, prompt: grammar.analyze_grammar(essay)
+    if 'lexical' in names:
+        from ..services.lexical_service import LexicalService
+        lexical = LexicalService()
+        analyzers['lexical'] = lambda essay, prompt: lexical.analyze_lexical(essay)
+    if 'coherence' in names:
+        from ..services.CoherenceCohensionService import CoherenceCohesionService
+        coherence = CoherenceCohesionService()
+        analyzers['coherence'] = lambda essay, prompt: coherence.analyze_coherence_cohesion(essay)
+    if 'task_achievement' in names:
+        from ..services.taskachievement_service import TaskAchievementService
+        task = TaskAchievementService()
+        analyzers['task_achievement'] = lambda essay, prompt: task.analyze_task_achievement(
+            text=essay, task_type='argument', question_desc=prompt
+        )
+    return analyzers
+
+
+def run_benchmark(analyzers: Dict[str, Callable[[str, str], object]], paragraphs: List[str],
+                  prompts: List[str], essay_sizes: List[int], prompt_sizes: List[int],
+                  repeats: int = 3) -> Dict[str, Dict]:
+    results = {}
+    base_prompt = make_text(prompts, prompt_sizes[0])
+    for name, analyze in analyzers.items():
+        curve = []
+        for words in essay_sizes:
+            essay = make_text(paragraphs, words)
+            seconds = time_call(lambda: analyze(essay, base_prompt), repeats)
+            curve.append({'words': words, 'seconds': seconds})
+            print(f"  {name:17s} essay={words:5d} words  {seconds * 1000:9.1f} ms")
+        results[name] = {
+            'essay_curve': curve,
+            'essay_exponent': fit_exponent([p['words'] for p in curve], [p['seconds'] for p in curve]),
+        }
+
+        if name == 'task_achievement':
+            essay = make_text(paragraphs, 250)
+            prompt_curve = []
+            for words in prompt_sizes:
+                prompt = make_text(prompts, words)
+                seconds = time_call(lambda: analyze(essay, prompt), repeats)
+                prompt_curve.append({'words': words, 'seconds': seconds})
+                print(f"  {name:17s} prompt={words:4d} words  {seconds * 1000:9.1f} ms")
+            results[name]['prompt_curve'] = prompt_curve
+            results[name]['prompt_exponent'] = fit_exponent(
+                [p['words'] for p in prompt_curve], [p['seconds'] for p in prompt_curve]
+            )
+    return results
+
+
+def find_regressions(results: Dict[str, Dict], baseline: Dict[str, Dict],
+                     exponent_tolerance: float = EXPONENT_TOLERANCE,
+                     time_tolerance: float = TIME_TOLERANCE) -> List[str]:
+    """Compare exponents and largest-size timings against the baseline"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for curve_key, exponent_key in (('essay_curve', 'essay_exponent'), ('prompt_curve', 'prompt_exponent')):
+            now, then = current.get(exponent_key), previous.get(exponent_key)
+            if now is not None and then is not None and now > then + exponent_tolerance:
+                regressions.append(f"{name}: {exponent_key} grew from {then:.2f} to {now:.2f}")
+
+            now_curve = {p['words']: p['seconds'] for p in current.get(curve_key, [])}
+            then_curve = {p['words']: p['seconds'] for p in previous.get(curve_key, [])}
+            shared = sorted(set(now_curve) & set(then_curve))
+            if shared:
+                largest = shared[-1]
+                if now_curve[largest] > then_curve[largest] * (1 + time_tolerance):
+                    regressions.append(
+                        f"{name}: {curve_key} at {largest} words slowed from "
+                        f"{then_curve[largest]:.3f}s to {now_curve[largest]:.3f}s"
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyzer scaling benchmark')
+    parser.add_argument('--analyzers', default=','.join(ANALYZERS), help='Comma-separated analyzers to run')
+    parser.add_argument('--sizes', default=','.join(map(str, ESSAY_SIZES)), help='Essay sizes in words')
+    parser.add_argument('--prompt-sizes', default=','.join(map(str, PROMPT_SIZES)), help='Prompt sizes in words')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed repetitions per point (median is kept)')
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help='Baseline JSON to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the new baseline')
+    parser.add_argument('--output', default=str(RESULTS_DIR / 'scaling_results.json'), help='Where to write results')
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    paragraphs = [p.strip() for item in corpus for p in item['text'].split('\n\n') if p.strip()]
+    prompts = [item['question_desc'] for item in corpus if item['question_desc']]
+
+    names = [n.strip() for n in args.analyzers.split(',') if n.strip()]
+    analyzers = build_analyzers(names)
+    print(f"Benchmarking {', '.join(analyzers)} ({args.repeats} repeats per point)...")
+    results = run_benchmark(
+        analyzers, paragraphs, prompts,
+        [int(s) for s in args.sizes.split(',')], [int(s) for s in args.prompt_sizes.split(',')],
+        repeats=args.repeats,
+    )
+
+    print("\nScaling exponents (t ~ n^k):")
+    for name, data in results.items():
+        line = f"  {name:17s} essay k={data['essay_exponent']:.2f}"
+        if data.get('prompt_exponent') is not None:
+            line += f"  prompt k={data['prompt_exponent']:.2f}"
+        print(line)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+
+    baseline_path = Path(args.baseline)
+    if not baseline_path.exists():
+        print(f"\nNo baseline at {baseline_path}; run with --save-baseline to create one.")
+        return
+    with open(baseline_path) as f:
+        regressions = find_regressions(results, json.load(f))
+    if regressions:
+        print("\nREGRESSIONS against baseline:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        sys.exit(1)
+    print("\nNo regressions against baseline.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""Response sections a client can ask for (SubmissionCreate.include).
+
+Band scores are always computed. The sections below are the parts of each
+analyzer's output that only feed the feedback screens:
+
+- feedback: strengths, improvements and general feedback text
+- suggestions: specific suggestions, WordNet and sophisticated-word alternatives
+- details: detailed_analysis (including per-paragraph parses) and grammar error details
+- sentences: the grammar per-sentence breakdown
+
+include=None keeps the full response and include=[] grades for scores only.
+The pipeline hands the set down to each analyzer so a skipped section is never
+computed; it comes back empty ([], {} or "") and the response schema stays the same.
+"""
+from typing import FrozenSet, Iterable, Optional
+
+SECTIONS = ("feedback", "suggestions", "details", "sentences")
+
+
+def normalize(include: Optional[Iterable[str]]) -> Optional[FrozenSet[str]]:
+    """Set of requested sections, None for everything"""
+    if include is None:
+        return None
+    include = frozenset(include)
+    unknown = include - set(SECTIONS)
+    if unknown:
+        raise ValueError(f"Unknown response sections {sorted(unknown)}, expected some of {SECTIONS}")
+    return include
+
+
+def wants(include: Optional[Iterable[str]], section: str) -> bool:
+    return include is None or section in include
@@ -0,0 +1,269 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import func
+
+from . import config
+from .metrics import registry
+from .models.grading_job import GradingJob
+from .models.submission import Submission
+
+logger = logging.getLogger(__name__)
+
+JOB_EVENTS = registry.counter(
+    "ielts_grading_jobs_total",
+    "Grading job state transitions",
+    ("event",),
+)
+
+
+# Claim order when the caller gives no explicit priority
+CLASS_PRIORITIES = {"interactive": 10, "bulk": 0}
+
+
+def utcnow() -> datetime:
+    """Naive UTC timestamp; every node must agree, so local time is never used"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class JobQueue:
+    """Grading jobs stored in the application database.
+
+    Workers claim jobs with a conditional UPDATE and only own a job when that
+    UPDATE changed exactly one row, so any number of processes or nodes can
+    share one database without a broker or row locks. A claim is a lease: a
+    worker that dies stops renewing it and the job becomes claimable again
+    once the lease expires. Failed attempts are retried with exponential
+    backoff until max_attempts.
+    """
+
+    def __init__(self, session_factory, lease_seconds: float = None, max_attempts: int = None,
+                 retry_delay_seconds: float = None):
+        self.session_factory = session_factory
+        self.lease_seconds = lease_seconds or config.JOB_LEASE_SECONDS
+        self.max_attempts = max_attempts or config.JOB_MAX_ATTEMPTS
+        self.retry_delay_seconds = (
+            config.JOB_RETRY_DELAY_SECONDS if retry_delay_seconds is None else retry_delay_seconds
+        )
+
+    def enqueue(self, db, submission_id: int, mode: str = "full", priority: Optional[int] = None,
+                idempotency_key: Optional[str] = None, priority_class: str = "bulk",
+                tenant: Optional[str] = None) -> GradingJob:
+        """Commit a new job in the caller's session (with anything else pending there).
+
+        If the idempotency key was used before, the caller's pending changes
+        are rolled back and the original job is returned instead.
+        """
+        if idempotency_key:
+            existing = self._by_key(db, idempotency_key)
+            if existing is not None:
+                db.rollback()
+                return existing
+        if priority is None:
+            priority = CLASS_PRIORITIES.get(priority_class, 0)
+        job = GradingJob(
+            submission_id=submission_id, mode=mode, priority=priority,
+            priority_class=priority_class, tenant=tenant, idempotency_key=idempotency_key, status="queued", attempts=0,
+            max_attempts=self.max_attempts, available_at=utcnow()
+        )
+        db.add(job)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Lost a race with a concurrent request carrying the same key
+            db.rollback()
+            existing = self._by_key(db, idempotency_key) if idempotency_key else None
+            if existing is None:
+                raise
+            return existing
+        db.refresh(job)
+        JOB_EVENTS.inc(event="enqueued")
+        return job
+
+    @staticmethod
+    def _by_key(db, idempotency_key: str) -> Optional[GradingJob]:
+        return db.query(GradingJob).filter(GradingJob.idempotency_key == idempotency_key).first()
+
+    def _claimable(self, now: datetime):
+        """Queued jobs whose backoff has passed, or leased jobs whose worker stopped renewing"""
+        return and_(
+            GradingJob.attempts < GradingJob.max_attempts,
+            or_(
+                and_(GradingJob.status == "queued", GradingJob.available_at <= now),
+                and_(GradingJob.status == "leased", GradingJob.lease_expires_at < now),
+            ),
+        )
+
+    def claim(self, worker_id: str, limit: int = 1) -> List[GradingJob]:
+        """Lease up to limit runnable jobs, highest priority first"""
+        db = self.session_factory()
+        try:
+            now = utcnow()
+            self._fail_exhausted(db, now)
+            candidates = [
+                row.id for row in db.query(GradingJob.id)
+                .filter(self._claimable(now))
+                .order_by(GradingJob.priority.desc(), GradingJob.id)
+                .limit(limit * 4)  # headroom for candidates other workers take first
+            ]
+            claimed = []
+            for job_id in candidates:
+                if len(claimed) >= limit:
+                    break
+                result = db.execute(
+                    update(GradingJob)
+                    .where(GradingJob.id == job_id, self._claimable(now))
+                    .values(
+                        status="leased", lease_owner=worker_id,
+                        lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                        attempts=GradingJob.attempts + 1, updated_at=func.now()
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                db.commit()
+                if result.rowcount == 1:
+                    claimed.append(job_id)
+            if not claimed:
+                return []
+            JOB_EVENTS.inc(len(claimed), event="claimed")
+            jobs = db.query(GradingJob).filter(GradingJob.id.in_(claimed)).all()
+            db.expunge_all()
+            return sorted(jobs, key=lambda job: claimed.index(job.id))
+        finally:
+            db.close()
+
+    def _fail_exhausted(self, db, now: datetime) -> None:
+        """Expired leases with no attempts left will never be claimed; close them out"""
+        exhausted = and_(
+            GradingJob.status == "leased",
+            GradingJob.lease_expires_at < now,
+            GradingJob.attempts >= GradingJob.max_attempts,
+        )
+        submission_ids = [row.submission_id for row in db.query(GradingJob.submission_id).filter(exhausted)]
+        if not submission_ids:
+            return
+        result = db.execute(
+            update(GradingJob)
+            .where(exhausted)
+            .values(status="failed", finished_at=now, lease_owner=None,
+                    last_error=func.coalesce(GradingJob.last_error, "lease expired"))
+            .execution_options(synchronize_session=False)
+        )
+        self._mark_submissions_failed(db, submission_ids)
+        db.commit()
+        JOB_EVENTS.inc(result.rowcount, event="lease_exhausted")
+        logger.warning(f"{result.rowcount} grading jobs failed after their final lease expired")
+
+    @staticmethod
+    def _mark_submissions_failed(db, submission_ids: List[int]) -> None:
+        db.execute(
+            update(Submission)
+            .where(Submission.id.in_(submission_ids), Submission.grading_status == "queued")
+            .values(grading_status="failed")
+            .execution_options(synchronize_session=False)
+        )
+
+    def _update_owned(self, job_id: int, worker_id: str, db=None, **values) -> bool:
+        """Apply values only while worker_id still holds the lease.
+
+        With a caller's session the update joins its transaction and is not
+        committed here.
+        """
+        own_session = db is None
+        if own_session:
+            db = self.session_factory()
+        try:
+            result = db.execute(
+                update(GradingJob)
+                .where(GradingJob.id == job_id, GradingJob.status == "leased",
+                       GradingJob.lease_owner == worker_id)
+                .values(updated_at=func.now(), **values)
+                .execution_options(synchronize_session=False)
+            )
+            if own_session:
+                db.commit()
+            return result.rowcount == 1
+        finally:
+            if own_session:
+                db.close()
+
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        """Extend a lease; False means it expired and another worker may have the job"""
+        return self._update_owned(
+            job_id, worker_id, lease_expires_at=utcnow() + timedelta(seconds=self.lease_seconds)
+        )
+
+    def complete(self, job_id: int, worker_id: str, db=None) -> bool:
+        """Mark a leased job done. Pass the session holding the job's results so
+        both commit together, or neither does if the lease was lost."""
+        done = self._update_owned(job_id, worker_id, db=db, status="done", finished_at=utcnow(), lease_owner=None)
+        JOB_EVENTS.inc(event="completed" if done else "lease_lost")
+        return done
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> Optional[str]:
+        """Release a failed attempt: back to the queue with backoff, or failed for good.
+
+        Returns the job's new status, or None if the lease had already been lost.
+        """
+        db = self.session_factory()
+        try:
+            job = db.query(GradingJob).filter(GradingJob.id == job_id).first()
+            if job is None:
+                return None
+            attempts = job.attempts or 0
+            now = utcnow()
+            if attempts >= (job.max_attempts or self.max_attempts):
+                status = "failed"
+                released = self._update_owned(
+                    job_id, worker_id, db=db, status=status, finished_at=now, lease_owner=None,
+                    last_error=error
+                )
+                if released:
+                    self._mark_submissions_failed(db, [job.submission_id])
+            else:
+                status = "queued"
+                delay = self.retry_delay_seconds * 2 ** max(0, attempts - 1)
+                released = self._update_owned(
+                    job_id, worker_id, db=db, status=status, lease_owner=None, lease_expires_at=None,
+                    available_at=now + timedelta(seconds=delay), last_error=error
+                )
+            db.commit()
+        finally:
+            db.close()
+        if not released:
+            JOB_EVENTS.inc(event="lease_lost")
+            return None
+        JOB_EVENTS.inc(event="failed" if status == "failed" else "retried")
+        return status
+
+    def get(self, job_id: int) -> Optional[GradingJob]:
+        db = self.session_factory()
+        try:
+            job = db.query(GradingJob).filter(GradingJob.id == job_id).first()
+            if job is not None:
+                db.expunge(job)
+            return job
+        finally:
+            db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        db = self.session_factory()
+        try:
+            counts = dict(
+                db.query(GradingJob.status, func.count(GradingJob.id)).group_by(GradingJob.status).all()
+            )
+            expired = db.query(func.count(GradingJob.id)).filter(
+                GradingJob.status == "leased", GradingJob.lease_expires_at < utcnow()
+            ).scalar()
+        finally:
+            db.close()
+        return {
+            "queued": counts.get("queued", 0),
+            "leased": counts.get("leased", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "expired_leases": expired,
+        }
@@ -1,16 +1,33 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response, FileResponse, StreamingResponse
+from typing import Optional, Literal
+import json
+import os
+import re
+import secrets
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from . import models
 from . import schemas
-from .database import engine, get_db
+from . import config
+from .database import engine, get_db, add_missing_columns, SessionLocal
 from .models.submission import Submission
 import nltk  # Keep NLTK for other services
-from nltk.tokenize import sent_tokenize
 from .services.lexical_service import LexicalService
 from .services.taskachievement_service import TaskAchievementService
 from .services.CoherenceCohensionService import CoherenceCohesionService
 from .services.grammar_service import GrammarService  # New grammar service
+from .services.grading_pipeline import GradingPipeline, SCORER_VERSION
+from .result_cache import ResultCache
+from .revisions import RevisionGrader
+from .job_queue import JobQueue
+from .signals import SignalStore
+from . import similarity
+from .single_flight import SingleFlight
+from .metrics import registry, timed, QUEUE_DEPTH
+from .profiling import profile_call
+from .scheduler import THREAD_NAME_PREFIX
 import logging
 
 # Configure logging
@@ -25,6 +42,7 @@ except Exception as e:
 
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
+add_missing_columns(engine)
 
 app = FastAPI()
 
@@ -33,15 +51,38 @@ grammar_service = None
 lexical_service = None
 coherence_service = None    
 taskachievement_service = None
+grading_pipeline = None
+result_cache = None
+signal_store = None
+revision_grader = None
+similarity_index = None
+# Durable queue for deferred grading (drained by python -m app.worker)
+job_queue = JobQueue(SessionLocal)
+# Concurrent identical submissions share one pipeline run
+grading_flight = SingleFlight("grading")
 
 @app.on_event("startup")
 async def startup_event():
-    global grammar_service, lexical_service, taskachievement_service, coherence_service
+    global grammar_service, lexical_service, taskachievement_service, coherence_service, grading_pipeline, result_cache
+    global signal_store, revision_grader, similarity_index
     try:
         grammar_service = GrammarService()  # Using the new GrammarService implementation
         lexical_service = LexicalService()
         taskachievement_service = TaskAchievementService()
         coherence_service = CoherenceCohesionService()
+        grading_pipeline = GradingPipeline(
+            grammar_service, lexical_service, coherence_service, taskachievement_service
+        )
+        result_cache = ResultCache(SessionLocal, SCORER_VERSION, config.RESULT_CACHE_SIZE)
+        # Results from older weights/models can never be served again
+        result_cache.invalidate(all_versions=False)
+        revision_grader = RevisionGrader(grading_pipeline, SessionLocal)
+        revision_grader.stats.invalidate(all_versions=False)
+        if config.STORE_SIGNALS:
+            # Written on the analyzer workers' bulk class, after the response
+            signal_store = SignalStore(SessionLocal, executor=grading_pipeline.executor)
+        # Near-duplicate index, caught up with rows stored since it was last written
+        similarity_index = similarity.load(SessionLocal)
         logger.info("All services initialized successfully")
     except Exception as e:
         logger.error(f"Failed to initialize services: {e}")
@@ -56,11 +97,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Reject requests that don't carry the configured admin token"""
+    if not config.ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(x_admin_token, config.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+# Plain def: FastAPI runs it in its threadpool, so requests overlap instead of
+# queueing behind one another on the event loop
 @app.post("/api/submit-writing", response_model=schemas.submission.SubmissionResponse)
-async def submit_writing(
+def submit_writing(
     submission: schemas.submission.SubmissionCreate,
+    profile: bool = False,
+    queued: bool = False,
+    priority_class: Literal["interactive", "bulk"] = "interactive",
+    x_admin_token: Optional[str] = Header(None),
+    x_tenant_id: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
+    if queued:
+        # Accept now, grade on a worker; poll GET /api/submissions/{id}
+        with timed("api", "enqueue"):
+            return _enqueue_submission(submission, idempotency_key, priority_class, x_tenant_id, db)
+
+    if profile:
+        # Opt-in, admin-only: run the request under the sampling profiler
+        require_admin(x_admin_token)
+        with QUEUE_DEPTH.track_inprogress(), timed("api", "submit_writing"):
+            response, profiler = profile_call(
+                _grade_submission, submission, db, priority_class, x_tenant_id,
+                interval=config.PROFILE_SAMPLE_INTERVAL, thread_prefixes=(THREAD_NAME_PREFIX,)
+            )
+        saved = profiler.save(config.PROFILE_DIR)
+        logger.info(f"Saved request profile {saved['profile_id']} ({profiler.sample_count} samples)")
+        response.headers["X-Profile-Id"] = saved["profile_id"]
+        return response
+
+    with QUEUE_DEPTH.track_inprogress(), timed("api", "submit_writing"):
+        return _grade_submission(submission, db, priority_class, x_tenant_id)
+
+
+def _grade_submission(submission: schemas.submission.SubmissionCreate, db: Session,
+                      priority_class: str = "interactive", tenant: Optional[str] = None):
     try:
         # Create new submission with updated fields
         db_submission = Submission(
@@ -68,108 +147,199 @@ async def submit_writing(
             task_type=submission.task_type,
             question_number=submission.question_number,
             question_desc=submission.question_desc,
-            question_requirements=submission.question_requirements
+            question_requirements=submission.question_requirements,
+            locale=submission.locale
         )
         
-        # Analyze all aspects
-        raw_grammar_analysis = grammar_service.analyze_grammar(submission.text)
-        grammar_score  = raw_grammar_analysis["score"]
-        grammar_errors = raw_grammar_analysis.get("errors", []) 
-        # Create sentences from text for analysis if not available
-        sentences = sent_tokenize(submission.text) if hasattr(nltk, 'sent_tokenize') else [submission.text]
-        
-        # Convert raw grammar analysis to the format expected by the schema
-        grammar_analysis = {
-            'overall_score': raw_grammar_analysis['score'],
-            'raw_score': raw_grammar_analysis.get('weighted_error_rate', 0),
-            'feedback': raw_grammar_analysis['feedback'],
-            # Create sentence analysis structure compatible with the expected format
-            'sentence_analysis': [],
-            # Include the new data fields
-            'error_details':   grammar_errors,
-            'error_categories': raw_grammar_analysis.get('error_categories', {}),
-            'error_rate':       raw_grammar_analysis.get('error_rate', 0),
-        }
-        
-        # Generate sentence analysis from either errors or tokenized sentences
-        if grammar_errors: 
-            # Use errors to create sentence analysis
-            grammar_analysis['sentence_analysis'] = [
-                {
-                    'sentence': error['context'],
-                    'score': max(0.0, 1.0 - (0.2 * (i + 1)))  # Simulated scores decreasing by severity
-                } for i, error in enumerate(raw_grammar_analysis.get('errors', []))
-            ]
+        # Identical submissions (retries, shared model answers) reuse the stored result
+        cache_key = result_cache.key_for(submission, submission.mode)
+        cached = result_cache.get(cache_key)
+        coalesced = False
+        if cached is not None:
+            result = {**cached, 'pending': {}}
         else:
-            # Use tokenized sentences with a standard score
-            grammar_analysis['sentence_analysis'] = [
-                {
-                    'sentence': sentence,
-                    'score': raw_grammar_analysis['score'] / 9.0  # Normalize to 0-1 range
-                } for sentence in sentences
-            ]
-        
-        lexical_analysis = lexical_service.analyze_lexical(submission.text)
-        task_analysis = taskachievement_service.analyze_submission(submission)
-        coherence_analysis = coherence_service.analyze_coherence_cohesion(submission.text)
-        
-        # Calculate IELTS scores (1-9 scale)
-        weights = {
-            'grammar': 0.25,
-            'lexical': 0.25,
-            'task_achievement': 0.25,
-            'coherence': 0.25
-        }
-
-        ielts_score = (
-            grammar_analysis['overall_score'] * weights['grammar'] +
-            lexical_analysis['overall_score'] * weights['lexical'] +
-            task_analysis['ielts_score'] * weights['task_achievement'] +
-            coherence_analysis['overall_score'] * weights['coherence']
-        )
-        
-        # Round IELTS score to nearest 0.5
-        ielts_score = round(ielts_score * 2) / 2
-        ielts_score = max(1.0, min(9.0, ielts_score))
-        
-        # Convert IELTS score to percentage (1-9 → 0-100)
-        percentage_grade = ((ielts_score - 1) / 8) * 100
-        
-        # Update submission with analysis results
-        db_submission.grade = percentage_grade
-        db_submission.ielts_score = ielts_score
-        db_submission.grammar_feedback = grammar_analysis['feedback']
-        db_submission.raw_grammar_score = grammar_analysis['raw_score']
-        db_submission.grammar_analysis = grammar_analysis
-        db_submission.lexical_feedback = lexical_analysis['feedback']
-        db_submission.lexical_score = lexical_analysis['overall_score']
-        db_submission.lexical_analysis = lexical_analysis
-        db_submission.task_achievement_score = task_analysis['ielts_score']
-        db_submission.task_achievement_feedback = task_analysis['task_achievement_feedback']
-        db_submission.task_achievement_analysis = task_analysis['task_achievement_analysis']
-        db_submission.coherence_score = coherence_analysis['overall_score']
-        db_submission.coherence_feedback = coherence_analysis['feedback']
-        db_submission.coherence_analysis = coherence_analysis
+            def compute():
+                # A flight that finished just before this one started has already cached its result
+                stored = result_cache.peek(cache_key)
+                if stored is not None:
+                    return {**stored, 'pending': {}}
+                # Analyze all aspects with the engines for the requested mode, within the latency budget
+                budget_ms = submission.budget_ms or config.GRADING_BUDGET_MS or None
+                graded = grading_pipeline.grade(
+                    submission, mode=submission.mode, budget_ms=budget_ms,
+                    priority_class=priority_class, tenant=tenant
+                )
+                result_cache.put(cache_key, graded)
+                return graded
+
+            # Identical submissions already being graded wait for that run; each still gets its own row
+            result, coalesced = grading_flight.do(cache_key, compute)
+        GradingPipeline.apply(db_submission, result)
 
         # Save to DB
-        db.add(db_submission)
-        db.commit()
-        db.refresh(db_submission)
-
-        # Return structured response
-        return {
-            **db_submission.__dict__,
-            'grammar_analysis': grammar_analysis,
-            'lexical_analysis': lexical_analysis,
-            'coherence_analysis': coherence_analysis,
-            'task_achievement_analysis': task_analysis['task_achievement_analysis']
-        }
+        with timed("api", "db_commit"):
+            db.add(db_submission)
+            db.commit()
+            db.refresh(db_submission)
+
+        # Components that missed the deadline are written to the row when they finish
+        if result['pending']:
+            grading_pipeline.finish_in_background(db_submission.id, result['pending'], SessionLocal)
+        if signal_store is not None:
+            signal_store.save_when_complete(db_submission.id, result)
+            result_cache.link(cache_key, db_submission.id, result)
+        if revision_grader is not None:
+            # Revision 0's paragraph statistics, so a first revision only re-checks what it changed
+            revision_grader.seed(db_submission)
+        similar = _similar_submissions(db_submission)
+
+        # Return structured response (serialized here so the cost shows up in /metrics)
+        with timed("api", "serialization"):
+            response = schemas.submission.SubmissionResponse.model_validate(
+                {**GradingPipeline.response_payload(db_submission, result), 'similar_submissions': similar}
+            )
+            return Response(
+                content=response.model_dump_json(),
+                media_type="application/json",
+                headers={"X-Cache": "hit" if cached is not None else "coalesced" if coalesced else "miss"}
+            )
 
     except Exception as e:
         db.rollback()
         logger.error(f"Error processing submission: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/submit-writing/stream")
+def submit_writing_stream(
+    submission: schemas.submission.SubmissionCreate,
+    priority_class: Literal["interactive", "bulk"] = "interactive",
+    x_tenant_id: Optional[str] = Header(None),
+):
+    """Grade a submission as Server-Sent Events: a `component` event per analyzer as it
+    finishes within the budget, then a `result` event with the stored submission, its
+    ielts_score and the missing_components still being graded"""
+    return StreamingResponse(
+        _grade_events(submission, priority_class, x_tenant_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _similar_submissions(db_submission: Submission):
+    """Earlier near-duplicates of a stored submission, which is then added to the index"""
+    if similarity_index is None:
+        return None
+    try:
+        return similarity_index.check(db_submission.id, db_submission.text, SessionLocal)
+    except Exception as e:
+        # Detection is advisory; never fail grading over it
+        logger.error(f"Near-duplicate check failed for submission {db_submission.id}: {e}")
+        return None
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {data if isinstance(data, str) else json.dumps(data, default=str)}\n\n"
+
+
+def _grade_events(submission: schemas.submission.SubmissionCreate, priority_class: str, tenant: Optional[str]):
+    # The stream outlives the request's dependencies, so it keeps its own session
+    db = SessionLocal()
+    try:
+        with QUEUE_DEPTH.track_inprogress(), timed("api", "submit_writing_stream"):
+            cache_key = result_cache.key_for(submission, submission.mode)
+            result = result_cache.get(cache_key)
+            if result is not None:
+                result = {**result, 'pending': {}}
+                for name, key in (('grammar', 'grammar_analysis'), ('lexical', 'lexical_analysis'),
+                                  ('coherence', 'coherence_analysis'), ('task_achievement', 'task_analysis')):
+                    yield _sse("component", _component_event(name, result[key]))
+            else:
+                # Same overall deadline as the JSON endpoint; late components are listed in the result event
+                budget_ms = submission.budget_ms or config.GRADING_BUDGET_MS or None
+                for kind, name, payload in grading_pipeline.grade_stream(
+                        submission, mode=submission.mode, budget_ms=budget_ms,
+                        priority_class=priority_class, tenant=tenant):
+                    if kind == "component":
+                        yield _sse("component", _component_event(name, payload))
+                    else:
+                        result = payload
+                result_cache.put(cache_key, result)
+
+            db_submission = Submission(
+                text=submission.text,
+                task_type=submission.task_type,
+                question_number=submission.question_number,
+                question_desc=submission.question_desc,
+                question_requirements=submission.question_requirements,
+                locale=submission.locale
+            )
+            GradingPipeline.apply(db_submission, result)
+            db.add(db_submission)
+            db.commit()
+            db.refresh(db_submission)
+            if result['pending']:
+                grading_pipeline.finish_in_background(db_submission.id, result['pending'], SessionLocal)
+            if signal_store is not None:
+                signal_store.save_when_complete(db_submission.id, result)
+                result_cache.link(cache_key, db_submission.id, result)
+            if revision_grader is not None:
+                revision_grader.seed(db_submission)
+
+            response = schemas.submission.SubmissionResponse.model_validate({
+                **GradingPipeline.response_payload(db_submission, result),
+                'similar_submissions': _similar_submissions(db_submission),
+            })
+            yield _sse("result", response.model_dump_json())
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error streaming submission: {e}", exc_info=True)
+        yield _sse("error", {"detail": str(e)})
+    finally:
+        db.close()
+
+
+def _component_event(name: str, analysis) -> dict:
+    return {
+        "component": name,
+        "score": GradingPipeline.component_score(name, analysis),
+        "analysis": analysis,
+    }
+
+
+def _enqueue_submission(submission: schemas.submission.SubmissionCreate, idempotency_key: Optional[str],
+                        priority_class: str, tenant: Optional[str], db: Session):
+    try:
+        db_submission = Submission(
+            text=submission.text,
+            task_type=submission.task_type,
+            question_number=submission.question_number,
+            question_desc=submission.question_desc,
+            question_requirements=submission.question_requirements,
+            locale=submission.locale,
+            grading_mode=submission.mode,
+            grading_status="queued"
+        )
+        db.add(db_submission)
+        db.flush()
+        # The submission row and its job commit together; a repeated key returns the first submission
+        job = job_queue.enqueue(
+            db, db_submission.id, mode=submission.mode, idempotency_key=idempotency_key,
+            priority_class=priority_class, tenant=tenant
+        )
+        db_submission = db.query(Submission).filter(Submission.id == job.submission_id).first()
+
+        response = schemas.submission.SubmissionResponse.model_validate(db_submission.to_dict())
+        return Response(
+            content=response.model_dump_json(),
+            media_type="application/json",
+            status_code=202,
+            headers={"X-Job-Id": str(job.id)}
+        )
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error queueing submission: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/submissions/{submission_id}", response_model=schemas.submission.SubmissionResponse)
 async def get_submission(submission_id: int, db: Session = Depends(get_db)):
     submission = db.query(Submission).filter(Submission.id == submission_id).first()
@@ -177,6 +347,134 @@ async def get_submission(submission_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Submission not found")
     return submission
 
+@app.get("/api/submissions/{submission_id}/grammar-errors")
+async def get_grammar_errors(submission_id: int, page: int = Query(1, ge=1),
+                             page_size: int = Query(config.GRAMMAR_ERRORS_PAGE_SIZE, ge=1,
+                                                    le=config.GRAMMAR_ERRORS_MAX_PAGE_SIZE),
+                             sentence_id: Optional[int] = None, db: Session = Depends(get_db)):
+    """Every grammar error of a submission, a page at a time (optionally for one sentence)"""
+    submission = db.query(Submission).filter(Submission.id == submission_id).first()
+    if submission is None:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    errors = (submission.grammar_analysis or {}).get("error_details") or []
+    if sentence_id is not None:
+        errors = [error for error in errors if error.get("sentence_id") == sentence_id]
+    start = (page - 1) * page_size
+    return {
+        "submission_id": submission_id,
+        "page": page,
+        "page_size": page_size,
+        "total": len(errors),
+        "pages": (len(errors) + page_size - 1) // page_size,
+        "errors": errors[start:start + page_size],
+    }
+
+@app.post("/api/submissions/{submission_id}/revisions", response_model=schemas.submission.RevisionResponse)
+def add_revision(submission_id: int, revision: schemas.submission.RevisionCreate, db: Session = Depends(get_db)):
+    """Grade a revised draft, re-checking only the paragraphs that changed since the last revision"""
+    submission = db.query(Submission).filter(Submission.id == submission_id).first()
+    if submission is None:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    try:
+        with QUEUE_DEPTH.track_inprogress(), timed("api", "add_revision"):
+            stored = revision_grader.add(db, submission, revision.text, mode=revision.mode)
+    except IntegrityError:
+        # Another revision of this submission was stored first; its number is taken
+        db.rollback()
+        raise HTTPException(status_code=409, detail="A concurrent revision was stored first; resubmit")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error grading revision of submission {submission_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    return stored.to_dict(text=revision.text)
+
+@app.get("/api/submissions/{submission_id}/revisions")
+async def list_revisions(submission_id: int, db: Session = Depends(get_db)):
+    """Scores of every revision, oldest first (revision 0 is the submission itself)"""
+    submission = db.query(Submission).filter(Submission.id == submission_id).first()
+    if submission is None:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    revisions = [{
+        "number": 0, "ielts_score": submission.ielts_score, "grade": submission.grade,
+        "grading_mode": submission.grading_mode, "paragraphs": None, "created_at": submission.created_at,
+    }]
+    for revision in RevisionGrader.revisions(db, submission_id):
+        revisions.append({
+            "number": revision.number, "ielts_score": revision.ielts_score, "grade": revision.grade,
+            "grading_mode": revision.grading_mode, "paragraphs": revision.paragraphs,
+            "created_at": revision.created_at,
+        })
+    return {"submission_id": submission_id, "revisions": revisions}
+
+@app.get("/api/submissions/{submission_id}/revisions/{number}", response_model=schemas.submission.RevisionResponse)
+async def get_revision(submission_id: int, number: int, db: Session = Depends(get_db)):
+    """One revision with its text rebuilt from the stored deltas"""
+    submission = db.query(Submission).filter(Submission.id == submission_id).first()
+    revisions = RevisionGrader.revisions(db, submission_id) if submission is not None else []
+    if not 1 <= number <= len(revisions):
+        raise HTTPException(status_code=404, detail="Revision not found")
+    texts = RevisionGrader.texts(db, submission)
+    return revisions[number - 1].to_dict(text=texts[number])
+
+@app.get("/api/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str, format: str = "speedscope"):
+    """Download a stored request profile (speedscope, collapsed or summary)"""
+    suffixes = {
+        "speedscope": ".speedscope.json",
+        "collapsed": ".collapsed.txt",
+        "summary": ".summary.json",
+    }
+    if format not in suffixes:
+        raise HTTPException(status_code=400, detail=f"format must be one of {sorted(suffixes)}")
+    if not re.fullmatch(r"[0-9a-f]{32}", profile_id):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    path = os.path.join(config.PROFILE_DIR, profile_id + suffixes[format])
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path)
+
+@app.get("/api/cache", dependencies=[Depends(require_admin)])
+async def cache_stats():
+    """Result cache size and the scorer version it serves"""
+    return result_cache.stats()
+
+@app.delete("/api/cache", dependencies=[Depends(require_admin)])
+async def invalidate_cache(stale_only: bool = False):
+    """Drop cached results (all of them, or only other scorer versions); use after changing weights or models"""
+    return result_cache.invalidate(all_versions=not stale_only)
+
+@app.get("/api/grammar/pool", dependencies=[Depends(require_admin)])
+async def grammar_pool_stats():
+    """LanguageTool backends per locale: traffic share, memory and check latency"""
+    return grammar_service.pool.stats()
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: int):
+    """State of a queued grading job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "id": job.id,
+        "submission_id": job.submission_id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "last_error": job.last_error,
+    }
+
+@app.get("/api/jobs", dependencies=[Depends(require_admin)])
+async def job_stats():
+    """Queue depth by status, and analyzer scheduling by priority class"""
+    return {**job_queue.stats(), "scheduler": grading_pipeline.executor.stats()}
+
+# Prometheus scrape endpoint
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    if grammar_service is not None:
+        grammar_service.pool.stats()  # refreshes the per-locale RSS and traffic share gauges
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
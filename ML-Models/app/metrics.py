@@ -0,0 +1,301 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, tuned for analyzer stages (sub-millisecond
+# tokenizer work up to multi-second zero-shot passes on long essays)
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str],
+                   extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + body + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        """Increment the gauge for the duration of the block"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram; observations cost one bisect and a locked add"""
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._values[key] = state
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self, **labels) -> Dict[str, float]:
+        """Return count and sum for a label set (zeros when never observed)"""
+        state = self._values.get(self._key(labels))
+        if state is None:
+            return {"count": 0, "sum": 0.0}
+        return {"count": state[2], "sum": state[1]}
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            base = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{base} {_format_value(total)}"
+            yield f"{self.name}_count{base} {count}"
+
+
+class MetricsRegistry:
+    """Holds every metric of the process and renders the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, documentation, labelnames, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already registered with a different type or labels")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        PROCESS_RSS_BYTES.set(rss_bytes())
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        _render_cache_ratios(lines)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Core metrics shared by the API, the services and the offline tools
+STAGE_SECONDS = registry.histogram(
+    "ielts_stage_duration_seconds",
+    "Time spent in each analyzer stage",
+    ("service", "stage"),
+)
+QUEUE_DEPTH = registry.gauge(
+    "ielts_submission_queue_depth",
+    "Submissions currently waiting for or running through the analyzers",
+)
+CACHE_REQUESTS = registry.counter(
+    "ielts_cache_requests_total",
+    "Cache lookups by cache name and result",
+    ("cache", "result"),
+)
+MODEL_LOAD_SECONDS = registry.gauge(
+    "ielts_model_load_seconds",
+    "Wall time taken to load each model at startup",
+    ("model",),
+)
+MODEL_RSS_BYTES = registry.gauge(
+    "ielts_model_rss_bytes",
+    "Resident memory added to the process while loading each model",
+    ("model",),
+)
+PROCESS_RSS_BYTES = registry.gauge(
+    "ielts_process_resident_memory_bytes",
+    "Resident memory of this worker process",
+)
+
+
+def rss_bytes(pid: Optional[int] = None) -> int:
+    """Current resident set size of a process (this one by default), 0 if unknown"""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except Exception:
+        return 0
+
+
+@contextmanager
+def timed(service: str, stage: str):
+    """Time a block (or a decorated function) into the stage histogram"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, service=service, stage=stage)
+
+
+@contextmanager
+def model_load_timer(model: str):
+    """Record how long a model took to load and how much resident memory it added"""
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    yield
+    MODEL_LOAD_SECONDS.set(time.perf_counter() - start, model=model)
+    MODEL_RSS_BYTES.set(max(0, rss_bytes() - rss_before), model=model)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def _render_cache_ratios(lines: List[str]) -> None:
+    """Append a derived hit-ratio gauge per cache so dashboards need no PromQL"""
+    with CACHE_REQUESTS._lock:
+        values = dict(CACHE_REQUESTS._values)
+    caches = sorted({cache for cache, _ in values})
+    if not caches:
+        return
+    lines.append("# HELP ielts_cache_hit_ratio Fraction of cache lookups that were hits")
+    lines.append("# TYPE ielts_cache_hit_ratio gauge")
+    for cache in caches:
+        hits = values.get((cache, "hit"), 0.0)
+        total = hits + values.get((cache, "miss"), 0.0)
+        ratio = hits / total if total else 0.0
+        lines.append(f'ielts_cache_hit_ratio{{cache="{cache}"}} {_format_value(ratio)}')
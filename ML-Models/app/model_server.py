@@ -0,0 +1,397 @@
+"""Long-lived local inference process shared by API workers.
+
+spaCy, MiniLM and the zero-shot classifier are loaded once here instead of
+in every API worker. Workers talk to it over a Unix domain socket with a
+small binary protocol: each message is a 4-byte big-endian length followed
+by a msgpack map. Embeddings travel as raw float32 buffers and parses as
+spaCy DocBin bytes, so nothing is JSON-encoded on the hot path. Requests
+from all connections share the server's micro-batchers, so concurrent
+workers are batched together.
+
+Run with:  python -m app.model_server --socket /tmp/ielts-models.sock
+and point the API at it with MODEL_SERVER_SOCKET.
+"""
+import argparse
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+from . import config
+from .batching import MicroBatcher
+from .metrics import registry, model_load_timer
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("!I")
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+SERVER_REQUESTS = registry.counter(
+    "ielts_model_server_requests_total",
+    "Requests handled by the model server, by operation and outcome",
+    ("op", "status"),
+)
+CLIENT_SECONDS = registry.histogram(
+    "ielts_model_client_seconds",
+    "Round-trip time of model server calls as seen by an API worker",
+    ("op",),
+)
+
+
+class ModelServerError(RuntimeError):
+    """The model server could not be reached or failed the request"""
+
+
+class _ConnectionLost(ModelServerError):
+    """The connection failed before any of the response arrived; safe to send again"""
+
+
+# Socket errors meaning the server restarted or is not listening yet. Timeouts
+# are not among them: the server may still be working on the request.
+_RECONNECT_ERRORS = (ConnectionError, FileNotFoundError)
+
+
+# --- wire format ---------------------------------------------------------
+
+def pack_array(array) -> Dict[str, Any]:
+    """Raw float32 buffer plus shape; avoids per-element msgpack encoding"""
+    import numpy as np
+
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    return {"shape": list(array.shape), "data": array.tobytes()}
+
+
+def unpack_array(payload: Dict[str, Any]):
+    import numpy as np
+
+    return np.frombuffer(payload["data"], dtype=np.float32).reshape(payload["shape"])
+
+
+def send_message(sock: socket.socket, message: Dict[str, Any]) -> None:
+    import msgpack
+
+    body = msgpack.packb(message, use_bin_type=True)
+    sock.sendall(_HEADER.pack(len(body)) + body)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks, remaining = [], size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def recv_message(sock: socket.socket) -> Optional[Dict[str, Any]]:
+    """Next message, or None when the peer closed the connection"""
+    header = _recv_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    (size,) = _HEADER.unpack(header)
+    if size > MAX_MESSAGE_BYTES:
+        raise ModelServerError(f"Message of {size} bytes exceeds the {MAX_MESSAGE_BYTES} byte limit")
+    body = _recv_exactly(sock, size)
+    if body is None:
+        raise ModelServerError("Connection closed in the middle of a message")
+    import msgpack
+
+    return msgpack.unpackb(body, raw=False)
+
+
+# --- server side ---------------------------------------------------------
+
+class ModelBackend:
+    """The models themselves, with batchers shared by every connection"""
+
+    def __init__(self, nlp, encoder, classifier, max_batch_size: int = None, max_wait_ms: float = None):
+        self.nlp = nlp
+        self.encoder = encoder
+        self.classifier = classifier
+        max_batch_size = max_batch_size or config.INFERENCE_BATCH_MAX_SIZE
+        max_wait_ms = config.INFERENCE_BATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms
+        self.batchers = {
+            "encode": MicroBatcher("server_encode", self._encode_batch, max_batch_size, max_wait_ms),
+            "zero_shot": MicroBatcher("server_zero_shot", self._classify_batch, max_batch_size, max_wait_ms),
+            "parse": MicroBatcher("server_parse", self._parse_batch, max_batch_size, max_wait_ms),
+        }
+
+    @classmethod
+    def load(cls) -> "ModelBackend":
+        import spacy
+        from sentence_transformers import SentenceTransformer
+        from transformers import pipeline
+
+        with model_load_timer("spacy_en_core_web_md.model_server"):
+            nlp = spacy.load("en_core_web_md")
+        with model_load_timer("minilm_l6_v2.model_server"):
+            encoder = SentenceTransformer("all-MiniLM-L6-v2")
+        with model_load_timer("zero_shot_classifier.model_server"):
+            classifier = pipeline("zero-shot-classification")
+        return cls(nlp, encoder, classifier)
+
+    def _encode_batch(self, texts: List[str], group=None) -> List[Any]:
+        import numpy as np
+
+        embeddings = np.asarray(self.encoder.encode(texts, batch_size=len(texts)))
+        if embeddings.ndim == 1:
+            embeddings = embeddings.reshape(len(texts), -1)
+        return list(embeddings)
+
+    def _classify_batch(self, texts: List[str], group) -> List[Dict[str, Any]]:
+        labels, multi_label = group
+        results = self.classifier(
+            texts if len(texts) > 1 else texts[0],
+            candidate_labels=list(labels),
+            multi_label=multi_label,
+            batch_size=len(texts) * len(labels)
+        )
+        results = [results] if isinstance(results, dict) else list(results)
+        return [
+            {"labels": list(r["labels"]), "scores": [float(s) for s in r["scores"]]}
+            for r in results
+        ]
+
+    def _parse_batch(self, texts: List[str], group=None) -> List[Any]:
+        return list(self.nlp.pipe(texts, batch_size=len(texts)))
+
+    def handle(self, op: str, args: Dict[str, Any]) -> Any:
+        if op == "encode":
+            import numpy as np
+
+            return pack_array(np.vstack(self.batchers["encode"].map(args["texts"])))
+        if op == "zero_shot":
+            group = (tuple(args["labels"]), bool(args.get("multi_label", False)))
+            return self.batchers["zero_shot"].map(args["texts"], group)
+        if op == "parse":
+            from spacy.tokens import DocBin
+
+            return DocBin(docs=self.batchers["parse"].map(args["texts"])).to_bytes()
+        if op == "info":
+            return {"pid": os.getpid(), "ops": sorted(self.batchers)}
+        raise ValueError(f"Unknown operation: {op}")
+
+
+class _ConnectionHandler(socketserver.BaseRequestHandler):
+    """One API worker connection: requests are answered in order"""
+
+    def handle(self):
+        backend = self.server.backend
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (OSError, ModelServerError, ValueError) as e:
+                logger.error(f"Dropping model server connection: {e}")
+                return
+            if request is None:
+                return
+            op = request.get("op")
+            try:
+                response = {"ok": True, "result": backend.handle(op, request.get("args") or {})}
+                SERVER_REQUESTS.inc(op=str(op), status="ok")
+            except Exception as e:
+                logger.error(f"Model server {op} failed: {e}")
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                SERVER_REQUESTS.inc(op=str(op), status="error")
+            try:
+                send_message(self.request, response)
+            except OSError:
+                return
+
+
+class ModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, backend: ModelBackend):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)  # stale socket from a previous run
+        self.backend = backend
+        super().__init__(socket_path, _ConnectionHandler)
+        os.chmod(socket_path, 0o660)
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+# --- client side ---------------------------------------------------------
+
+class ModelClient:
+    """Thread-safe client; each thread keeps its own connection to the server"""
+
+    def __init__(self, socket_path: str, timeout: float = None):
+        self.socket_path = socket_path
+        self.timeout = config.MODEL_SERVER_TIMEOUT_S if timeout is None else timeout
+        self._local = threading.local()
+
+    def call(self, op: str, **args) -> Any:
+        with CLIENT_SECONDS.time(op=op):
+            try:
+                response = self._roundtrip({"op": op, "args": args})
+            except _ConnectionLost:
+                # The server may have restarted since this connection opened;
+                # it never answered, so the request is sent once more
+                response = self._roundtrip({"op": op, "args": args})
+        if not response.get("ok"):
+            raise ModelServerError(response.get("error", "unknown model server error"))
+        return response["result"]
+
+    def _roundtrip(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            sock = getattr(self._local, "sock", None)
+            if sock is None:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(self.timeout)
+                sock.connect(self.socket_path)
+                self._local.sock = sock
+            send_message(sock, message)
+            response = recv_message(sock)
+        except _RECONNECT_ERRORS as e:
+            self.close()
+            raise _ConnectionLost(f"Model server at {self.socket_path} unavailable: {e}")
+        except (OSError, ModelServerError) as e:
+            # Timeouts included: a late response would land on the next call, so
+            # the connection is dropped rather than reused
+            self.close()
+            raise ModelServerError(f"Model server call failed: {e}")
+        if response is None:
+            self.close()
+            raise _ConnectionLost("Model server closed the connection")
+        return response
+
+    def close(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+
+class RemoteEncoder:
+    """Stands in for SentenceTransformer: encode() returns a float32 array"""
+
+    def __init__(self, client: ModelClient):
+        self.client = client
+
+    def encode(self, texts, batch_size: int = None, **kwargs):
+        single = isinstance(texts, str)
+        embeddings = unpack_array(self.client.call("encode", texts=[texts] if single else list(texts)))
+        return embeddings[0] if single else embeddings
+
+
+class RemoteZeroShot:
+    """Stands in for the transformers zero-shot pipeline"""
+
+    def __init__(self, client: ModelClient):
+        self.client = client
+
+    def __call__(self, sequences, candidate_labels: Sequence[str], multi_label: bool = False,
+                 batch_size: int = None, **kwargs):
+        single = isinstance(sequences, str)
+        results = self.client.call(
+            "zero_shot",
+            texts=[sequences] if single else list(sequences),
+            labels=list(candidate_labels),
+            multi_label=multi_label
+        )
+        for text, result in zip([sequences] if single else sequences, results):
+            result["sequence"] = text
+        return results[0] if single else results
+
+
+class RemoteLanguage:
+    """Stands in for a spaCy pipeline: parsing is remote, tokenizing stays local.
+
+    Docs are rebuilt against a blank English vocab, which keeps tags, lemmas,
+    dependencies, entities and sentence boundaries but not word vectors.
+    """
+
+    def __init__(self, client: ModelClient, lang: str = "en"):
+        import spacy
+
+        self.client = client
+        self._blank = spacy.blank(lang)
+        self.vocab = self._blank.vocab
+        self._vocab_lock = threading.Lock()
+
+    def make_doc(self, text: str):
+        return self._blank.make_doc(text)
+
+    def __call__(self, text: str):
+        return self.pipe([text])[0]
+
+    def pipe(self, texts, batch_size: int = None, **kwargs) -> List[Any]:
+        from spacy.tokens import DocBin
+
+        data = self.client.call("parse", texts=list(texts))
+        # StringStore is not safe for concurrent inserts
+        with self._vocab_lock:
+            return list(DocBin().from_bytes(data).get_docs(self.vocab))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def shared_client() -> Optional[ModelClient]:
+    """Process-wide client when MODEL_SERVER_SOCKET is set, else None"""
+    global _client
+    if not config.MODEL_SERVER_SOCKET:
+        return None
+    with _client_lock:
+        if _client is None:
+            _client = ModelClient(config.MODEL_SERVER_SOCKET)
+        return _client
+
+
+def load_spacy(name: str = "en_core_web_md"):
+    client = shared_client()
+    if client is not None:
+        return RemoteLanguage(client)
+    import spacy
+
+    return spacy.load(name)
+
+
+def load_encoder(name: str = "all-MiniLM-L6-v2"):
+    client = shared_client()
+    if client is not None:
+        return RemoteEncoder(client)
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(name)
+
+
+def load_zero_shot():
+    client = shared_client()
+    if client is not None:
+        return RemoteZeroShot(client)
+    from transformers import pipeline
+
+    return pipeline("zero-shot-classification")
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve the grading models over a Unix socket")
+    parser.add_argument("--socket", default=config.MODEL_SERVER_SOCKET or "/tmp/ielts-models.sock")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    backend = ModelBackend.load()
+    server = ModelServer(args.socket, backend)
+    logger.info(f"Model server (pid {os.getpid()}) listening on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
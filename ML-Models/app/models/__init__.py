@@ -1,4 +1,9 @@
 from .submission import Submission
+from .cached_result import CachedResult
+from .grading_job import GradingJob
+from .stored_signals import StoredSignals
+from .submission_revision import SubmissionRevision
+from .paragraph_stats import ParagraphStats
 from ..database import Base
 
-__all__ = ['Submission', 'Base']
\ No newline at end of file
+__all__ = ['Submission', 'CachedResult', 'GradingJob', 'StoredSignals', 'SubmissionRevision', 'ParagraphStats', 'Base']
\ No newline at end of file
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON
+from sqlalchemy.sql import func
+from ..database import Base
+
+class CachedResult(Base):
+    __tablename__ = "cached_results"
+
+    # sha256 of the normalized submission fields, grading mode and scorer version
+    key = Column(String(64), primary_key=True)
+    scorer_version = Column(String, index=True)
+    result = Column(JSON)  # Grading pipeline output (complete results only)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_hit_at = Column(DateTime(timezone=True), nullable=True)
+    # Submission graded when the entry was computed; hits copy its stored model signals
+    source_submission_id = Column(Integer, nullable=True)
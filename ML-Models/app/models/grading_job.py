@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Index
+from sqlalchemy.sql import func
+from ..database import Base
+
+class GradingJob(Base):
+    __tablename__ = "grading_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    submission_id = Column(Integer, ForeignKey("submissions.id"), index=True)
+    # Client-supplied key; a retried request gets the original job back
+    idempotency_key = Column(String, unique=True, nullable=True)
+    mode = Column(String, default="full")  # fast / standard / full
+    priority = Column(Integer, default=0)  # Higher runs first
+    priority_class = Column(String, nullable=True)  # interactive / bulk, for the analyzer scheduler
+    tenant = Column(String, nullable=True)  # Fair-share group inside a priority class
+    status = Column(String, default="queued")  # queued / leased / done / failed
+
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    available_at = Column(DateTime(timezone=True), server_default=func.now())  # Retry backoff
+    lease_owner = Column(String, nullable=True)  # Worker id holding the job
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Claim scans: runnable jobs in priority order
+    __table_args__ = (Index("ix_grading_jobs_claim", "status", "priority", "available_at"),)
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, DateTime, JSON
+from sqlalchemy.sql import func
+from ..database import Base
+
+class ParagraphStats(Base):
+    __tablename__ = "paragraph_stats"
+
+    # sha256 of the kind, grading mode, locale, scorer version and paragraph text
+    key = Column(String(64), primary_key=True)
+    kind = Column(String)  # grammar / lexical / cohesion / paragraph
+    scorer_version = Column(String, index=True)
+    stats = Column(JSON)  # Mergeable per-paragraph statistics (matches, counters)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
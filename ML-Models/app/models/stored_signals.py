@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, LargeBinary, ForeignKey
+from sqlalchemy.sql import func
+from ..database import Base
+
+class StoredSignals(Base):
+    __tablename__ = "submission_signals"
+
+    submission_id = Column(Integer, ForeignKey("submissions.id"), primary_key=True)
+    scorer_version = Column(String, nullable=True)
+    grading_mode = Column(String, nullable=True)
+
+    doc_bin = Column(LargeBinary, nullable=True)  # spaCy DocBin of every parsed text (essay, paragraphs, question)
+    grammar_matches = Column(JSON, nullable=True)  # LanguageTool matches: offset, length, rule_id, category, replacements
+    embedding_keys = Column(JSON, nullable=True)  # sha1 of each embedded text, in row order
+    embedding_dim = Column(Integer, nullable=True)
+    embeddings = Column(LargeBinary, nullable=True)  # float16 matrix, len(embedding_keys) x embedding_dim
+    zero_shot = Column(JSON, nullable=True)  # Zero-shot labels and scores per (text, labels)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
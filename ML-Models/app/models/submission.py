@@ -11,12 +11,17 @@ class Submission(Base):
     question_number = Column(Integer)
     question_desc = Column(Text, nullable=True)  # New field
     question_requirements = Column(Text, nullable=True)  # New field
+    locale = Column(String, nullable=True)  # en-GB / en-US / ... used by the grammar check
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Overall scoring
     grade = Column(Float)  # Stores percentage (0-100)
     ielts_score = Column(Float)  # Stores IELTS score (1-9)
+    grading_mode = Column(String, nullable=True)  # fast / standard / full
+    grading_status = Column(String, nullable=True)  # complete / partial
+    missing_components = Column(JSON, nullable=True)  # Analyzers still finishing in the background
+    scorer_version = Column(String, nullable=True, index=True)  # Scoring logic that produced the scores
     
     # Grammar fields
     grammar_feedback = Column(Text, nullable=True)
@@ -46,8 +51,13 @@ class Submission(Base):
             'question_number': self.question_number,
             'question_desc': self.question_desc,
             'question_requirements': self.question_requirements,
+            'locale': self.locale,
             'grade': self.grade,
             'ielts_score': self.ielts_score,
+            'grading_mode': self.grading_mode,
+            'grading_status': self.grading_status,
+            'missing_components': self.missing_components,
+            'scorer_version': self.scorer_version,
             'created_at': self.created_at,
             'updated_at': self.updated_at,
             
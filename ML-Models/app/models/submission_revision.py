@@ -0,0 +1,47 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from ..database import Base
+
+class SubmissionRevision(Base):
+    __tablename__ = "submission_revisions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    submission_id = Column(Integer, ForeignKey("submissions.id"), index=True)
+    number = Column(Integer)  # 1 for the first revision; 0 is the submission's own text
+    # Edit script against the previous revision's text: ["copy", start, end] / ["insert", text]
+    delta = Column(JSON)
+    text_sha256 = Column(String(64))  # Checked when the text is rebuilt from the deltas
+    grading_mode = Column(String, nullable=True)
+    scorer_version = Column(String, nullable=True)
+
+    grade = Column(Float, nullable=True)
+    ielts_score = Column(Float, nullable=True)
+    component_scores = Column(JSON, nullable=True)
+    analyses = Column(JSON, nullable=True)  # grammar / lexical / coherence / task_achievement outputs
+    paragraphs = Column(JSON, nullable=True)  # Paragraph count, which changed, how many were reused
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (UniqueConstraint("submission_id", "number", name="uq_submission_revisions_number"),)
+
+    def to_dict(self, text=None):
+        """Response fields (text only when it has been rebuilt from the deltas)"""
+        analyses = self.analyses or {}
+        task = analyses.get('task_achievement')
+        return {
+            'id': self.id,
+            'submission_id': self.submission_id,
+            'number': self.number,
+            'text': text,
+            'grading_mode': self.grading_mode,
+            'scorer_version': self.scorer_version,
+            'grade': self.grade,
+            'ielts_score': self.ielts_score,
+            'component_scores': self.component_scores,
+            'paragraphs': self.paragraphs,
+            'grammar_analysis': analyses.get('grammar'),
+            'lexical_analysis': analyses.get('lexical'),
+            'coherence_analysis': analyses.get('coherence'),
+            'task_achievement_analysis': task['task_achievement_analysis'] if task else None,
+            'created_at': self.created_at,
+        }
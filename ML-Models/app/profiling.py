@@ -0,0 +1,255 @@
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+Frame = Tuple[str, str, int]  # (function, file, first line)
+
+# Worker threads currently running tasks for the profiled request; set by the
+# profiler in the request's context and carried to the workers by whoever
+# hands them the work (see worker_threads() / working_for())
+_worker_threads: ContextVar[Optional[Set[int]]] = ContextVar("profiled_worker_threads", default=None)
+
+
+def worker_threads() -> Optional[Set[int]]:
+    """The running profile's worker-thread set, or None when nothing is profiled"""
+    return _worker_threads.get()
+
+
+@contextmanager
+def working_for(threads: Optional[Set[int]]):
+    """Attribute the calling thread to the profile owning threads while inside"""
+    if threads is None:
+        yield
+        return
+    ident = threading.get_ident()
+    threads.add(ident)
+    try:
+        yield
+    finally:
+        threads.discard(ident)
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler for a thread and the workers it hands work to.
+
+    A daemon thread snapshots the target thread's Python stack every
+    `interval` seconds and counts identical stacks, so the profiled code
+    runs unmodified and the overhead is bounded by the sampling rate.
+    Threads named with one of `thread_prefixes` (e.g. the scheduler
+    workers running the analyzers) are sampled too, but only while they
+    run a task registered for this profile with working_for(); their
+    stacks are rooted at a frame named after the prefix.
+    """
+
+    def __init__(self, interval: float = 0.001, thread_id: Optional[int] = None,
+                 thread_prefixes: Sequence[str] = ()):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.thread_prefixes = tuple(thread_prefixes)
+        self.stacks: Counter = Counter()
+        self.sample_count = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._started_at = 0.0
+        self._workers: Set[int] = set()
+        self._context_token = None
+
+    def start(self) -> "SamplingProfiler":
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._stop.clear()
+        self._workers = set()
+        self._context_token = _worker_threads.set(self._workers)
+        self._started_at = time.perf_counter()
+        self._sampler = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self.duration = time.perf_counter() - self._started_at
+        if self._context_token is not None:
+            _worker_threads.reset(self._context_token)
+            self._context_token = None
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def _targets(self, sampler_id: int) -> List[Tuple[int, Optional[Frame]]]:
+        """(thread id, root frame) of every thread to sample; the target thread has no root"""
+        targets = [(self.thread_id, None)] if self.thread_id != sampler_id else []
+        if self.thread_prefixes and self._workers:
+            for thread in threading.enumerate():
+                if thread.ident not in self._workers or thread.ident in (self.thread_id, sampler_id):
+                    continue
+                prefix = next((p for p in self.thread_prefixes if thread.name.startswith(p)), None)
+                if prefix is not None:
+                    targets.append((thread.ident, (prefix.rstrip("-_"), "", 0)))
+        return targets
+
+    def _run(self):
+        sampler_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            sampled = False
+            for thread_id, root in self._targets(sampler_id):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = _stack(frame)
+                if root is not None:
+                    if _idle(stack):
+                        continue
+                    stack = (root,) + stack
+                self.stacks[stack] += 1
+                sampled = True
+            self.sample_count += sampled
+
+    @property
+    def seconds_per_sample(self) -> float:
+        return self.duration / self.sample_count if self.sample_count else self.interval
+
+    # ─── Exporters ───────────────────────────────────────────────
+    @staticmethod
+    def _frame_name(frame: Frame) -> str:
+        function, filename, line = frame
+        if not filename:
+            return function
+        return f"{function} ({_short_path(filename)}:{line})"
+
+    def to_collapsed(self) -> str:
+        """Brendan Gregg collapsed-stack format (one `a;b;c count` line per stack)"""
+        lines = [
+            ";".join(self._frame_name(frame) for frame in stack) + f" {count}"
+            for stack, count in self.stacks.most_common()
+        ]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def to_speedscope(self, name: str = "profile") -> Dict[str, Any]:
+        """Speedscope 'sampled' profile, loadable at https://www.speedscope.app"""
+        frame_index: Dict[Frame, int] = {}
+        frames: List[Dict[str, Any]] = []
+        samples: List[List[int]] = []
+        weights: List[float] = []
+        per_sample = self.seconds_per_sample
+
+        for stack, count in self.stacks.most_common():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                indexes.append(frame_index[frame])
+            samples.append(indexes)
+            weights.append(count * per_sample)
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "ielts-sampling-profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+    def top_functions(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Per-function self and cumulative time, most expensive first"""
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+        for stack, count in self.stacks.items():
+            if not stack:
+                continue
+            self_counts[stack[-1]] += count
+            for frame in set(stack):
+                total_counts[frame] += count
+
+        per_sample = self.seconds_per_sample
+        ranked = sorted(total_counts, key=lambda f: (self_counts[f], total_counts[f]), reverse=True)
+        return [
+            {
+                "function": self._frame_name(frame),
+                "self_seconds": round(self_counts[frame] * per_sample, 6),
+                "total_seconds": round(total_counts[frame] * per_sample, 6),
+                "self_samples": self_counts[frame],
+                "total_samples": total_counts[frame],
+            }
+            for frame in ranked[:limit]
+        ]
+
+    def save(self, directory: str, name: Optional[str] = None) -> Dict[str, str]:
+        """Write speedscope JSON, collapsed stacks and a summary; return their paths"""
+        profile_id = name or uuid.uuid4().hex
+        os.makedirs(directory, exist_ok=True)
+        paths = {
+            "speedscope": os.path.join(directory, f"{profile_id}.speedscope.json"),
+            "collapsed": os.path.join(directory, f"{profile_id}.collapsed.txt"),
+            "summary": os.path.join(directory, f"{profile_id}.summary.json"),
+        }
+        with open(paths["speedscope"], "w", encoding="utf-8") as f:
+            json.dump(self.to_speedscope(profile_id), f)
+        with open(paths["collapsed"], "w", encoding="utf-8") as f:
+            f.write(self.to_collapsed())
+        with open(paths["summary"], "w", encoding="utf-8") as f:
+            json.dump({
+                "profile_id": profile_id,
+                "duration_seconds": self.duration,
+                "samples": self.sample_count,
+                "top_functions": self.top_functions(),
+            }, f, indent=2)
+        return {"profile_id": profile_id, **paths}
+
+
+def profile_call(func: Callable, *args, interval: float = 0.001, thread_prefixes: Sequence[str] = (), **kwargs):
+    """Run func under the sampling profiler and return (result, profiler)"""
+    profiler = SamplingProfiler(interval=interval, thread_prefixes=thread_prefixes)
+    with profiler:
+        result = func(*args, **kwargs)
+    return result, profiler
+
+
+def _stack(frame) -> Tuple[Frame, ...]:
+    """Frames from the outermost call down to frame"""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+def _idle(stack: Tuple[Frame, ...]) -> bool:
+    """A worker parked on a condition or event, waiting for work"""
+    return bool(stack) and stack[-1][0] == "wait" and stack[-1][1] == threading.__file__
+
+
+def _short_path(filename: str) -> str:
+    """Trim site-packages / project prefixes so frame names stay readable"""
+    for marker in ("site-packages" + os.sep, os.sep + "app" + os.sep):
+        index = filename.rfind(marker)
+        if index >= 0:
+            return filename[index + len(marker):] if marker.startswith("site") else filename[index + 1:]
+    return filename
@@ -0,0 +1,308 @@
+"""Re-score stored submissions with the current scorer.
+
+Streams submissions in id order with keyset pagination (each chunk is an
+index range scan however deep into the table it is), grades them across a
+process pool, bulk-updates every chunk in one transaction and checkpoints
+after it, so an interrupted run resumes where it stopped. By default only
+rows whose scorer_version differs from the current one are touched.
+With --from-signals the stored model outputs (submission_signals) are
+replayed, so only the scoring formulas run.
+
+    python -m app.rescore --processes 8 --chunk-size 500
+    python -m app.rescore --all --mode standard --report rescore_report.json
+    python -m app.rescore --all --from-signals --processes 0
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import or_, update
+
+from . import config
+from .models.submission import Submission
+from .models.stored_signals import StoredSignals
+from .schemas.submission import SubmissionCreate
+from .services.grading_pipeline import GradingPipeline, ANALYZERS, SCORER_VERSION
+from .signals import SubmissionSignals
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_PATH = "rescore_checkpoint.json"
+REPORT_PATH = "rescore_report.json"
+LARGEST_CHANGES = 20
+
+# Columns read per row: grading inputs plus the scores the deltas compare against
+_ROW_COLUMNS = (
+    Submission.id, Submission.text, Submission.task_type, Submission.question_number,
+    Submission.question_desc, Submission.question_requirements, Submission.locale, Submission.grading_mode,
+    Submission.ielts_score, Submission.grammar_analysis, Submission.lexical_score,
+    Submission.task_achievement_score, Submission.coherence_score,
+)
+_SIGNAL_COLUMNS = (
+    StoredSignals.doc_bin, StoredSignals.grammar_matches, StoredSignals.embedding_keys,
+    StoredSignals.embedding_dim, StoredSignals.embeddings, StoredSignals.zero_shot,
+)
+
+
+def fetch_chunk(db, after_id: int, size: int, scorer_version: str, only_stale: bool,
+                with_signals: bool = False) -> List[Dict[str, Any]]:
+    """Next `size` submissions with id > after_id (plus their stored signals)"""
+    if with_signals:
+        query = db.query(*_ROW_COLUMNS, *_SIGNAL_COLUMNS).outerjoin(
+            StoredSignals, StoredSignals.submission_id == Submission.id
+        )
+    else:
+        query = db.query(*_ROW_COLUMNS)
+    query = query.filter(Submission.id > after_id)
+    if only_stale:
+        query = query.filter(or_(Submission.scorer_version.is_(None), Submission.scorer_version != scorer_version))
+    return [dict(row._mapping) for row in query.order_by(Submission.id).limit(size)]
+
+
+def _load_pipeline() -> GradingPipeline:
+    # Re-scoring has no latency budget: a stage timeout of 0 means no deadline
+    return GradingPipeline.load(stage_timeouts_ms=dict.fromkeys(ANALYZERS, 0))
+
+
+_pipeline = None
+
+
+def _init_process(pipeline_factory: Callable[[], GradingPipeline]) -> None:
+    """Load the analyzers once per pool process"""
+    global _pipeline
+    logging.basicConfig(level=logging.INFO)
+    _pipeline = pipeline_factory()
+
+
+def rescore_row(row: Dict[str, Any], mode: Optional[str] = None) -> Tuple[int, Optional[Dict[str, Any]], Optional[str]]:
+    """(id, new column values, error) for one stored submission"""
+    try:
+        submission = SubmissionCreate(
+            text=row["text"],
+            task_type=row["task_type"],
+            question_number=row["question_number"] or 0,
+            question_desc=row["question_desc"],
+            question_requirements=row["question_requirements"],
+            locale=row["locale"] or config.GRAMMAR_DEFAULT_LOCALE,
+            mode=mode or row["grading_mode"] or "full",
+        )
+        # Replay stored model outputs when the row carries them; anything missing is computed
+        signals = SubmissionSignals.from_row(row) if "doc_bin" in row else None
+        result = _pipeline.grade(submission, mode=submission.mode, priority_class="bulk", signals=signals)
+        if result["missing_components"]:
+            raise RuntimeError(f"analyzers did not finish: {result['missing_components']}")
+        values = SimpleNamespace()
+        GradingPipeline.apply(values, result)
+        return row["id"], vars(values), None
+    except Exception as e:
+        return row["id"], None, f"{type(e).__name__}: {e}"
+
+
+class DeltaReport:
+    """Running summary of old vs new scores; its state round-trips through the checkpoint"""
+
+    def __init__(self, state: Optional[Dict[str, Any]] = None):
+        self.state = state or {
+            "rescored": 0, "failed": 0, "changed": 0,
+            "delta_sum": 0.0, "abs_delta_sum": 0.0,
+            "band_shifts": {},
+            "components": {name: {"n": 0, "delta_sum": 0.0} for name in ANALYZERS},
+            "largest_changes": [],
+            "errors": [],
+        }
+
+    def add(self, row: Dict[str, Any], values: Dict[str, Any]) -> None:
+        s = self.state
+        s["rescored"] += 1
+        old_scores = GradingPipeline.stored_scores(SimpleNamespace(**row))
+        new_scores = GradingPipeline.stored_scores(SimpleNamespace(**values))
+        for name in ANALYZERS:
+            if old_scores[name] is not None and new_scores[name] is not None:
+                s["components"][name]["n"] += 1
+                s["components"][name]["delta_sum"] += new_scores[name] - old_scores[name]
+
+        old, new = row["ielts_score"], values["ielts_score"]
+        if old is None or new is None:
+            return
+        delta = new - old
+        s["delta_sum"] += delta
+        s["abs_delta_sum"] += abs(delta)
+        shift = f"{delta:+.1f}"
+        s["band_shifts"][shift] = s["band_shifts"].get(shift, 0) + 1
+        if delta:
+            s["changed"] += 1
+            s["largest_changes"].append({"id": row["id"], "old": old, "new": new, "delta": delta})
+            s["largest_changes"].sort(key=lambda change: -abs(change["delta"]))
+            del s["largest_changes"][LARGEST_CHANGES:]
+
+    def add_error(self, submission_id: int, error: str) -> None:
+        self.state["failed"] += 1
+        if len(self.state["errors"]) < LARGEST_CHANGES:
+            self.state["errors"].append({"id": submission_id, "error": error})
+
+    def to_dict(self) -> Dict[str, Any]:
+        s = self.state
+        compared = sum(s["band_shifts"].values())
+        return {
+            "rescored": s["rescored"],
+            "failed": s["failed"],
+            "changed": s["changed"],
+            "mean_delta": round(s["delta_sum"] / compared, 4) if compared else 0.0,
+            "mean_abs_delta": round(s["abs_delta_sum"] / compared, 4) if compared else 0.0,
+            "band_shifts": dict(sorted(s["band_shifts"].items(), key=lambda item: float(item[0]))),
+            "component_mean_deltas": {
+                name: round(c["delta_sum"] / c["n"], 4) if c["n"] else None
+                for name, c in s["components"].items()
+            },
+            "largest_changes": s["largest_changes"],
+            "errors": s["errors"],
+        }
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    """Atomic replace, so a crash never leaves a truncated checkpoint"""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _load_checkpoint(path: str, options: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("options") != options:
+        logger.warning(f"Ignoring checkpoint {path}: it was written for {checkpoint.get('options')}")
+        return None
+    return checkpoint
+
+
+def rescore(session_factory, mode: Optional[str] = None, only_stale: bool = True, chunk_size: int = 500,
+            processes: int = None, checkpoint_path: Optional[str] = CHECKPOINT_PATH,
+            limit: Optional[int] = None, pipeline_factory: Callable[[], GradingPipeline] = _load_pipeline,
+            scorer_version: str = SCORER_VERSION, from_signals: bool = False) -> Dict[str, Any]:
+    """Re-score stored submissions and return the delta report.
+
+    processes=0 grades in this process (pipeline_factory is then called
+    here); otherwise pipeline_factory must be picklable.
+    """
+    processes = os.cpu_count() if processes is None else processes
+    options = {"scorer_version": scorer_version, "mode": mode, "only_stale": only_stale, "from_signals": from_signals}
+    checkpoint = _load_checkpoint(checkpoint_path, options)
+    last_id = checkpoint["last_id"] if checkpoint else 0
+    report = DeltaReport(checkpoint["report"] if checkpoint else None)
+    if checkpoint:
+        logger.info(f"Resuming re-scoring after submission {last_id}")
+
+    pool = None
+    if processes:
+        pool = ProcessPoolExecutor(max_workers=processes, initializer=_init_process, initargs=(pipeline_factory,))
+    else:
+        _init_process(pipeline_factory)
+
+    def grade_chunk(rows: List[Dict[str, Any]]) -> Iterable:
+        if pool is None:
+            return (rescore_row(row, mode) for row in rows)
+        return pool.map(rescore_row, rows, [mode] * len(rows), chunksize=max(1, len(rows) // (processes * 4)))
+
+    started = time.perf_counter()
+    remaining = limit
+    exhausted = False
+    try:
+        db = session_factory()
+        try:
+            rows = fetch_chunk(db, last_id, min(chunk_size, remaining or chunk_size), scorer_version, only_stale, from_signals)
+            while rows:
+                results = grade_chunk(rows)
+                if remaining is not None:
+                    remaining -= len(rows)
+                # Read ahead while the pool grades this chunk
+                next_rows = (
+                    fetch_chunk(db, rows[-1]["id"], min(chunk_size, remaining or chunk_size), scorer_version, only_stale, from_signals)
+                    if remaining is None or remaining > 0 else []
+                )
+
+                by_id = {row["id"]: row for row in rows}
+                updates = []
+                for submission_id, values, error in results:
+                    if error:
+                        report.add_error(submission_id, error)
+                        logger.error(f"Re-scoring submission {submission_id} failed: {error}")
+                        continue
+                    report.add(by_id[submission_id], values)
+                    updates.append({"id": submission_id, **values})
+                if updates:
+                    # ORM bulk UPDATE by primary key: one executemany per chunk
+                    db.execute(update(Submission), updates)
+                db.commit()
+
+                last_id = rows[-1]["id"]
+                if checkpoint_path:
+                    _write_json(checkpoint_path, {"options": options, "last_id": last_id, "report": report.state})
+                elapsed = time.perf_counter() - started
+                logger.info(
+                    f"Re-scored through submission {last_id}: {report.state['rescored']} rows, "
+                    f"{report.state['failed']} failed, {report.state['rescored'] / max(elapsed, 1e-9):.1f} rows/s"
+                )
+                rows = next_rows
+            exhausted = remaining is None or remaining > 0
+        finally:
+            db.close()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # A run cut short by `limit` keeps its checkpoint for the next one
+    if exhausted and checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    summary = report.to_dict()
+    summary["scorer_version"] = scorer_version
+    summary["elapsed_seconds"] = round(time.perf_counter() - started, 2)
+    return summary
+
+
+def main(argv: List[str] = None) -> None:
+    from . import models
+    from .database import SessionLocal, engine, add_missing_columns
+
+    parser = argparse.ArgumentParser(description="Re-score stored submissions with the current scorer")
+    parser.add_argument("--mode", choices=("fast", "standard", "full"), default=None,
+                        help="grading mode (default: each submission's own mode)")
+    parser.add_argument("--all", action="store_true", help="include rows already on the current scorer version")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--processes", type=int, default=None, help="pool size (default: CPU count, 0: in-process)")
+    parser.add_argument("--limit", type=int, default=None, help="stop after this many rows")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--fresh", action="store_true", help="ignore an existing checkpoint")
+    parser.add_argument("--report", default=REPORT_PATH)
+    parser.add_argument("--from-signals", action="store_true",
+                        help="replay stored model outputs instead of running inference")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    models.Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+    if args.fresh and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    summary = rescore(
+        SessionLocal, mode=args.mode, only_stale=not args.all, chunk_size=args.chunk_size,
+        processes=args.processes, checkpoint_path=args.checkpoint, limit=args.limit,
+        from_signals=args.from_signals
+    )
+    _write_json(args.report, summary)
+    print(f"Re-scored {summary['rescored']} submissions ({summary['failed']} failed, "
+          f"{summary['changed']} changed band) in {summary['elapsed_seconds']}s")
+    print(f"Mean band delta {summary['mean_delta']:+.3f}, mean absolute delta {summary['mean_abs_delta']:.3f}")
+    print(f"Band shifts: {summary['band_shifts']}")
+    print(f"Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from sqlalchemy.sql import func
+
+from .metrics import record_cache, timed
+from .models.cached_result import CachedResult
+
+logger = logging.getLogger(__name__)
+
+
+def _sections(submission) -> list:
+    """Requested feedback sections; left out for full responses so their keys are unchanged"""
+    include = getattr(submission, "include", None)
+    return [] if include is None else [sorted(set(include))]
+
+
+def cache_key(submission, mode: str, scorer_version: str) -> str:
+    """sha256 over everything that can change the grading result.
+
+    Texts are keyed exactly as sent: any change in spacing, line endings or
+    Unicode composition moves the error offsets and sentence spans of the result.
+    """
+    payload = json.dumps([
+        submission.text or "",
+        getattr(submission, "question_desc", None) or "",
+        getattr(submission, "question_requirements", None) or "",
+        (submission.task_type or "").strip().lower(),
+        getattr(submission, "locale", None),
+        mode,
+        scorer_version,
+    ] + _sections(submission), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Two-tier cache of complete grading results: bounded in-memory LRU over a database table"""
+
+    def __init__(self, session_factory, scorer_version: str, max_entries: int = 1024):
+        self.session_factory = session_factory
+        self.scorer_version = scorer_version
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def key_for(self, submission, mode: str) -> str:
+        return cache_key(submission, mode, self.scorer_version)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached result for a key, promoting database hits into memory"""
+        if not self.enabled:
+            return None
+        with timed("cache", "memory_lookup"):
+            with self._lock:
+                result = self._entries.get(key)
+                if result is not None:
+                    self._entries.move_to_end(key)
+        record_cache("result_memory", result is not None)
+        if result is not None:
+            return result
+
+        with timed("cache", "db_lookup"):
+            result = self._load(key)
+        record_cache("result_db", result is not None)
+        if result is not None:
+            self._remember(key, result)
+        return result
+
+    def peek(self, key: str) -> Optional[Dict[str, Any]]:
+        """Memory-tier lookup without metrics or LRU promotion"""
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a complete result (pending futures, model signals and partial results are never cached)"""
+        if not self.enabled or result.get("missing_components"):
+            return
+        stored = {name: value for name, value in result.items() if name not in ("pending", "signals", "signals_from")}
+        self._remember(key, stored)
+        with timed("cache", "db_store"):
+            self._store(key, stored)
+
+    def link(self, key: str, submission_id: int, result: Dict[str, Any]) -> None:
+        """Record the submission a freshly computed result was stored for.
+
+        Its model signals are only saved under that submission, so hits carry
+        'signals_from' and SignalStore copies them to each new submission.
+        """
+        if not self.enabled or result.get("signals") is None or result.get("missing_components"):
+            return
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and "signals_from" not in entry:
+                self._entries[key] = {**entry, "signals_from": submission_id}
+        db = self.session_factory()
+        try:
+            db.query(CachedResult).filter(
+                CachedResult.key == key, CachedResult.source_submission_id.is_(None)
+            ).update({"source_submission_id": submission_id}, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Result cache link failed: {e}")
+        finally:
+            db.close()
+
+    def invalidate(self, all_versions: bool = True) -> Dict[str, int]:
+        """Drop cached results: every entry, or only those from other scorer versions"""
+        with self._lock:
+            memory = len(self._entries) if all_versions else 0
+            if all_versions:
+                self._entries.clear()
+        db = self.session_factory()
+        try:
+            query = db.query(CachedResult)
+            if not all_versions:
+                query = query.filter(CachedResult.scorer_version != self.scorer_version)
+            deleted = query.delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        if deleted or memory:
+            logger.info(f"Result cache invalidated: {memory} in memory, {deleted} in the database")
+        return {"memory_entries": memory, "database_rows": deleted}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            memory = len(self._entries)
+        db = self.session_factory()
+        try:
+            stored = db.query(func.count(CachedResult.key)).scalar()
+        finally:
+            db.close()
+        return {
+            "scorer_version": self.scorer_version,
+            "memory_entries": memory,
+            "memory_capacity": self.max_entries,
+            "database_rows": stored,
+        }
+
+    def _remember(self, key: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        db = self.session_factory()
+        try:
+            row = db.query(CachedResult).filter(
+                CachedResult.key == key, CachedResult.scorer_version == self.scorer_version
+            ).first()
+            if row is None:
+                return None
+            row.hit_count = (row.hit_count or 0) + 1
+            row.last_hit_at = func.now()
+            result = dict(row.result)
+            if row.source_submission_id is not None:
+                result["signals_from"] = row.source_submission_id
+            db.commit()
+            return result
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Result cache read failed: {e}")
+            return None
+        finally:
+            db.close()
+
+    def _store(self, key: str, result: Dict[str, Any]) -> None:
+        db = self.session_factory()
+        try:
+            db.merge(CachedResult(key=key, scorer_version=self.scorer_version, result=result, hit_count=0))
+            db.commit()
+        except Exception as e:
+            # A failed write only costs a future miss
+            db.rollback()
+            logger.error(f"Result cache write failed: {e}")
+        finally:
+            db.close()
@@ -0,0 +1,321 @@
+"""Draft revisions of a submission, graded incrementally by paragraph.
+
+A revision is stored as a delta against the previous revision's text (the
+submission's own text is revision 0): character ranges copied from it plus
+inserted text, from a paragraph-level difflib diff.
+
+Grading a revision does not re-run the analyzers over the whole essay. The
+text is cut into the same paragraph chunks the streaming analyzers use, and
+each chunk's mergeable statistics are looked up by content:
+
+- grammar: the chunk's normalized matches (offsets relative to the chunk),
+- lexical: LexicalCounts,
+- cohesion: CohesionCounts (linking devices, references, sentence lengths),
+- paragraph: sentence count and topic sentence quality of each paragraph.
+
+Only chunks whose statistics are not stored yet (in practice the edited
+paragraphs) are checked and parsed; the document-level scores are rebuilt
+by merging the chunks in order. Task achievement compares the whole essay
+with the question, so it is re-run on every revision.
+
+Revision 0's statistics are stored on the analyzer workers (bulk class)
+right after the submission is graded (RevisionGrader.seed), so the first
+revision already reuses every paragraph it did not change.
+"""
+import difflib
+import hashlib
+import json
+import logging
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import streaming
+from .metrics import record_cache, timed
+from .models.paragraph_stats import ParagraphStats
+from .models.submission import Submission
+from .models.submission_revision import SubmissionRevision
+from .services.grading_pipeline import GRADING_MODES, SCORER_VERSION, GradingPipeline
+from .signals import SubmissionSignals
+
+logger = logging.getLogger(__name__)
+
+
+def paragraph_units(text: str) -> List[Tuple[int, str]]:
+    """(offset, chunk) for the paragraph chunks of text, in order"""
+    units, offset = [], 0
+    for chunk in streaming.iter_chunks(text):
+        units.append((offset, chunk))
+        offset += len(chunk)
+    return units
+
+
+def make_delta(previous: str, text: str) -> List[list]:
+    """Edit script turning previous into text: ["copy", start, end] ranges of previous and ["insert", text]"""
+    old_units = paragraph_units(previous)
+    new_units = paragraph_units(text)
+    matcher = difflib.SequenceMatcher(None, [u for _, u in old_units], [u for _, u in new_units], autojunk=False)
+    delta: List[list] = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            start = old_units[i1][0]
+            end = old_units[i2 - 1][0] + len(old_units[i2 - 1][1])
+            if delta and delta[-1][0] == "copy" and delta[-1][2] == start:
+                delta[-1][2] = end
+            else:
+                delta.append(["copy", start, end])
+        elif j2 > j1:  # replace / insert; deletions simply aren't copied
+            delta.append(["insert", "".join(u for _, u in new_units[j1:j2])])
+    return delta
+
+
+def apply_delta(previous: str, delta: List[list]) -> str:
+    return "".join(previous[op[1]:op[2]] if op[0] == "copy" else op[1] for op in delta)
+
+
+def changed_units(previous: str, text: str) -> List[int]:
+    """Indices of text's paragraph chunks that are new or edited relative to previous"""
+    matcher = difflib.SequenceMatcher(
+        None, [u for _, u in paragraph_units(previous)], [u for _, u in paragraph_units(text)], autojunk=False
+    )
+    return [j for tag, _, _, j1, j2 in matcher.get_opcodes() if tag != "equal" for j in range(j1, j2)]
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ParagraphStatsCache:
+    """Per-paragraph statistics keyed by content, grading mode and scorer version"""
+
+    def __init__(self, session_factory, scorer_version: str = SCORER_VERSION):
+        self.session_factory = session_factory
+        self.scorer_version = scorer_version
+
+    def key(self, kind: str, mode: str, text: str, locale: Optional[str] = None) -> str:
+        return _sha256(json.dumps([kind, mode, locale, self.scorer_version, text], ensure_ascii=False))
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        if not keys:
+            return {}
+        db = self.session_factory()
+        try:
+            rows = db.query(ParagraphStats).filter(ParagraphStats.key.in_(set(keys))).all()
+            return {row.key: row.stats for row in rows}
+        finally:
+            db.close()
+
+    def put_many(self, entries: Dict[str, Tuple[str, Any]]) -> None:
+        """Store {key: (kind, stats)}; failures only cost a recomputation later"""
+        if not entries:
+            return
+        db = self.session_factory()
+        try:
+            for key, (kind, stats) in entries.items():
+                db.merge(ParagraphStats(key=key, kind=kind, scorer_version=self.scorer_version, stats=stats))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to store paragraph statistics: {e}")
+        finally:
+            db.close()
+
+    def invalidate(self, all_versions: bool = False) -> Dict[str, int]:
+        """Drop stored statistics (all, or only those of other scorer versions)"""
+        db = self.session_factory()
+        try:
+            query = db.query(ParagraphStats)
+            if not all_versions:
+                query = query.filter(ParagraphStats.scorer_version != self.scorer_version)
+            removed = query.delete(synchronize_session=False)
+            db.commit()
+            return {"removed": removed}
+        finally:
+            db.close()
+
+
+class RevisionGrader:
+    """Grades revisions from per-paragraph statistics and stores them as deltas"""
+
+    def __init__(self, pipeline: GradingPipeline, session_factory, scorer_version: str = SCORER_VERSION):
+        self.pipeline = pipeline
+        self.stats = ParagraphStatsCache(session_factory, scorer_version)
+
+    # --- history ---------------------------------------------------------
+
+    @staticmethod
+    def revisions(db, submission_id: int) -> List[SubmissionRevision]:
+        return (db.query(SubmissionRevision)
+                .filter(SubmissionRevision.submission_id == submission_id)
+                .order_by(SubmissionRevision.number).all())
+
+    @classmethod
+    def texts(cls, db, submission: Submission) -> List[str]:
+        """Text of every revision, from revision 0 (the submission) on"""
+        texts = [submission.text or ""]
+        for revision in cls.revisions(db, submission.id):
+            text = apply_delta(texts[-1], revision.delta)
+            if _sha256(text) != revision.text_sha256:
+                raise ValueError(f"Revision {revision.number} of submission {submission.id} does not rebuild")
+            texts.append(text)
+        return texts
+
+    def add(self, db, submission: Submission, text: str, mode: Optional[str] = None) -> SubmissionRevision:
+        """Grade text as the next revision of submission and store it"""
+        mode = mode or submission.grading_mode or "full"
+        if mode not in GRADING_MODES:
+            raise ValueError(f"Unknown grading mode '{mode}', expected one of {GRADING_MODES}")
+        previous = self.texts(db, submission)
+        result = self.grade(submission, text, mode, previous=previous[-1])
+        revision = SubmissionRevision(
+            submission_id=submission.id,
+            number=len(previous),
+            delta=make_delta(previous[-1], text),
+            text_sha256=_sha256(text),
+            grading_mode=mode,
+            scorer_version=result['scorer_version'],
+            grade=result['grade'],
+            ielts_score=result['ielts_score'],
+            component_scores=result['component_scores'],
+            analyses={
+                'grammar': result['grammar_analysis'],
+                'lexical': result['lexical_analysis'],
+                'coherence': result['coherence_analysis'],
+                'task_achievement': result['task_analysis'],
+            },
+            paragraphs=result['paragraphs'],
+        )
+        db.add(revision)
+        db.commit()
+        db.refresh(revision)
+        return revision
+
+    def seed(self, submission: Submission) -> Future:
+        """Store the paragraph statistics of revision 0 (the submission) in the background"""
+        return self.pipeline.executor.submit(
+            self._seed, submission.text or "", submission.grading_mode or "full", submission.locale,
+            priority_class="bulk",
+        )
+
+    def _seed(self, text: str, mode: str, locale: Optional[str]) -> None:
+        try:
+            with timed("revision", "seed"):
+                self._paragraph_stats(text, mode, locale)
+        except Exception as e:
+            logger.error(f"Failed to store paragraph statistics of revision 0: {e}")
+
+    # --- grading ---------------------------------------------------------
+
+    def grade(self, submission, text: str, mode: str = "full", previous: Optional[str] = None) -> Dict[str, Any]:
+        """Pipeline-shaped result for text, recomputing only paragraphs without stored statistics"""
+        pipeline = self.pipeline
+        locale = getattr(submission, "locale", None)
+        revised = Submission(
+            text=text, task_type=submission.task_type, question_number=submission.question_number,
+            question_desc=submission.question_desc, question_requirements=submission.question_requirements,
+            locale=locale,
+        )
+        # The essay-level stage runs on the analyzer workers meanwhile
+        task_future = pipeline.executor.submit(
+            pipeline._run_stage, "task_achievement", revised, mode, SubmissionSignals()
+        )
+
+        with timed("revision", "paragraph_stats"):
+            stats, computed = self._paragraph_stats(text, mode, locale)
+        with timed("revision", "merge"):
+            analyses = self._merge(text, mode, stats)
+        analyses['task_achievement'] = task_future.result()
+
+        scores = {name: pipeline.component_score(name, analysis) for name, analysis in analyses.items()}
+        ielts_score, percentage_grade = pipeline.combine_scores(scores)
+        units = stats['units']
+        return {
+            'grading_mode': mode,
+            'scorer_version': self.stats.scorer_version,
+            'ielts_score': ielts_score,
+            'grade': percentage_grade,
+            'component_scores': scores,
+            'grammar_analysis': analyses['grammar'],
+            'lexical_analysis': analyses['lexical'],
+            'task_analysis': analyses['task_achievement'],
+            'coherence_analysis': analyses['coherence'],
+            'missing_components': [],
+            'pending': {},
+            'paragraphs': {
+                'count': len(units),
+                'changed': changed_units(previous, text) if previous is not None else list(range(len(units))),
+                'recomputed': computed,
+                'reused': len(units) - len(computed),
+            },
+        }
+
+    def _paragraph_stats(self, text: str, mode: str, locale: Optional[str]) -> Tuple[Dict[str, Any], List[int]]:
+        """Stored or freshly computed statistics per chunk (and per paragraph for the structure score)"""
+        fast = mode == "fast"
+        units = paragraph_units(text)
+        paragraphs = text.split('\n\n')
+        keys = {
+            'grammar': [self.stats.key('grammar', mode, unit, locale) for _, unit in units],
+            'lexical': [self.stats.key('lexical', mode, unit) for _, unit in units],
+            'cohesion': [self.stats.key('cohesion', mode, unit) for _, unit in units],
+            'paragraph': [self.stats.key('paragraph', mode, p) for p in paragraphs],
+        }
+        stored = self.stats.get_many([key for kind_keys in keys.values() for key in kind_keys])
+        missing = sorted({
+            i for kind in ('grammar', 'lexical', 'cohesion')
+            for i, key in enumerate(keys[kind]) if key not in stored
+        })
+        for i in range(len(units)):
+            record_cache("revision_paragraph", i not in missing)
+
+        new: Dict[str, Tuple[str, Any]] = {}
+        if missing:
+            lexical = self.pipeline.lexical_service
+            coherence = self.pipeline.coherence_service
+            texts = [units[i][1] for i in missing]
+            with timed("revision", "grammar_check"):
+                for i, unit in zip(missing, texts):
+                    new[keys['grammar'][i]] = ('grammar', self.pipeline.grammar_service.check(unit, mode, locale))
+            with timed("revision", "tokenize" if fast else "spacy_parse"):
+                if fast:
+                    docs = [lexical.sentencizer(lexical.nlp.make_doc(unit)) for unit in texts]
+                else:
+                    docs = list(lexical.nlp.pipe(texts))
+            for i, doc in zip(missing, docs):
+                new[keys['lexical'][i]] = ('lexical', lexical.counts(doc).to_dict())
+                new[keys['cohesion'][i]] = ('cohesion', coherence.counts(fast).add(doc).to_dict())
+        for paragraph, key in zip(paragraphs, keys['paragraph']):
+            if key not in stored and key not in new:
+                new[key] = ('paragraph', self.pipeline.coherence_service.paragraph_detail(paragraph, fast))
+        self.stats.put_many(new)
+
+        found = {**stored, **{key: entry[1] for key, entry in new.items()}}
+        stats = {kind: [found[key] for key in kind_keys] for kind, kind_keys in keys.items()}
+        stats['units'] = units
+        stats['paragraphs'] = paragraphs
+        return stats, missing
+
+    def _merge(self, text: str, mode: str, stats: Dict[str, Any]) -> Dict[str, Any]:
+        """Document-level analyses from the per-chunk statistics, in text order"""
+        fast = mode == "fast"
+        lexical = self.pipeline.lexical_service
+        coherence = self.pipeline.coherence_service
+
+        matches = [
+            {**match, "offset": match["offset"] + offset}
+            for (offset, _), unit_matches in zip(stats['units'], stats['grammar'])
+            for match in unit_matches
+        ]
+        grammar = self.pipeline.format_grammar(self.pipeline.grammar_service.score_matches(text, matches), text)
+
+        lexical_counts = lexical.counts()
+        cohesion_counts = coherence.counts(fast)
+        for lexical_state, cohesion_state in zip(stats['lexical'], stats['cohesion']):
+            lexical_counts.merge(lexical.counts().load(lexical_state))
+            cohesion_counts.merge(coherence.counts(fast).load(cohesion_state))
+
+        return {
+            'grammar': grammar,
+            'lexical': lexical.analyze_counts(lexical_counts, mode),
+            'coherence': coherence.analyze_counts(stats['paragraphs'], stats['paragraph'], cohesion_counts),
+        }
+
@@ -0,0 +1,193 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, Optional
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_CLASSES = ("interactive", "bulk")
+# Worker threads are named scheduler-0, scheduler-1, ... (the request profiler samples them)
+THREAD_NAME_PREFIX = "scheduler-"
+
+QUEUE_WAIT_SECONDS = registry.histogram(
+    "ielts_scheduler_queue_wait_seconds",
+    "Time analyzer tasks waited for a worker, by priority class",
+    ("priority_class",),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+QUEUED_TASKS = registry.gauge(
+    "ielts_scheduler_queued_tasks",
+    "Analyzer tasks waiting for a worker, by priority class",
+    ("priority_class",),
+)
+RUNNING_TASKS = registry.gauge(
+    "ielts_scheduler_running_tasks",
+    "Analyzer tasks currently running, by priority class",
+    ("priority_class",),
+)
+
+
+def parse_class_setting(value: str) -> Dict[str, float]:
+    """'interactive=4,bulk=1' -> {'interactive': 4.0, 'bulk': 1.0}"""
+    setting = {}
+    for part in filter(None, (p.strip() for p in value.split(","))):
+        name, _, number = part.partition("=")
+        setting[name.strip()] = float(number)
+    return setting
+
+
+class _Task:
+    __slots__ = ("fn", "args", "kwargs", "future", "enqueued_at")
+
+    def __init__(self, fn, args, kwargs):
+        self.fn, self.args, self.kwargs = fn, args, kwargs
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class _ClassQueue:
+    """One priority class: a FIFO per tenant, served round-robin"""
+
+    def __init__(self, weight: float, reserved: int):
+        self.weight = max(weight, 1e-6)
+        self.reserved = reserved
+        self.tenants: "OrderedDict[str, Deque[_Task]]" = OrderedDict()
+        self.size = 0
+        self.running = 0
+        # Virtual time: grows by 1/weight per dispatched task
+        self.vtime = 0.0
+
+    def push(self, tenant: str, task: _Task) -> None:
+        self.tenants.setdefault(tenant, deque()).append(task)
+        self.size += 1
+
+    def pop(self) -> _Task:
+        tenant, tasks = next(iter(self.tenants.items()))
+        task = tasks.popleft()
+        # Rotate the tenant to the back so one tenant's backlog can't starve another
+        del self.tenants[tenant]
+        if tasks:
+            self.tenants[tenant] = tasks
+        self.size -= 1
+        return task
+
+
+class FairScheduler:
+    """Executor that shares a fixed worker pool between priority classes.
+
+    Classes get workers in proportion to their weights (weighted fair
+    queuing on a per-class virtual clock), tenants inside a class take turns,
+    and `reserved` workers per class are kept free for that class: other
+    classes only start a task while the free workers exceed the unused
+    reservations. A flood of bulk work therefore never occupies the workers
+    held back for interactive requests. Drop-in for ThreadPoolExecutor.submit.
+    """
+
+    def __init__(self, max_workers: int, weights: Dict[str, float] = None,
+                 reserved: Dict[str, int] = None, default_class: str = "interactive"):
+        weights = weights or {}
+        reserved = reserved or {}
+        self.max_workers = max_workers
+        self.default_class = default_class
+        names = list(dict.fromkeys([*PRIORITY_CLASSES, *weights, *reserved]))
+        if sum(int(reserved.get(name, 0)) for name in names) >= max_workers:
+            raise ValueError(f"Reserved capacity {reserved} leaves no shared workers out of {max_workers}")
+        self.classes = {
+            name: _ClassQueue(float(weights.get(name, 1.0)), int(reserved.get(name, 0)))
+            for name in names
+        }
+        self._cond = threading.Condition()
+        self._shutdown = False
+        self._workers = [
+            threading.Thread(target=self._work, name=f"{THREAD_NAME_PREFIX}{i}", daemon=True)
+            for i in range(max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, fn: Callable, *args, priority_class: str = None, tenant: Optional[str] = None,
+               **kwargs) -> Future:
+        name = priority_class or self.default_class
+        if name not in self.classes:
+            raise ValueError(f"Unknown priority class '{name}', expected one of {tuple(self.classes)}")
+        task = _Task(fn, args, kwargs)
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new tasks after shutdown")
+            queue = self.classes[name]
+            if not queue.size:
+                # A class returning from idle starts level with the least-served active class
+                # instead of spending credit it banked while it had nothing to run
+                active = [q.vtime for q in self.classes.values() if q.size or q.running]
+                queue.vtime = max(queue.vtime, min(active, default=queue.vtime))
+            queue.push(tenant or "default", task)
+            QUEUED_TASKS.inc(priority_class=name)
+            self._cond.notify()
+        return task.future
+
+    def _eligible(self, name: str, queue: _ClassQueue) -> bool:
+        if not queue.size:
+            return False
+        running = sum(q.running for q in self.classes.values())
+        held_back = sum(
+            max(0, other.reserved - other.running)
+            for other_name, other in self.classes.items() if other_name != name
+        )
+        return self.max_workers - running > held_back
+
+    def _next(self):
+        """Eligible class with the lowest virtual time, or None"""
+        best = None
+        for name, queue in self.classes.items():
+            if self._eligible(name, queue) and (best is None or queue.vtime < self.classes[best].vtime):
+                best = name
+        return best
+
+    def _work(self) -> None:
+        while True:
+            with self._cond:
+                name = self._next()
+                while name is None:
+                    if self._shutdown and not any(q.size for q in self.classes.values()):
+                        return
+                    self._cond.wait()
+                    name = self._next()
+                queue = self.classes[name]
+                task = queue.pop()
+                queue.running += 1
+                queue.vtime += 1.0 / queue.weight
+            QUEUED_TASKS.dec(priority_class=name)
+            RUNNING_TASKS.inc(priority_class=name)
+            QUEUE_WAIT_SECONDS.observe(time.perf_counter() - task.enqueued_at, priority_class=name)
+            try:
+                if task.future.set_running_or_notify_cancel():
+                    try:
+                        task.future.set_result(task.fn(*task.args, **task.kwargs))
+                    except BaseException as e:
+                        task.future.set_exception(e)
+            finally:
+                RUNNING_TASKS.dec(priority_class=name)
+                with self._cond:
+                    queue.running -= 1
+                    # A finished task may unblock a class waiting on reserved capacity
+                    self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                name: {"queued": q.size, "running": q.running, "weight": q.weight, "reserved": q.reserved}
+                for name, q in self.classes.items()
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting tasks; queued ones still run"""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
@@ -1,6 +1,7 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any, Literal
 from .feedback import LexicalFeedback
+from .. import config
 class CoherenceFeedback(BaseModel):
     strengths: List[str]
     improvements: List[str]
@@ -19,7 +20,16 @@ class SubmissionBase(BaseModel):
     question_requirements: Optional[str] = None  # New field for question requirements
 
 class SubmissionCreate(SubmissionBase):
-    pass
+    # Hard cap on input size (longer texts are rejected with 422)
+    text: str = Field(..., max_length=config.MAX_TEXT_CHARS)
+    # fast: heuristics only, standard: no zero-shot NLI, full: every model
+    mode: Literal["fast", "standard", "full"] = "full"
+    # Latency budget for the response; late components are completed in the background
+    budget_ms: Optional[int] = Field(None, gt=0)
+    # English variant the grammar check follows
+    locale: Literal["en-GB", "en-US", "en-AU", "en-CA", "en-NZ", "en-ZA"] = "en-GB"
+    # Feedback sections to compute (see app.fields); None for all, [] for band scores only
+    include: Optional[List[Literal["feedback", "suggestions", "details", "sentences"]]] = None
 
 class GrammarAnalysis(BaseModel):
     overall_score: float
@@ -50,10 +60,19 @@ class TaskAchievementAnalysis(BaseModel):
     detailed_analysis: Dict[str, Any]
     feedback: TaskAchievementFeedback
 
+class SimilarSubmission(BaseModel):
+    submission_id: int
+    jaccard: float  # MinHash estimate over word shingles
+
 class SubmissionResponse(SubmissionBase):
     id: int
-    grade: float
+    grade: Optional[float]
     ielts_score: Optional[float]
+    grading_mode: Optional[str] = None
+    grading_status: Optional[str] = None  # "partial" while missing_components finish
+    missing_components: Optional[List[str]] = None
+    scorer_version: Optional[str] = None
+    locale: Optional[str] = None
     
     # Grammar fields
     grammar_feedback: Optional[str]
@@ -72,6 +91,32 @@ class SubmissionResponse(SubmissionBase):
     coherence_score: Optional[float]
     coherence_feedback: Optional[CoherenceFeedback]
     coherence_analysis: Optional[CoherenceAnalysis]
+    # Earlier submissions this essay nearly duplicates (set at submission time only)
+    similar_submissions: Optional[List[SimilarSubmission]] = None
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class RevisionCreate(BaseModel):
+    text: str = Field(..., min_length=1, max_length=config.MAX_TEXT_CHARS)
+    # Defaults to the mode the submission was graded with
+    mode: Optional[Literal["fast", "standard", "full"]] = None
+
+
+class RevisionResponse(BaseModel):
+    id: int
+    submission_id: int
+    number: int
+    text: Optional[str] = None
+    grading_mode: Optional[str] = None
+    scorer_version: Optional[str] = None
+    grade: Optional[float] = None
+    ielts_score: Optional[float] = None
+    component_scores: Optional[Dict[str, float]] = None
+    # Paragraph count, indices of changed paragraphs, how many were recomputed / reused
+    paragraphs: Optional[Dict[str, Any]] = None
+    grammar_analysis: Optional[GrammarAnalysis] = None
+    lexical_analysis: Optional[LexicalAnalysis] = None
+    coherence_analysis: Optional[CoherenceAnalysis] = None
+    task_achievement_analysis: Optional[TaskAchievementAnalysis] = None
+    created_at: Optional[Any] = None
@@ -1,8 +1,136 @@
-import spacy
+import re
 import nltk
+from bisect import bisect_right
+from spacy.pipeline import Sentencizer
 from typing import Dict, List, Any
 from collections import Counter
 from nltk.tokenize import sent_tokenize, word_tokenize
+from ..metrics import timed, model_load_timer
+from ..model_server import load_spacy
+from .. import config, fields, signals, streaming
+
+# Personal/demonstrative pronouns used when no POS tagger runs (fast mode)
+PRONOUNS = {
+    'i', 'me', 'my', 'mine', 'we', 'us', 'our', 'ours', 'you', 'your', 'yours',
+    'he', 'him', 'his', 'she', 'her', 'hers', 'it', 'its', 'they', 'them', 'their',
+    'theirs', 'this', 'that', 'these', 'those', 'itself', 'themselves', 'ourselves'
+}
+
+class CohesionCounts:
+    """Running linking-device, reference and sentence-length totals, fed one Doc at a time.
+
+    Adding an essay's paragraph docs in order gives the same analysis as
+    adding the whole essay's Doc, so long texts can be streamed; counts of
+    separate paragraphs merge the same way. `fast` selects the tagger-free
+    variants (phrase index, lexical references).
+    """
+
+    def __init__(self, service: "CoherenceCohesionService", fast: bool = False):
+        self.service = service
+        self.fast = fast
+        self.linking_device_counts = {category: 0 for category in service.linking_phrases}
+        self.noun_references = Counter()
+        self.pronoun_references = Counter()
+        self.sentence_lengths: List[int] = []
+
+    def add(self, doc) -> "CohesionCounts":
+        sentences = list(doc.sents)
+        self.add_linking_devices(sentences, doc)
+        self.add_references(sentences)
+        self.add_sentence_lengths(sentences)
+        return self
+
+    def add_linking_devices(self, sentences, doc=None) -> None:
+        if self.fast:
+            # One regex pass over the doc, bucketed by sentence
+            sentence_starts = [sentence.start_char for sentence in sentences]
+            # Count each phrase at most once per sentence, like the per-sentence scan
+            seen = set()
+            for match in self.service.phrase_index.finditer(doc.text):
+                phrase = match.group(1).lower()
+                sentence_id = bisect_right(sentence_starts, match.start()) - 1
+                if (sentence_id, phrase) not in seen:
+                    seen.add((sentence_id, phrase))
+                    self.linking_device_counts[self.service.phrase_category[phrase]] += 1
+            return
+        for sentence in sentences:
+            for category, phrases in self.service.linking_phrases.items():
+                for phrase in phrases:
+                    if phrase.lower() in sentence.text.lower():
+                        self.linking_device_counts[category] += 1
+
+    def add_references(self, sentences) -> None:
+        for sentence in sentences:
+            for token in sentence:
+                if self.fast:
+                    # Content words stand in for nouns, a fixed list for pronouns
+                    lower = token.lower_
+                    if lower in PRONOUNS:
+                        self.pronoun_references[token.text] += 1
+                    elif token.is_alpha and not token.is_stop and len(lower) > 3:
+                        self.noun_references[lower] += 1
+                    continue
+                if token.pos_ == 'NOUN':
+                    self.noun_references[token.lemma_] += 1
+                if token.pos_ == 'PRON':
+                    self.pronoun_references[token.text] += 1
+
+    def add_sentence_lengths(self, sentences) -> None:
+        self.sentence_lengths.extend(len(list(sent)) for sent in sentences)
+
+    def merge(self, other: "CohesionCounts") -> "CohesionCounts":
+        """Add the counts of the text that follows this one"""
+        for category, count in other.linking_device_counts.items():
+            self.linking_device_counts[category] += count
+        self.noun_references.update(other.noun_references)
+        self.pronoun_references.update(other.pronoun_references)
+        self.sentence_lengths.extend(other.sentence_lengths)
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'linking_device_counts': self.linking_device_counts,
+            'noun_references': self.noun_references,
+            'pronoun_references': self.pronoun_references,
+            'sentence_lengths': self.sentence_lengths,
+        }
+
+    def load(self, state: Dict[str, Any]) -> "CohesionCounts":
+        """Restore to_dict() state into these (empty) counts"""
+        self.linking_device_counts.update(state['linking_device_counts'])
+        self.noun_references = Counter(state['noun_references'])
+        self.pronoun_references = Counter(state['pronoun_references'])
+        self.sentence_lengths = list(state['sentence_lengths'])
+        return self
+
+    def linking_devices(self) -> Dict[str, Any]:
+        counts = self.linking_device_counts
+        return {
+            'total_linking_devices': sum(counts.values()),
+            'device_distribution': counts,
+            'linking_diversity_score': len([count for count in counts.values() if count > 0]) / len(counts)
+        }
+
+    def referential_cohesion(self) -> Dict[str, Any]:
+        if self.fast:
+            most_referenced = dict(self.noun_references.most_common(3))
+        else:
+            most_referenced = dict(sorted(self.noun_references.items(), key=lambda x: x[1], reverse=True)[:3])
+        return {
+            'noun_reference_count': len(self.noun_references),
+            'most_referenced_nouns': most_referenced,
+            'pronoun_usage': len(self.pronoun_references)
+        }
+
+    def logical_flow(self) -> Dict[str, Any]:
+        # Simple analysis of sentence length and complexity
+        sentence_lengths = self.sentence_lengths
+        return {
+            'average_sentence_length': sum(sentence_lengths) / len(sentence_lengths),
+            'sentence_length_variation': max(sentence_lengths) - min(sentence_lengths),
+            'complex_sentences_ratio': len([l for l in sentence_lengths if l > 15]) / len(sentence_lengths)
+        }
+
 
 class CoherenceCohesionService:
     def __init__(self):
@@ -11,7 +139,8 @@ class CoherenceCohesionService:
         
         # Load spaCy model
         try:
-            self.nlp = spacy.load('en_core_web_md')
+            with model_load_timer("spacy_en_core_web_md.coherence"):
+                self.nlp = load_spacy('en_core_web_md')
         except Exception as e:
             raise RuntimeError(f"Failed to load spaCy model: {e}")
         
@@ -24,46 +153,139 @@ class CoherenceCohesionService:
             'sequence': ['firstly', 'secondly', 'next', 'then', 'finally', 'subsequently'],
             'conclusion': ['in conclusion', 'to sum up', 'overall', 'ultimately', 'in summary']
         }
+        
+        # Fast mode: tokenizer + rule-based sentences and a single-pass phrase index
+        self.sentencizer = Sentencizer()
+        self.phrase_category = {
+            phrase: category
+            for category, phrases in self.linking_phrases.items()
+            for phrase in phrases
+        }
+        self.phrase_index = re.compile(
+            r"\b(" + "|".join(re.escape(p) for p in sorted(self.phrase_category, key=len, reverse=True)) + r")\b",
+            re.IGNORECASE
+        )
 
-    def analyze_coherence_cohesion(self, text: str) -> Dict[str, Any]:
+    @timed("coherence", "analyze_coherence_cohesion")
+    def analyze_coherence_cohesion(self, text: str, mode: str = "full", stream: bool = None,
+                                   include=None) -> Dict[str, Any]:
         """
         Analyze the coherence and cohesion of the given text
         
         :param text: Input text to analyze
+        :param mode: "fast" skips the parser (phrase index + lexical approximations)
+        :param stream: process one paragraph chunk at a time (default: fast mode above STREAM_THRESHOLD_CHARS)
+        :param include: feedback sections to build (see app.fields); without "details" paragraphs are not parsed one by one
         :return: Comprehensive analysis dictionary
         """
+        fast = mode == "fast"
+        streaming.enforce_limit(text)
+        if streaming.should_stream(text, stream, fast):
+            return self._analyze_streamed(text, fast, include)
+        
         # Tokenize text into sentences and process with spaCy
-        doc = self.nlp(text)
-        sentences = list(doc.sents)
+        with timed("coherence", "tokenize" if fast else "spacy_parse"):
+            doc = self._make_doc(text, fast)
+            sentences = list(doc.sents)
         
         # Perform detailed analysis
-        analysis = {
-            'paragraph_structure': self._analyze_paragraph_structure(text),
-            'linking_device_usage': self._analyze_linking_devices(sentences),
-            'referential_cohesion': self._analyze_referential_cohesion(sentences),
-            'logical_flow': self._analyze_logical_flow(sentences)
-        }
+        analysis = {}
+        with timed("coherence", "paragraph_structure"):
+            analysis['paragraph_structure'] = self._analyze_paragraph_structure(
+                text, fast=fast, details=fields.wants(include, "details")
+            )
+        with timed("coherence", "linking_devices"):
+            if fast:
+                analysis['linking_device_usage'] = self._analyze_linking_devices_indexed(doc, sentences)
+            else:
+                analysis['linking_device_usage'] = self._analyze_linking_devices(sentences)
+        with timed("coherence", "referential_cohesion"):
+            if fast:
+                analysis['referential_cohesion'] = self._analyze_referential_cohesion_lexical(sentences)
+            else:
+                analysis['referential_cohesion'] = self._analyze_referential_cohesion(sentences)
+        with timed("coherence", "logical_flow"):
+            analysis['logical_flow'] = self._analyze_logical_flow(sentences)
         
         # Compile results and generate feedback
-        return self._compile_results(analysis)
+        return self._compile_results(analysis, include)
+
+    def _analyze_streamed(self, text: str, fast: bool, include=None) -> Dict[str, Any]:
+        """analyze_coherence_cohesion with the sentence-level metrics accumulated chunk by chunk"""
+        analysis = {}
+        with timed("coherence", "paragraph_structure"):
+            analysis['paragraph_structure'] = self._analyze_paragraph_structure(
+                text, fast=fast, stream=True, details=fields.wants(include, "details")
+            )
+        # Streamed docs are not recorded in the submission's signals
+        with timed("coherence", "stream"):
+            counts = self.counts(fast)
+            for doc in streaming.stream_docs(self.nlp, text, self.sentencizer if fast else None):
+                counts.add(doc)
+        analysis['linking_device_usage'] = counts.linking_devices()
+        analysis['referential_cohesion'] = counts.referential_cohesion()
+        analysis['logical_flow'] = counts.logical_flow()
+        return self._compile_results(analysis, include)
+
+    def counts(self, fast: bool = False) -> CohesionCounts:
+        """Empty cohesion counts for this service's linking phrases"""
+        return CohesionCounts(self, fast)
+
+    def paragraph_detail(self, paragraph: str, fast: bool = False) -> Dict[str, Any]:
+        """Sentence count and topic sentence quality of one paragraph's text"""
+        return self._paragraph_detail(self._make_doc(paragraph, fast))
+
+    def analyze_counts(self, paragraphs: List[str], paragraph_details: List[Dict[str, Any]],
+                       counts: CohesionCounts, include=None) -> Dict[str, Any]:
+        """analyze_coherence_cohesion's result from per-paragraph details and merged cohesion counts"""
+        return self._compile_results({
+            'paragraph_structure': self._summarize_paragraphs(paragraphs, paragraph_details),
+            'linking_device_usage': counts.linking_devices(),
+            'referential_cohesion': counts.referential_cohesion(),
+            'logical_flow': counts.logical_flow(),
+        }, include)
 
-    def _analyze_paragraph_structure(self, text: str) -> Dict[str, Any]:
-        """Analyze paragraph structure and organization"""
+    def _make_doc(self, text: str, fast: bool = False):
+        """Full spaCy parse, or tokenizer + sentencizer when fast"""
+        if fast:
+            return self.sentencizer(self.nlp.make_doc(text))
+        return signals.parse(self.nlp, text)
+
+    def _analyze_paragraph_structure(self, text: str, fast: bool = False, stream: bool = False,
+                                     details: bool = True) -> Dict[str, Any]:
+        """Analyze paragraph structure and organization (per-paragraph details only when asked for)"""
         paragraphs = text.split('\n\n')
         paragraph_details = []
+        if not details:
+            # The band only uses the paragraph count
+            return self._summarize_paragraphs(paragraphs, paragraph_details)
+        if stream and not fast:
+            # Parsed in batches and dropped after use instead of kept with the signals
+            docs = iter(self.nlp.pipe(paragraphs, batch_size=config.STREAM_BATCH_SIZE))
+        else:
+            docs = (self._make_doc(paragraph, fast) for paragraph in paragraphs)
         
-        for paragraph in paragraphs:
-            doc = self.nlp(paragraph)
-            sentences = list(doc.sents)
-            
-            # Check for topic sentence (first sentence)
-            topic_sentence_score = self._evaluate_topic_sentence(sentences[0] if sentences else None)
-            
-            paragraph_details.append({
-                'sentence_count': len(sentences),
-                'topic_sentence_quality': topic_sentence_score
-            })
+        for _ in paragraphs:
+            with timed("coherence", "paragraph_parse"):
+                doc = next(docs)
+            paragraph_details.append(self._paragraph_detail(doc))
+        
+        return self._summarize_paragraphs(paragraphs, paragraph_details)
+
+    def _paragraph_detail(self, doc) -> Dict[str, Any]:
+        """Sentence count and topic sentence quality of one paragraph's doc"""
+        sentences = list(doc.sents)
+        
+        # Check for topic sentence (first sentence)
+        topic_sentence_score = self._evaluate_topic_sentence(sentences[0] if sentences else None)
         
+        return {
+            'sentence_count': len(sentences),
+            'topic_sentence_quality': topic_sentence_score
+        }
+
+    @staticmethod
+    def _summarize_paragraphs(paragraphs: List[str], paragraph_details: List[Dict[str, Any]]) -> Dict[str, Any]:
         return {
             'paragraph_count': len(paragraphs),
             'paragraph_details': paragraph_details,
@@ -72,57 +294,33 @@ class CoherenceCohesionService:
 
     def _analyze_linking_devices(self, sentences) -> Dict[str, Any]:
         """Analyze usage of linking devices"""
-        linking_device_counts = {category: 0 for category in self.linking_phrases}
-        
-        for sentence in sentences:
-            for category, phrases in self.linking_phrases.items():
-                for phrase in phrases:
-                    if phrase.lower() in sentence.text.lower():
-                        linking_device_counts[category] += 1
-        
-        total_devices = sum(linking_device_counts.values())
-        
-        return {
-            'total_linking_devices': total_devices,
-            'device_distribution': linking_device_counts,
-            'linking_diversity_score': len([count for count in linking_device_counts.values() if count > 0]) / len(linking_device_counts)
-        }
+        counts = CohesionCounts(self)
+        counts.add_linking_devices(sentences)
+        return counts.linking_devices()
+
+    def _analyze_linking_devices_indexed(self, doc, sentences) -> Dict[str, Any]:
+        """Linking devices from one regex pass over the text, bucketed by sentence"""
+        counts = CohesionCounts(self, fast=True)
+        counts.add_linking_devices(sentences, doc)
+        return counts.linking_devices()
+
+    def _analyze_referential_cohesion_lexical(self, sentences) -> Dict[str, Any]:
+        """Tagger-free approximation: content words stand in for nouns, a fixed list for pronouns"""
+        counts = CohesionCounts(self, fast=True)
+        counts.add_references(sentences)
+        return counts.referential_cohesion()
 
     def _analyze_referential_cohesion(self, sentences) -> Dict[str, Any]:
         """Analyze referential cohesion through pronoun and noun reference tracking"""
-        noun_references = {}
-        pronoun_references = {}
-        
-        for sentence in sentences:
-            for token in sentence:
-                if token.pos_ == 'NOUN':
-                    if token.lemma_ not in noun_references:
-                        noun_references[token.lemma_] = 1
-                    else:
-                        noun_references[token.lemma_] += 1
-                
-                if token.pos_ == 'PRON':
-                    if token.text not in pronoun_references:
-                        pronoun_references[token.text] = 1
-                    else:
-                        pronoun_references[token.text] += 1
-        
-        return {
-            'noun_reference_count': len(noun_references),
-            'most_referenced_nouns': dict(sorted(noun_references.items(), key=lambda x: x[1], reverse=True)[:3]),
-            'pronoun_usage': len(pronoun_references)
-        }
+        counts = CohesionCounts(self)
+        counts.add_references(sentences)
+        return counts.referential_cohesion()
 
     def _analyze_logical_flow(self, sentences) -> Dict[str, Any]:
         """Analyze the logical progression of ideas"""
-        # Simple analysis of sentence length and complexity
-        sentence_lengths = [len(list(sent)) for sent in sentences]
-        
-        return {
-            'average_sentence_length': sum(sentence_lengths) / len(sentence_lengths),
-            'sentence_length_variation': max(sentence_lengths) - min(sentence_lengths),
-            'complex_sentences_ratio': len([l for l in sentence_lengths if l > 15]) / len(sentences)
-        }
+        counts = CohesionCounts(self)
+        counts.add_sentence_lengths(sentences)
+        return counts.logical_flow()
 
     def _evaluate_topic_sentence(self, sentence) -> float:
         """Evaluate the quality of a potential topic sentence"""
@@ -136,7 +334,7 @@ class CoherenceCohesionService:
         # Rough scoring based on diversity and length
         return min(tag_diversity / 3 + len(sentence) / 10, 1)
 
-    def _compile_results(self, analysis: dict) -> Dict[str, Any]:
+    def _compile_results(self, analysis: dict, include=None) -> Dict[str, Any]:
         """Compile analysis results into an IELTS-style scoring system"""
         # Calculate weighted scores for each component
         weights = {
@@ -161,22 +359,24 @@ class CoherenceCohesionService:
         ielts_score = 1 + (overall_score * 8)
         
         # Generate detailed feedback
-        feedback = self._generate_feedback(scores)
+        feedback = self._generate_feedback(scores, include)
         
         return {
             'overall_score': round(ielts_score, 1),
             'component_scores': {k: round(v * 9, 1) for k, v in scores.items()},
-            'detailed_analysis': analysis,
+            'detailed_analysis': analysis if fields.wants(include, "details") else {},
             'feedback': feedback
         }
 
-    def _generate_feedback(self, scores: Dict[str, float]) -> Dict[str, List[str]]:
+    def _generate_feedback(self, scores: Dict[str, float], include=None) -> Dict[str, List[str]]:
         """Generate detailed feedback based on component scores"""
         feedback = {
             'strengths': [],
             'improvements': [],
             'detailed_suggestions': {}
         }
+        if not fields.wants(include, "feedback") and not fields.wants(include, "suggestions"):
+            return feedback
         
         # Paragraph Structure Feedback
         if scores['paragraph_structure'] > 0.7:
@@ -222,4 +422,8 @@ class CoherenceCohesionService:
                 "Use complex sentences strategically"
             ]
         
+        if not fields.wants(include, "suggestions"):
+            feedback['detailed_suggestions'] = {}
+        if not fields.wants(include, "feedback"):
+            feedback.update(strengths=[], improvements=[])
         return feedback
\ No newline at end of file
@@ -0,0 +1,436 @@
+from typing import Dict, Any, List, Optional, Set, Tuple
+from concurrent.futures import FIRST_COMPLETED, Future, TimeoutError as FuturesTimeoutError, wait
+from functools import partial
+from hashlib import sha256
+from importlib import metadata
+import json
+import logging
+import threading
+import time
+from .. import config, fields
+from ..models.submission import Submission
+from ..metrics import registry, timed
+from ..profiling import worker_threads, working_for
+from ..scheduler import FairScheduler, parse_class_setting
+from ..signals import SubmissionSignals, collecting
+from .grammar_service import sentence_spans
+from .spelling_service import index_fingerprint
+
+logger = logging.getLogger(__name__)
+
+GRADING_MODES = ("fast", "standard", "full")
+
+ANALYZERS = ("grammar", "lexical", "task_achievement", "coherence")
+
+# Engine each analyzer runs per mode. "full" is the original behaviour;
+# "fast" loads nothing per request beyond the spaCy tokenizer.
+MODE_ENGINES = {
+    "fast": {
+        "grammar": "regex rules + spelling index",
+        "lexical": "spaCy tokenizer + sentencizer",
+        "coherence": "phrase index + tokenizer",
+        "task_achievement": "cue keywords + word overlap",
+    },
+    "standard": {
+        "grammar": "LanguageTool + spelling index",
+        "lexical": "spaCy en_core_web_md",
+        "coherence": "spaCy en_core_web_md",
+        "task_achievement": "MiniLM similarity",
+    },
+    "full": {
+        "grammar": "LanguageTool + spelling index",
+        "lexical": "spaCy en_core_web_md + WordNet",
+        "coherence": "spaCy en_core_web_md",
+        "task_achievement": "zero-shot NLI + MiniLM",
+    },
+}
+
+# Contribution of each criterion to the overall band
+COMPONENT_WEIGHTS = {
+    'grammar': 0.25,
+    'lexical': 0.25,
+    'task_achievement': 0.25,
+    'coherence': 0.25
+}
+
+# Packages whose upgrades can change scores (the spaCy model ships as a package)
+SCORING_PACKAGES = (
+    "spacy", "en_core_web_md", "language_tool_python", "nltk",
+    "sentence-transformers", "transformers", "torch",
+)
+
+
+def _package_version(name: str) -> Optional[str]:
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def compute_scorer_version() -> str:
+    """Release number plus a fingerprint of weights, engines, model package versions and spelling index"""
+    fingerprint = json.dumps({
+        'release': config.SCORER_RELEASE,
+        'weights': COMPONENT_WEIGHTS,
+        'engines': MODE_ENGINES,
+        'packages': {name: _package_version(name) for name in SCORING_PACKAGES},
+        'spelling_index': index_fingerprint(),
+        'grammar_rule_profile': config.GRAMMAR_RULE_PROFILE,
+    }, sort_keys=True)
+    return f"{config.SCORER_RELEASE}-{sha256(fingerprint.encode('utf-8')).hexdigest()[:12]}"
+
+
+# Identifies the scoring logic behind a stored result; cached results from
+# any other version are never served
+SCORER_VERSION = compute_scorer_version()
+
+GRADING_SECONDS = registry.histogram(
+    "ielts_grading_duration_seconds",
+    "End-to-end analyzer time per submission by grading mode",
+    ("mode",),
+)
+STAGE_TIMEOUTS = registry.counter(
+    "ielts_stage_timeouts_total",
+    "Analyzer stages that missed their deadline and finished in the background",
+    ("stage",),
+)
+LATE_COMPLETIONS = registry.counter(
+    "ielts_late_completions_total",
+    "Background completions of timed-out stages by outcome",
+    ("stage", "result"),
+)
+
+
+class GradingPipeline:
+    """Runs the four analyzers for a submission and combines them into one band"""
+
+    def __init__(self, grammar_service, lexical_service, coherence_service, taskachievement_service,
+                 max_workers: int = None, stage_timeouts_ms: Dict[str, int] = None,
+                 class_weights: Dict[str, float] = None, reserved_workers: Dict[str, int] = None):
+        self.grammar_service = grammar_service
+        self.lexical_service = lexical_service
+        self.coherence_service = coherence_service
+        self.taskachievement_service = taskachievement_service
+        self.stage_timeouts_ms = stage_timeouts_ms or config.STAGE_TIMEOUTS_MS
+        # Analyzers are independent, so they run side by side; a stalled one
+        # keeps its worker until it returns but no longer holds the request.
+        # Bulk grading shares the workers without crowding out interactive requests.
+        self.executor = FairScheduler(
+            max_workers=max_workers or config.GRADING_WORKERS,
+            weights=class_weights or parse_class_setting(config.SCHEDULER_WEIGHTS),
+            reserved=parse_class_setting(config.SCHEDULER_RESERVED) if reserved_workers is None else reserved_workers,
+        )
+        self._late_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, **kwargs) -> "GradingPipeline":
+        """Pipeline over freshly loaded analyzers (for processes outside the API)"""
+        from .grammar_service import GrammarService
+        from .lexical_service import LexicalService
+        from .CoherenceCohensionService import CoherenceCohesionService
+        from .taskachievement_service import TaskAchievementService
+
+        return cls(GrammarService(), LexicalService(), CoherenceCohesionService(), TaskAchievementService(), **kwargs)
+
+    def grade(self, submission, mode: str = None, budget_ms: Optional[int] = None,
+              priority_class: str = "interactive", tenant: Optional[str] = None,
+              signals: Optional[SubmissionSignals] = None) -> Dict[str, Any]:
+        """Analyze a SubmissionCreate within the budget and combine whatever finished.
+
+        Stages still running at their deadline are listed in 'missing_components'
+        and their futures returned under 'pending' for finish_in_background().
+        The stages share one SubmissionSignals ('signals'); pass a stored one
+        to replay its model outputs instead of running inference.
+        """
+        mode = mode or getattr(submission, 'mode', None) or "full"
+        if mode not in GRADING_MODES:
+            raise ValueError(f"Unknown grading mode '{mode}', expected one of {GRADING_MODES}")
+
+        signals = signals or SubmissionSignals()
+        start = time.monotonic()
+        budget_deadline = start + budget_ms / 1000 if budget_ms else None
+        with GRADING_SECONDS.time(mode=mode):
+            profiled = worker_threads()
+            futures = {
+                name: self.executor.submit(
+                    self._run_stage, name, submission, mode, signals, profiled,
+                    priority_class=priority_class, tenant=tenant
+                )
+                for name in ANALYZERS
+            }
+            analyses, pending = {}, {}
+            for name, future in futures.items():
+                deadline = self._deadline(name, start, budget_deadline)
+                try:
+                    timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                    analyses[name] = future.result(timeout=timeout)
+                except FuturesTimeoutError:
+                    STAGE_TIMEOUTS.inc(stage=name)
+                    logger.warning(f"{name} analysis missed its deadline; finishing in the background")
+                    pending[name] = future
+
+        return self._result(mode, analyses, pending, signals)
+
+    def grade_stream(self, submission, mode: str = None, budget_ms: Optional[int] = None,
+                     priority_class: str = "interactive", tenant: Optional[str] = None,
+                     signals: Optional[SubmissionSignals] = None):
+        """grade(), yielding each component as its analyzer finishes.
+
+        Yields ("component", name, analysis) in completion order, then
+        ("result", None, result) with the same shape grade() returns. Stages
+        past their STAGE_TIMEOUTS_MS deadline or the overall budget end up
+        under 'pending' and are listed in the result's 'missing_components'.
+        """
+        mode = mode or getattr(submission, 'mode', None) or "full"
+        if mode not in GRADING_MODES:
+            raise ValueError(f"Unknown grading mode '{mode}', expected one of {GRADING_MODES}")
+
+        signals = signals or SubmissionSignals()
+        start = time.monotonic()
+        budget_deadline = start + budget_ms / 1000 if budget_ms else None
+        with GRADING_SECONDS.time(mode=mode):
+            profiled = worker_threads()
+            futures = {
+                self.executor.submit(
+                    self._run_stage, name, submission, mode, signals, profiled,
+                    priority_class=priority_class, tenant=tenant
+                ): name
+                for name in ANALYZERS
+            }
+            deadlines = {future: self._deadline(name, start, budget_deadline) for future, name in futures.items()}
+            deadlines = {future: deadline for future, deadline in deadlines.items() if deadline is not None}
+            analyses, pending = {}, {}
+            waiting = set(futures)
+            while waiting:
+                next_deadline = min((deadlines[f] for f in waiting if f in deadlines), default=None)
+                timeout = None if next_deadline is None else max(0.0, next_deadline - time.monotonic())
+                done, waiting = wait(waiting, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = futures[future]
+                    analyses[name] = future.result()
+                    yield "component", name, analyses[name]
+                now = time.monotonic()
+                for future in [f for f in waiting if f in deadlines and deadlines[f] <= now]:
+                    name = futures[future]
+                    STAGE_TIMEOUTS.inc(stage=name)
+                    logger.warning(f"{name} analysis missed its deadline; finishing in the background")
+                    pending[name] = future
+                    waiting.discard(future)
+
+        yield "result", None, self._result(mode, analyses, pending, signals)
+
+    def _deadline(self, name: str, start: float, budget_deadline: Optional[float]) -> Optional[float]:
+        """When a stage started at start stops being waited for: its own timeout or the overall budget"""
+        stage_ms = self.stage_timeouts_ms.get(name)
+        deadline = start + stage_ms / 1000 if stage_ms else None
+        if budget_deadline is not None:
+            deadline = budget_deadline if deadline is None else min(deadline, budget_deadline)
+        return deadline
+
+    def _result(self, mode: str, analyses: Dict[str, Any], pending: Dict[str, Future],
+                signals: SubmissionSignals) -> Dict[str, Any]:
+        ielts_score, percentage_grade = self.combine_scores(
+            {name: self.component_score(name, analysis) for name, analysis in analyses.items()}
+        )
+
+        return {
+            'grading_mode': mode,
+            'scorer_version': SCORER_VERSION,
+            'ielts_score': ielts_score,
+            'grade': percentage_grade,
+            'grammar_analysis': analyses.get('grammar'),
+            'lexical_analysis': analyses.get('lexical'),
+            'task_analysis': analyses.get('task_achievement'),
+            'coherence_analysis': analyses.get('coherence'),
+            'missing_components': [name for name in ANALYZERS if name in pending],
+            'pending': pending,
+            'signals': signals,
+        }
+
+    def _run_stage(self, name: str, submission, mode: str, signals: SubmissionSignals = None,
+                   profiled: Optional[Set[int]] = None) -> Dict[str, Any]:
+        """Run one analyzer; grammar output is converted to the schema shape here.
+
+        The submission's include (the feedback sections the client asked for)
+        is pushed down so skipped sections are never computed; the task
+        achievement analyzer reads it off the submission itself. 'profiled' is
+        the request profile's worker set, so only this stage's thread is
+        sampled into it.
+        """
+        include = fields.normalize(getattr(submission, "include", None))
+        with timed("api", name), collecting(signals), working_for(profiled):
+            if name == "grammar":
+                raw_grammar_analysis = self.grammar_service.analyze_grammar(
+                    submission.text, mode=mode, locale=getattr(submission, "locale", None), include=include
+                )
+                return self.format_grammar(raw_grammar_analysis, submission.text)
+            if name == "lexical":
+                return self.lexical_service.analyze_lexical(submission.text, mode=mode, include=include)
+            if name == "task_achievement":
+                return self.taskachievement_service.analyze_submission(submission, mode=mode)
+            return self.coherence_service.analyze_coherence_cohesion(submission.text, mode=mode, include=include)
+
+    @staticmethod
+    def component_score(name: str, analysis: Dict[str, Any]) -> float:
+        """Band score of one analyzer's output"""
+        if name == "task_achievement":
+            return analysis['ielts_score']
+        return analysis['overall_score']
+
+    def finish_in_background(self, submission_id: int, pending: Dict[str, Future], session_factory) -> None:
+        """Write each timed-out component to the Submission row once its analyzer returns"""
+        for name, future in pending.items():
+            future.add_done_callback(partial(self._store_late_component, submission_id, name, session_factory))
+
+    def _store_late_component(self, submission_id: int, name: str, session_factory, future: Future) -> None:
+        try:
+            analysis = future.result()
+        except Exception as e:
+            LATE_COMPLETIONS.inc(stage=name, result="error")
+            logger.error(f"Background {name} analysis failed for submission {submission_id}: {e}")
+            return
+
+        # Callbacks for one row can land together; serialize the read-modify-write
+        with self._late_lock:
+            db = session_factory()
+            try:
+                db_submission = db.query(Submission).filter(Submission.id == submission_id).first()
+                if db_submission is None:
+                    return
+                self.apply_component(db_submission, name, analysis)
+                missing = [m for m in (db_submission.missing_components or []) if m != name]
+                db_submission.missing_components = missing
+                db_submission.grading_status = "partial" if missing else "complete"
+                db_submission.ielts_score, db_submission.grade = self.combine_scores(self.stored_scores(db_submission))
+                db.commit()
+                LATE_COMPLETIONS.inc(stage=name, result="stored")
+            except Exception as e:
+                db.rollback()
+                LATE_COMPLETIONS.inc(stage=name, result="error")
+                logger.error(f"Failed to store background {name} analysis for submission {submission_id}: {e}")
+            finally:
+                db.close()
+
+    @staticmethod
+    def format_grammar(raw_grammar_analysis: Dict[str, Any], text: str) -> Dict[str, Any]:
+        """Convert raw grammar analysis to the format expected by the schema"""
+        grammar_errors = raw_grammar_analysis.get("errors", [])
+        grammar_analysis = {
+            'overall_score': raw_grammar_analysis['score'],
+            'raw_score': raw_grammar_analysis.get('weighted_error_rate', 0),
+            'feedback': raw_grammar_analysis['feedback'],
+            # Create sentence analysis structure compatible with the expected format
+            'sentence_analysis': [],
+            # Include the new data fields
+            'error_details':   grammar_errors,
+            'error_categories': raw_grammar_analysis.get('error_categories', {}),
+            'error_rate':       raw_grammar_analysis.get('error_rate', 0),
+        }
+
+        # Per-sentence error densities from the grammar service's offset index
+        if 'sentences' in raw_grammar_analysis:
+            grammar_analysis['sentence_analysis'] = [
+                {
+                    'sentence_id': sentence['sentence_id'],
+                    'sentence': text[sentence['start']:sentence['end']],
+                    'start': sentence['start'],
+                    'end': sentence['end'],
+                    'error_count': sentence['error_count'],
+                    'error_density': sentence['error_density'],
+                    'score': sentence['score'],
+                } for sentence in raw_grammar_analysis['sentences']
+            ]
+        else:
+            # No sentence index (older analyses): split the text and use the overall score
+            grammar_analysis['sentence_analysis'] = [
+                {
+                    'sentence_id': sentence_id,
+                    'sentence': text[start:end],
+                    'start': start,
+                    'end': end,
+                    'score': raw_grammar_analysis['score'] / 9.0  # Normalize to 0-1 range
+                } for sentence_id, (start, end) in enumerate(sentence_spans(text))
+            ]
+        return grammar_analysis
+
+    @staticmethod
+    def combine_scores(scores: Dict[str, float]) -> Tuple[Optional[float], Optional[float]]:
+        """Weighted IELTS band (rounded to 0.5) and its 0-100 percentage.
+
+        Missing components are left out and the remaining weights renormalized;
+        with nothing available both values are None.
+        """
+        available = {name: score for name, score in scores.items() if score is not None}
+        total_weight = sum(COMPONENT_WEIGHTS[name] for name in available)
+        if not total_weight:
+            return None, None
+
+        ielts_score = sum(score * COMPONENT_WEIGHTS[name] for name, score in available.items()) / total_weight
+
+        # Round IELTS score to nearest 0.5
+        ielts_score = round(ielts_score * 2) / 2
+        ielts_score = max(1.0, min(9.0, ielts_score))
+
+        # Convert IELTS score to percentage (1-9 → 0-100)
+        percentage_grade = ((ielts_score - 1) / 8) * 100
+        return ielts_score, percentage_grade
+
+    @staticmethod
+    def stored_scores(db_submission) -> Dict[str, Optional[float]]:
+        """Component bands already on a Submission row"""
+        grammar_analysis = db_submission.grammar_analysis or {}
+        return {
+            'grammar': grammar_analysis.get('overall_score'),
+            'lexical': db_submission.lexical_score,
+            'task_achievement': db_submission.task_achievement_score,
+            'coherence': db_submission.coherence_score,
+        }
+
+    @classmethod
+    def apply(cls, db_submission, result: Dict[str, Any]) -> None:
+        """Copy a grading result onto a Submission row"""
+        db_submission.grading_mode = result['grading_mode']
+        # Results cached before versions were recorded were checked against the current version on read
+        db_submission.scorer_version = result.get('scorer_version', SCORER_VERSION)
+        db_submission.grade = result['grade']
+        db_submission.ielts_score = result['ielts_score']
+        db_submission.missing_components = result['missing_components']
+        db_submission.grading_status = "partial" if result['missing_components'] else "complete"
+        for name, key in (('grammar', 'grammar_analysis'), ('lexical', 'lexical_analysis'),
+                          ('task_achievement', 'task_analysis'), ('coherence', 'coherence_analysis')):
+            if result[key] is not None:
+                cls.apply_component(db_submission, name, result[key])
+
+    @staticmethod
+    def apply_component(db_submission, name: str, analysis: Dict[str, Any]) -> None:
+        """Copy one analyzer's output onto the matching Submission columns"""
+        if name == "grammar":
+            db_submission.grammar_feedback = analysis['feedback']
+            db_submission.raw_grammar_score = analysis['raw_score']
+            db_submission.grammar_analysis = analysis
+        elif name == "lexical":
+            db_submission.lexical_feedback = analysis['feedback']
+            db_submission.lexical_score = analysis['overall_score']
+            db_submission.lexical_analysis = analysis
+        elif name == "task_achievement":
+            db_submission.task_achievement_score = analysis['ielts_score']
+            db_submission.task_achievement_feedback = analysis['task_achievement_feedback']
+            db_submission.task_achievement_analysis = analysis['task_achievement_analysis']
+        elif name == "coherence":
+            db_submission.coherence_score = analysis['overall_score']
+            db_submission.coherence_feedback = analysis['feedback']
+            db_submission.coherence_analysis = analysis
+
+    @staticmethod
+    def response_payload(db_submission, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Fields for SubmissionResponse, using the in-memory analyses rather than reloaded JSON"""
+        return {
+            **db_submission.__dict__,
+            'grammar_analysis': result['grammar_analysis'],
+            'lexical_analysis': result['lexical_analysis'],
+            'coherence_analysis': result['coherence_analysis'],
+            'task_achievement_analysis': (
+                result['task_analysis']['task_achievement_analysis'] if result['task_analysis'] else None
+            )
+        }
+
@@ -1,11 +1,92 @@
+import re
+from bisect import bisect_right
 import language_tool_python
 from typing import Dict, List, Tuple
+from .. import config
+from ..metrics import timed, model_load_timer
+from .. import fields, signals
+from .spelling_service import SpellingIndex, SpellingService
+from .languagetool_pool import LanguageToolPool
+
+# Lightweight regex rules for the "fast" grading mode (no JVM round trip).
+# Each rule: (pattern, category, rule id, message, replacement builder, group
+# holding the error span)
+FAST_RULES = [
+    (re.compile(r"\b(\w+)\s+\1\b", re.IGNORECASE), 'GRAMMAR', 'FAST_WORD_REPEAT',
+     "Possible repeated word", lambda m: m.group(1), 0),
+    (re.compile(r"\b[Aa]\s+(?=[aeiouAEIOU]\w)(?!(?:uni|use|usu|uto|one|eu)\w*)(\w+)"), 'GRAMMAR', 'FAST_A_AN',
+     "Use 'an' before a word starting with a vowel sound", lambda m: "an " + m.group(1), 0),
+    (re.compile(r"\b[Aa]n\s+(?=[b-df-hj-np-tv-zB-DF-HJ-NP-TV-Z])(?!(?:hour|honest|honou?r|heir)\w*)(\w+)"), 'GRAMMAR',
+     'FAST_A_AN', "Use 'a' before a word starting with a consonant sound", lambda m: "a " + m.group(1), 0),
+    (re.compile(r"\b(could|should|would|must|might) of\b", re.IGNORECASE), 'GRAMMAR', 'FAST_MODAL_OF',
+     "Use 'have' after a modal verb, not 'of'", lambda m: m.group(1) + " have", 0),
+    (re.compile(r"\b(dont|doesnt|didnt|cant|wont|isnt|arent|wasnt|werent|shouldnt|wouldnt|couldnt|im|ive)\b"),
+     'TYPOS', 'FAST_APOSTROPHE', "Missing apostrophe in contraction", None, 0),
+    (re.compile(r"\balot\b", re.IGNORECASE), 'TYPOS', 'FAST_ALOT', "'alot' should be written 'a lot'",
+     lambda m: "a lot", 0),
+    (re.compile(r"(?<![\w'])i(?![\w'])"), 'CASING', 'FAST_LOWERCASE_I', "The pronoun 'I' is always capitalised",
+     lambda m: "I", 0),
+    (re.compile(r"(?:^|[.!?]\s+)([a-z]\w*)"), 'CASING', 'FAST_SENTENCE_START',
+     "Sentences should start with a capital letter", lambda m: m.group(1).capitalize(), 1),
+    (re.compile(r"\s+([,.;:!?])(?!\d)"), 'PUNCTUATION', 'FAST_SPACE_BEFORE_PUNCT',
+     "Remove the space before the punctuation mark", lambda m: m.group(1), 0),
+    (re.compile(r"([,;:])(?=[A-Za-z])"), 'PUNCTUATION', 'FAST_SPACE_AFTER_PUNCT',
+     "Add a space after the punctuation mark", lambda m: m.group(1) + " ", 0),
+]
+
+# LanguageTool rule profiles (GRAMMAR_RULE_PROFILE). "all" is the stock en-GB
+# rule set; "strict" adds LanguageTool's picky rules; "ielts-core" drops the
+# style and typography checks that carry little weight in the band but a lot
+# of check time. Compare them with python -m app.evaluatiuon.rule_profile_benchmark.
+RULE_PROFILES = {
+    "all": {"picky": False, "disabled_categories": set(), "disabled_rules": set()},
+    "strict": {"picky": True, "disabled_categories": set(), "disabled_rules": set()},
+    "ielts-core": {
+        "picky": False,
+        "disabled_categories": {
+            "STYLE", "TYPOGRAPHY", "REDUNDANCY", "PLAIN_ENGLISH", "WIKIPEDIA",
+            "CREATIVE_WRITING", "TEXT_ANALYSIS", "REPETITIONS_STYLE",
+        },
+        "disabled_rules": {
+            "TOO_LONG_SENTENCE", "PASSIVE_VOICE", "ENGLISH_WORD_REPEAT_BEGINNING_RULE",
+            "EN_QUOTES", "DASH_RULE", "ELLIPSIS", "WHITESPACE_PARAGRAPH",
+        },
+    },
+}
+
+# Sentence ends: terminal punctuation (plus closing quotes/brackets) followed by
+# whitespace, or a blank line. Matches the boundaries the feedback UI highlights.
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])[\"')\]]*\s+|\n\s*\n")
+
+# Per-sentence score: 1.0 minus this many points per weighted error per word,
+# so one full-weight error in a ten-word sentence scores 0.5
+SENTENCE_PENALTY = 5.0
+
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """(start, end) character spans of the sentences in text, whitespace trimmed"""
+    spans = []
+    start = 0
+    for boundary in SENTENCE_BOUNDARY.finditer(text):
+        spans.append((start, boundary.start() + len(boundary.group(0).rstrip())))
+        start = boundary.end()
+    spans.append((start, len(text)))
+    trimmed = []
+    for start, end in spans:
+        segment = text[start:end]
+        stripped = segment.strip()
+        if stripped:
+            start += len(segment) - len(segment.lstrip())
+            trimmed.append((start, start + len(stripped)))
+    return trimmed or [(0, len(text))]
+
 
 class GrammarService:
-    def __init__(self):
-        # Initialize LanguageTool
-        self.tool = language_tool_python.LanguageTool('en-GB')
-        
+    # In-process spelling pre-pass (None when no spelling index is configured)
+    spelling = None
+    rule_profile = "all"
+
+    def __init__(self, rule_profile: str = None):
         # Define error type weights (can be calibrated based on IELTS criteria)
         self.error_weights = {
             'GRAMMAR': 1.0,       # High impact
@@ -16,23 +97,101 @@ class GrammarService:
             'COLLOCATIONS': 0.8,  # Higher impact - word combinations
             'OTHER': 0.5          # Default weight
         }
-        
-    def analyze_grammar(self, text: str) -> Dict:
-        """Analyze grammar and return IELTS score with detailed feedback"""
+
+        # Spelling is handled by the local index when there is one, so
+        # LanguageTool only runs its grammar, punctuation and style rules
+        index = SpellingIndex.load()
+        if index is not None:
+            self.spelling = SpellingService(index)
+        self.set_rule_profile(rule_profile or config.GRAMMAR_RULE_PROFILE)
+
+        # One LanguageTool per locale; the default locale's starts now
+        self.pool = LanguageToolPool(self._create_tool)
+        self.tool = self.pool.get()
+
+    def _create_tool(self, locale: str):
+        with model_load_timer(f"languagetool_{locale.lower().replace('-', '_')}"):
+            tool = language_tool_python.LanguageTool(locale)
+        self._configure(tool)
+        return tool
+
+    def set_rule_profile(self, name: str) -> None:
+        """Switch the LanguageTool rules to one of RULE_PROFILES"""
+        if name not in RULE_PROFILES:
+            raise ValueError(f"Unknown grammar rule profile {name!r}; expected one of {sorted(RULE_PROFILES)}")
+        self.rule_profile = name
+        pool = getattr(self, "pool", None)
+        for tool in pool.loaded() if pool is not None else []:
+            self._configure(tool)
+
+    def _configure(self, tool) -> None:
+        profile = RULE_PROFILES[self.rule_profile]
+        tool.picky = profile["picky"]
+        tool.disabled_categories = set(profile["disabled_categories"])
+        tool.disabled_rules = set(profile["disabled_rules"])
+        if self.spelling is not None:
+            tool.disable_spellchecking()
+
+    @timed("grammar", "analyze_grammar")
+    def analyze_grammar(self, text: str, mode: str = "full", locale: str = None, include=None) -> Dict:
+        """Analyze grammar and return IELTS score with detailed feedback
+
+        mode="fast" swaps LanguageTool for the in-process regex rules; locale
+        (en-GB, en-US, ...) picks the LanguageTool backend; include limits the
+        feedback sections built (see app.fields).
+        """
         if not text:
             return {"score": 0.0, "feedback": "No text provided", "errors": []}
         
-        matches = self.tool.check(text)
+        if mode == "fast":
+            matches = self.check(text, mode)
+        else:
+            matches = signals.check(lambda: self.check(text, mode, locale))
         
+        return self.score_matches(text, matches, include)
+
+    def check(self, text: str, mode: str = "full", locale: str = None) -> List[Dict]:
+        """Normalized matches for text, sorted by offset (what score_matches scores)"""
+        if mode == "fast":
+            with timed("grammar", "heuristic_check"):
+                return self._with_spelling(text, self._heuristic_check(text))
+        return self._with_spelling(text, self._languagetool_check(text, locale))
+
+    def _languagetool_check(self, text: str, locale: str = None) -> List[Dict]:
+        with timed("grammar", "languagetool_check"):
+            return [self._normalize_match(match) for match in self.pool.check(locale, text)]
+
+    def _with_spelling(self, text: str, matches: List[Dict]) -> List[Dict]:
+        """Add the spelling pre-pass matches that don't overlap a rule match"""
+        if self.spelling is None:
+            return matches
+        with timed("grammar", "spelling_check"):
+            typos = self.spelling.check(text)
+        spans = [(m["offset"], m["offset"] + m["length"]) for m in matches]
+        typos = [
+            t for t in typos
+            if not any(start < t["offset"] + t["length"] and t["offset"] < end for start, end in spans)
+        ]
+        return sorted(matches + typos, key=lambda match: match["offset"])
+
+    def score_matches(self, text: str, matches: List[Dict], include=None) -> Dict:
+        """Turn normalized matches into the IELTS grammar score and feedback"""
         word_count = len(text.split())
+        details, per_sentence = fields.wants(include, "details"), fields.wants(include, "sentences")
         
+        # Sorted sentence starts: each match offset maps to its sentence by bisect
+        # (only the error details and the per-sentence breakdown need them)
+        spans = sentence_spans(text) if details or per_sentence else []
+        starts = [start for start, _ in spans]
+        sentence_weights = [0.0] * len(spans)
+        sentence_counts = [0] * len(spans)
+
         errors = []
         error_categories = {}
         weighted_error_sum = 0
         
         for match in matches:
-            category = match.category if hasattr(match, 'category') else 'OTHER'
-            rule_id = match.ruleId if hasattr(match, 'ruleId') else 'unknown'
+            category = match["category"]
             
             # Count errors by category
             error_categories[category] = error_categories.get(category, 0) + 1
@@ -40,14 +199,38 @@ class GrammarService:
             # Calculate weighted error
             weight = self.error_weights.get(category, self.error_weights['OTHER'])
             weighted_error_sum += weight
+            if not spans:
+                continue
+
+            offset, length = match["offset"], match["length"]
+            sentence_id = max(0, bisect_right(starts, offset) - 1)
+            sentence_weights[sentence_id] += weight
+            sentence_counts[sentence_id] += 1
+            sentence_start, sentence_end = spans[sentence_id]
             
-            # Store error details
-            errors.append({
-                "message": match.message,
-                "context": text[max(0, match.offset-20):match.offset+match.errorLength+20],
-                "suggestion": match.replacements[0] if match.replacements else "",
-                "category": category,
-                "rule_id": rule_id
+            # Store error details (context is the surrounding sentence, clipped to 20 chars either side)
+            if details:
+                errors.append({
+                    "message": match["message"],
+                    "context": text[max(sentence_start, offset - 20):min(sentence_end, offset + length + 20)],
+                    "suggestion": match["replacements"][0] if match["replacements"] else "",
+                    "category": category,
+                    "rule_id": match["rule_id"],
+                    "offset": offset,
+                    "length": length,
+                    "sentence_id": sentence_id,
+                })
+
+        sentences = []
+        for sentence_id, (start, end) in enumerate(spans if per_sentence else []):
+            density = sentence_weights[sentence_id] / max(len(text[start:end].split()), 1)
+            sentences.append({
+                "sentence_id": sentence_id,
+                "start": start,
+                "end": end,
+                "error_count": sentence_counts[sentence_id],
+                "error_density": density,
+                "score": max(0.0, 1.0 - density * SENTENCE_PENALTY),
             })
         
         total_errors = len(matches)
@@ -80,7 +263,8 @@ class GrammarService:
         ielts_score = round(ielts_score * 2) / 2
         
         # Generate feedback based on error categories
-        feedback = self._generate_feedback(error_categories, total_errors, ielts_score)
+        feedback = self._generate_feedback(error_categories, total_errors, ielts_score) \
+            if fields.wants(include, "feedback") else ""
         
         return {
             "score": ielts_score,
@@ -90,9 +274,39 @@ class GrammarService:
             "weighted_error_rate": weighted_error_rate,
             "error_categories": error_categories,
             "feedback": feedback,
-            "errors": errors[:10]  # Return first 10 errors for feedback
+            "errors": errors,  # Every error, in text order; the API pages through them
+            "sentences": sentences,
         }
         
+    @staticmethod
+    def _normalize_match(match) -> Dict:
+        """Flatten a LanguageTool match into a plain dict (works across library versions)"""
+        return {
+            "offset": match.offset,
+            "length": getattr(match, 'errorLength', None) or getattr(match, 'error_length', 0),
+            "message": match.message,
+            "replacements": list(match.replacements or []),
+            "category": match.category if hasattr(match, 'category') else 'OTHER',
+            "rule_id": getattr(match, 'ruleId', None) or getattr(match, 'rule_id', 'unknown'),
+        }
+
+    def _heuristic_check(self, text: str) -> List[Dict]:
+        """Run the fast regex rules and return matches in the normalized format"""
+        matches = []
+        for pattern, category, rule_id, message, replacement, group in FAST_RULES:
+            for m in pattern.finditer(text):
+                start, end = m.span(group)
+                matches.append({
+                    "offset": start,
+                    "length": end - start,
+                    "message": message,
+                    "replacements": [replacement(m)] if replacement else [],
+                    "category": category,
+                    "rule_id": rule_id,
+                })
+        matches.sort(key=lambda match: match["offset"])
+        return matches
+
     def _generate_feedback(self, error_categories: Dict, total_errors: int, score: float) -> str:
         """Generate detailed feedback based on error categories and score"""
         if total_errors == 0:
@@ -137,16 +351,20 @@ class GrammarService:
         return feedback
     
     def get_grammar_examples(self, text: str) -> List[Dict]:
-        """Extract specific grammar examples with suggestions for improvement"""
-        matches = self.tool.check(text)
+        """Extract specific grammar examples with suggestions for improvement
+
+        Inside a grading run this reuses the submission's LanguageTool matches.
+        """
+        matches = signals.check(lambda: self._with_spelling(text, self._languagetool_check(text)))
         examples = []
         
         for match in matches[:5]:  # Limit to 5 examples
+            offset, length = match["offset"], match["length"]
             examples.append({
-                "original": text[match.offset:match.offset+match.errorLength],
-                "context": text[max(0, match.offset-20):match.offset+match.errorLength+20],
-                "message": match.message,
-                "suggestion": match.replacements[0] if match.replacements else ""
+                "original": text[offset:offset + length],
+                "context": text[max(0, offset - 20):offset + length + 20],
+                "message": match["message"],
+                "suggestion": match["replacements"][0] if match["replacements"] else ""
             })
         
         return examples
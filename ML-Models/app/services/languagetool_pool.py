@@ -0,0 +1,220 @@
+import logging
+import threading
+import time
+from collections import Counter as TallyCounter, defaultdict, deque
+from typing import Any, Callable, Dict, List, Optional
+
+from .. import config
+from ..metrics import registry, rss_bytes
+
+logger = logging.getLogger(__name__)
+
+CHECK_SECONDS = registry.histogram(
+    "ielts_languagetool_check_seconds",
+    "LanguageTool check latency by locale",
+    ("locale",),
+)
+POOL_EVENTS = registry.counter(
+    "ielts_languagetool_pool_events_total",
+    "LanguageTool backends started and evicted, by locale",
+    ("locale", "event"),
+)
+BACKEND_RSS_BYTES = registry.gauge(
+    "ielts_languagetool_rss_bytes",
+    "Resident memory of each locale's LanguageTool server (0 when not running locally)",
+    ("locale",),
+)
+TRAFFIC_SHARE = registry.gauge(
+    "ielts_languagetool_traffic_share",
+    "Share of recent grammar checks per locale",
+    ("locale",),
+)
+
+
+class _Backend:
+    def __init__(self, locale: str, tool, now: float):
+        self.locale = locale
+        self.tool = tool
+        self.started_at = now
+        self.last_used = now
+        self.in_flight = 0
+
+
+class LanguageToolPool:
+    """LanguageTool backends keyed by locale.
+
+    A locale's JVM starts on its first check. Backends whose locale carries at
+    least `warm_share` of the checks in the traffic window stay warm; the rest
+    are closed once idle for `idle_seconds`. The default locale is never
+    evicted. Starting a backend beyond `max_instances` evicts the idle one
+    with the least traffic first.
+    """
+
+    def __init__(self, factory: Callable[[str], Any], default_locale: str = None, idle_seconds: float = None,
+                 warm_share: float = None, window_seconds: float = None, max_instances: int = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.factory = factory
+        self.default_locale = default_locale or config.GRAMMAR_DEFAULT_LOCALE
+        self.idle_seconds = config.LANGUAGETOOL_IDLE_SECONDS if idle_seconds is None else idle_seconds
+        self.warm_share = config.LANGUAGETOOL_WARM_SHARE if warm_share is None else warm_share
+        self.window_seconds = config.LANGUAGETOOL_TRAFFIC_WINDOW_S if window_seconds is None else window_seconds
+        self.max_instances = max_instances or config.LANGUAGETOOL_MAX_INSTANCES
+        self.clock = clock
+        self._backends: Dict[str, _Backend] = {}
+        self._lock = threading.Lock()
+        # One JVM start per locale at a time, without blocking checks on other locales
+        self._start_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._traffic = deque()
+        self._tally = TallyCounter()
+
+    def get(self, locale: Optional[str] = None):
+        """The locale's LanguageTool instance, started if needed"""
+        return self._acquire(locale or self.default_locale, hold=False).tool
+
+    def loaded(self) -> List[Any]:
+        with self._lock:
+            return [backend.tool for backend in self._backends.values()]
+
+    def check(self, locale: Optional[str], text: str) -> List[Any]:
+        """Raw LanguageTool matches for text under the locale's rules"""
+        locale = locale or self.default_locale
+        self._record(locale)
+        backend = self._acquire(locale, hold=True)
+        try:
+            with CHECK_SECONDS.time(locale=locale):
+                return backend.tool.check(text)
+        finally:
+            with self._lock:
+                backend.in_flight -= 1
+                backend.last_used = self.clock()
+            self.sweep()
+
+    def _acquire(self, locale: str, hold: bool) -> _Backend:
+        with self._lock:
+            backend = self._backends.get(locale)
+            if backend is not None:
+                backend.in_flight += hold
+                return backend
+        with self._start_locks[locale]:
+            with self._lock:
+                backend = self._backends.get(locale)
+                if backend is not None:
+                    backend.in_flight += hold
+                    return backend
+            start = time.perf_counter()
+            tool = self.factory(locale)
+            POOL_EVENTS.inc(locale=locale, event="start")
+            logger.info(f"Started LanguageTool for {locale} in {time.perf_counter() - start:.1f}s")
+            backend = _Backend(locale, tool, self.clock())
+            with self._lock:
+                backend.in_flight += hold
+                self._backends[locale] = backend
+            # The backend just started is never the one making room
+            self._evict_over_capacity(keep=locale)
+            return backend
+
+    def _record(self, locale: str) -> None:
+        now = self.clock()
+        with self._lock:
+            self._traffic.append((now, locale))
+            self._tally[locale] += 1
+            self._trim(now)
+
+    def _trim(self, now: float) -> None:
+        while self._traffic and now - self._traffic[0][0] > self.window_seconds:
+            _, locale = self._traffic.popleft()
+            self._tally[locale] -= 1
+            if not self._tally[locale]:
+                del self._tally[locale]
+
+    def share(self, locale: str) -> float:
+        with self._lock:
+            self._trim(self.clock())
+            total = len(self._traffic)
+            return self._tally.get(locale, 0) / total if total else 0.0
+
+    def _evictable(self, backend: _Backend) -> bool:
+        return backend.locale != self.default_locale and backend.in_flight == 0
+
+    def sweep(self) -> List[str]:
+        """Evict idle backends whose locale has fallen below the warm share; returns their locales"""
+        now = self.clock()
+        with self._lock:
+            self._trim(now)
+            total = len(self._traffic) or 1
+            idle = [
+                backend for backend in self._backends.values()
+                if self._evictable(backend)
+                and now - backend.last_used > self.idle_seconds
+                and self._tally.get(backend.locale, 0) / total < self.warm_share
+            ]
+            for backend in idle:
+                del self._backends[backend.locale]
+        for backend in idle:
+            self._close(backend, "idle")
+        return [backend.locale for backend in idle]
+
+    def _evict_over_capacity(self, keep: str) -> None:
+        with self._lock:
+            victims = []
+            candidates = sorted(
+                (b for b in self._backends.values() if self._evictable(b) and b.locale != keep),
+                key=lambda b: (self._tally.get(b.locale, 0), b.last_used),
+            )
+            while len(self._backends) > self.max_instances and candidates:
+                victim = candidates.pop(0)
+                del self._backends[victim.locale]
+                victims.append(victim)
+        for victim in victims:
+            self._close(victim, "capacity")
+
+    def _close(self, backend: _Backend, reason: str) -> None:
+        POOL_EVENTS.inc(locale=backend.locale, event="evict")
+        BACKEND_RSS_BYTES.set(0, locale=backend.locale)
+        logger.info(f"Closing LanguageTool for {backend.locale} ({reason})")
+        try:
+            backend.tool.close()
+        except Exception as e:
+            logger.error(f"Failed to close LanguageTool for {backend.locale}: {e}")
+
+    @staticmethod
+    def _rss(tool) -> Optional[int]:
+        """Resident memory of the tool's local server process (None for a remote server)"""
+        pid = getattr(getattr(tool, "_server", None), "pid", None)
+        return rss_bytes(pid) if pid else None
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-locale state, traffic share, memory and check latency"""
+        now = self.clock()
+        with self._lock:
+            self._trim(now)
+            total = len(self._traffic)
+            backends = dict(self._backends)
+            tally = dict(self._tally)
+        locales = {}
+        for locale in sorted(set(backends) | set(tally)):
+            backend = backends.get(locale)
+            share = tally.get(locale, 0) / total if total else 0.0
+            latency = CHECK_SECONDS.snapshot(locale=locale)
+            rss = self._rss(backend.tool) if backend else None
+            TRAFFIC_SHARE.set(share, locale=locale)
+            if rss is not None:
+                BACKEND_RSS_BYTES.set(rss, locale=locale)
+            locales[locale] = {
+                "loaded": backend is not None,
+                "requests_in_window": tally.get(locale, 0),
+                "traffic_share": share,
+                "kept_warm": backend is not None and (locale == self.default_locale or share >= self.warm_share),
+                "idle_seconds": now - backend.last_used if backend else None,
+                "rss_bytes": rss,
+                "checks": latency["count"],
+                "mean_check_ms": latency["sum"] / latency["count"] * 1000 if latency["count"] else None,
+            }
+        return {
+            "default_locale": self.default_locale,
+            "window_seconds": self.window_seconds,
+            "warm_share": self.warm_share,
+            "idle_seconds": self.idle_seconds,
+            "max_instances": self.max_instances,
+            "locales": locales,
+        }
@@ -1,20 +1,207 @@
-import spacy
+from spacy.pipeline import Sentencizer
 from collections import Counter
 import nltk
 from nltk.corpus import wordnet
 from nltk.tokenize import word_tokenize
 import logging
 from typing import Dict, Any, List
+from ..metrics import timed, model_load_timer
+from ..model_server import load_spacy
+from .. import fields, signals, streaming
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def yules_k(word_freq: Counter, total: int) -> float:
+    """Yule's K from word frequencies (only their frequency-of-frequency spectrum matters)"""
+    if total < 2:
+        return 0
+    freq_of_freq = Counter(word_freq.values())
+
+    # Calculate sum of squared frequencies
+    sum_sq_freq = sum((freq * freq) * count for freq, count in freq_of_freq.items())
+    return 10000 * (sum_sq_freq - total) / (total * total)
+
+
+class LexicalCounts:
+    """Running totals behind the lexical metrics, fed one Doc at a time.
+
+    Adding an essay's paragraph docs in order gives the same analysis as
+    adding the whole essay's Doc, so long texts can be streamed. Counts of
+    separate paragraphs merge the same way, and round-trip through
+    to_dict() so a revision can reuse those of unchanged paragraphs.
+    """
+
+    # State that to_dict() / from_dict() carry (the word lists are the service's)
+    FIELDS = (
+        'word_freq', 'content_freq', 'total_words', 'word_chars', 'long_words', 'medium_words',
+        'long_examples', 'basic_words', 'academic_count', 'academic_used', 'advanced_count',
+        'advanced_used', 'sentence_lengths', 'short_sentences',
+    )
+
+    def __init__(self, basic_words, academic_words, advanced_vocabulary):
+        self.basic_vocabulary = basic_words
+        self.academic_vocabulary = academic_words
+        self.advanced_vocabulary = advanced_vocabulary
+        self.word_freq = Counter()  # alphabetic words, lowercased
+        self.content_freq = Counter()  # ... that are not stop words
+        self.total_words = 0
+        self.word_chars = 0
+        self.long_words = 0
+        self.medium_words = 0
+        self.long_examples: List[str] = []
+        self.basic_words: List[str] = []
+        self.academic_count = 0
+        self.academic_used: Dict[str, None] = {}  # insertion-ordered set
+        self.advanced_count = 0
+        self.advanced_used: Dict[str, None] = {}
+        self.sentence_lengths: List[int] = []
+        self.short_sentences: List[str] = []
+
+    def add(self, doc) -> "LexicalCounts":
+        for token in doc:
+            if not token.is_alpha:
+                continue
+            word = token.text.lower()
+            self.word_freq[word] += 1
+            self.total_words += 1
+            self.word_chars += len(word)
+            if not token.is_stop:
+                self.content_freq[word] += 1
+            if len(word) > 7:
+                self.long_words += 1
+                if len(self.long_examples) < 10:
+                    self.long_examples.append(word)
+            elif len(word) > 5:
+                self.medium_words += 1
+            if word in self.basic_vocabulary:
+                self.basic_words.append(word)
+            if word in self.academic_vocabulary:
+                self.academic_count += 1
+                self.academic_used[word] = None
+            if word in self.advanced_vocabulary:
+                self.advanced_count += 1
+                self.advanced_used[word] = None
+        for sent in doc.sents:
+            length = len([token for token in sent if token.is_alpha])
+            self.sentence_lengths.append(length)
+            if length < 10:
+                self.short_sentences.append(sent.text)
+        return self
+
+    def merge(self, other: "LexicalCounts") -> "LexicalCounts":
+        """Add the counts of the text that follows this one"""
+        self.word_freq.update(other.word_freq)
+        self.content_freq.update(other.content_freq)
+        self.total_words += other.total_words
+        self.word_chars += other.word_chars
+        self.long_words += other.long_words
+        self.medium_words += other.medium_words
+        self.long_examples.extend(other.long_examples[:10 - len(self.long_examples)])
+        self.basic_words.extend(other.basic_words)
+        self.academic_count += other.academic_count
+        self.academic_used.update(other.academic_used)
+        self.advanced_count += other.advanced_count
+        self.advanced_used.update(other.advanced_used)
+        self.sentence_lengths.extend(other.sentence_lengths)
+        self.short_sentences.extend(other.short_sentences)
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        state = {name: getattr(self, name) for name in self.FIELDS}
+        state['academic_used'] = list(self.academic_used)
+        state['advanced_used'] = list(self.advanced_used)
+        return state
+
+    def load(self, state: Dict[str, Any]) -> "LexicalCounts":
+        """Restore to_dict() state into these (empty) counts"""
+        for name in self.FIELDS:
+            setattr(self, name, state[name])
+        self.word_freq = Counter(state['word_freq'])
+        self.content_freq = Counter(state['content_freq'])
+        self.academic_used = dict.fromkeys(state['academic_used'])
+        self.advanced_used = dict.fromkeys(state['advanced_used'])
+        return self
+
+    def _ratio(self, count: int) -> float:
+        return count / self.total_words if self.total_words else 0
+
+    def repeated_words(self) -> List[str]:
+        return [word for word, count in self.content_freq.most_common(5) if count > 1]
+
+    def lexical_diversity(self) -> dict:
+        return {
+            'total_words': self.total_words,
+            'unique_words': len(self.word_freq),
+            'diversity_ratio': self._ratio(len(self.word_freq)),
+            'yules_k': yules_k(self.word_freq, self.total_words),
+            'repeated_words': self.repeated_words()
+        }
+
+    def sophistication(self) -> dict:
+        return {
+            'avg_word_length': self._ratio(self.word_chars),
+            'long_words_ratio': self._ratio(self.long_words),
+            'medium_words_ratio': self._ratio(self.medium_words),
+            'basic_words_ratio': self._ratio(len(self.basic_words)),
+            'sophisticated_words': self.long_examples,  # Show just top 10 examples
+            'basic_words': self.basic_words
+        }
+
+    def sentence_structure(self) -> dict:
+        lengths = self.sentence_lengths
+        # Calculate sentence variety measures
+        if lengths:
+            avg_length = sum(lengths) / len(lengths)
+            length_variability = sum(abs(l - avg_length) for l in lengths) / len(lengths)
+        else:
+            avg_length = 0
+            length_variability = 0
+
+        return {
+            'avg_sentence_length': avg_length,
+            'sentence_count': len(lengths),
+            'length_variability': length_variability,  # Higher values indicate more variety
+            'complex_sentences': len([l for l in lengths if l > 15]),
+            'short_sentences': self.short_sentences
+        }
+
+    def academic_usage(self) -> dict:
+        return {
+            'academic_words_count': self.academic_count,
+            'academic_ratio': self._ratio(self.academic_count),
+            'academic_words_used': list(self.academic_used)
+        }
+
+    def advanced_usage(self) -> dict:
+        return {
+            'advanced_words_count': self.advanced_count,
+            'advanced_ratio': self._ratio(self.advanced_count),
+            # Lexical density: proportion of content words
+            'lexical_density': self._ratio(sum(self.content_freq.values())),
+            'advanced_words_used': list(self.advanced_used)
+        }
+
+    def analysis(self) -> dict:
+        return {
+            'lexical_diversity': self.lexical_diversity(),
+            'word_sophistication': self.sophistication(),
+            'sentence_structure': self.sentence_structure(),
+            'academic_language': self.academic_usage(),
+            'advanced_vocabulary': self.advanced_usage()
+        }
+
+
 class LexicalService:
     def __init__(self):
         try:
             # Load spaCy model
-            self.nlp = spacy.load('en_core_web_md')
+            with model_load_timer("spacy_en_core_web_md.lexical"):
+                self.nlp = load_spacy('en_core_web_md')
+            # Rule-based sentence splitter for the tokenizer-only "fast" mode
+            self.sentencizer = Sentencizer()
             
             # Download NLTK data
             nltk.download('punkt', quiet=True)
@@ -68,38 +255,60 @@ class LexicalService:
             logger.error(f"Failed to initialize lexical service: {e}")
             raise RuntimeError("Failed to initialize lexical service")
 
-    def analyze_lexical(self, text: str) -> Dict[str, Any]:
+    @timed("lexical", "analyze_lexical")
+    def analyze_lexical(self, text: str, mode: str = "full", stream: bool = None, include=None) -> Dict[str, Any]:
+        """Lexical resource band and feedback; include limits the feedback sections built (see app.fields)"""
         try:
-            # Process text with spaCy
-            doc = self.nlp(text)
+            streaming.enforce_limit(text)
+            if streaming.should_stream(text, stream, mode == "fast"):
+                # One paragraph chunk in memory at a time (not recorded in the submission's signals)
+                with timed("lexical", "stream"):
+                    counts = self.counts()
+                    sentencizer = self.sentencizer if mode == "fast" else None
+                    for doc in streaming.stream_docs(self.nlp, text, sentencizer):
+                        counts.add(doc)
+                with timed("lexical", "compile_results"):
+                    return self.analyze_counts(counts, mode, include)
+
+            # Process text with spaCy (tokenizer + sentencizer only in fast mode;
+            # every metric below relies on lexical attributes and sentence bounds)
+            if mode == "fast":
+                with timed("lexical", "tokenize"):
+                    doc = self.sentencizer(self.nlp.make_doc(text))
+            else:
+                with timed("lexical", "spacy_parse"):
+                    doc = signals.parse(self.nlp, text)
             
-            # Basic lexical analysis
-            analysis = {
-                'lexical_diversity': self._analyze_lexical_diversity(doc),
-                'word_sophistication': self._analyze_sophistication(doc),
-                'sentence_structure': self._analyze_sentence_structure(doc),
-                'academic_language': self._analyze_academic_usage(doc),
-                'advanced_vocabulary': self._analyze_advanced_vocabulary(doc)
-            }
+            # Basic lexical analysis: one pass over the doc feeds every metric
+            with timed("lexical", "metrics"):
+                counts = self.counts(doc)
             
             # Calculate overall score and compile results
-            return self._compile_results(analysis)
+            with timed("lexical", "compile_results"):
+                return self.analyze_counts(counts, mode, include)
             
         except Exception as e:
             logger.error(f"Error analyzing text: {e}")
             raise
 
+    def analyze_counts(self, counts: LexicalCounts, mode: str = "full", include=None) -> Dict[str, Any]:
+        """analyze_lexical's result from counts gathered (and merged) elsewhere"""
+        return self._compile_results(counts.analysis(), suggest_synonyms=mode != "fast", include=include)
+
+    def counts(self, doc=None) -> LexicalCounts:
+        """Empty counts against this service's word lists, or those of doc"""
+        counts = LexicalCounts(self.basic_words, self.academic_words, self.advanced_vocabulary)
+        return counts.add(doc) if doc is not None else counts
+
     def _find_repeated_words(self, doc) -> List[str]:
         """Find commonly repeated words"""
-        words = [token.text.lower() for token in doc if token.is_alpha and not token.is_stop]
-        word_counts = Counter(words)
-        return [word for word, count in word_counts.most_common(5) if count > 1]
+        return self.counts(doc).repeated_words()
 
     def _identify_basic_words(self, doc) -> List[str]:
         """Identify basic words that could be upgraded"""
-        return [token.text.lower() for token in doc 
-                if token.is_alpha and token.text.lower() in self.basic_words]
+        return self.counts(doc).basic_words
 
+    @timed("lexical", "wordnet_alternatives")
     def _suggest_alternatives(self, words: List[str]) -> Dict[str, List[str]]:
         """Suggest synonyms for commonly used words"""
         suggestions = {}
@@ -143,116 +352,33 @@ class LexicalService:
 
     def _extract_short_sentences(self, doc) -> List[str]:
         """Extract examples of short sentences"""
-        return [sent.text for sent in doc.sents 
-                if len([token for token in sent if token.is_alpha]) < 10]
+        return self.counts(doc).short_sentences
                 
     def _calculate_yules_k(self, words: List[str]) -> float:
         """Calculate Yule's K measure (vocabulary richness)"""
-        if not words or len(words) < 2:
-            return 0
-            
-        word_freq = Counter(words)
-        freq_of_freq = Counter(word_freq.values())
-        N = len(words)
-        
-        # Calculate sum of squared frequencies
-        sum_sq_freq = sum((freq * freq) * count for freq, count in freq_of_freq.items())
-        
-        # Calculate Yule's K
-        if N > 1:
-            return 10000 * (sum_sq_freq - N) / (N * N)
-        return 0
+        return yules_k(Counter(words), len(words))
 
     def _analyze_lexical_diversity(self, doc) -> dict:
         """Analyze vocabulary range and diversity"""
-        words = [token.text.lower() for token in doc if token.is_alpha]
-        unique_words = set(words)
-        word_freq = Counter(words)
-        repeated_words = self._find_repeated_words(doc)
-        
-        # Calculate Type-Token Ratio (TTR) and Yule's K
-        ttr = len(unique_words) / len(words) if words else 0
-        yules_k = self._calculate_yules_k(words)
-        
-        return {
-            'total_words': len(words),
-            'unique_words': len(unique_words),
-            'diversity_ratio': ttr,
-            'yules_k': yules_k,  
-            'repeated_words': repeated_words
-        }
+        return self.counts(doc).lexical_diversity()
 
     def _analyze_sophistication(self, doc) -> dict:
         """Analyze word sophistication level"""
-        words = [token.text.lower() for token in doc if token.is_alpha]
-        long_words = [word for word in words if len(word) > 7]
-        medium_words = [word for word in words if len(word) > 5 and len(word) <= 7]
-        basic_words = self._identify_basic_words(doc)
-        
-        # Calculate proportion of words beyond basic vocabulary
-        basic_ratio = len(basic_words) / len(words) if words else 0
-        sophisticated_ratio = len(long_words) / len(words) if words else 0
-        medium_ratio = len(medium_words) / len(words) if words else 0
-        
-        return {
-            'avg_word_length': sum(len(word) for word in words) / len(words) if words else 0,
-            'long_words_ratio': sophisticated_ratio,
-            'medium_words_ratio': medium_ratio,
-            'basic_words_ratio': basic_ratio,
-            'sophisticated_words': long_words[:10],  # Show just top 10 examples
-            'basic_words': basic_words
-        }
+        return self.counts(doc).sophistication()
 
     def _analyze_sentence_structure(self, doc) -> dict:
         """Analyze sentence complexity"""
-        sentences = list(doc.sents)
-        lengths = [len([token for token in sent if token.is_alpha]) for sent in sentences]
-        short_sentences = self._extract_short_sentences(doc)
-        
-        # Calculate sentence variety measures
-        if lengths:
-            avg_length = sum(lengths) / len(lengths)
-            length_variability = sum(abs(l - avg_length) for l in lengths) / len(lengths)
-        else:
-            avg_length = 0
-            length_variability = 0
-        
-        return {
-            'avg_sentence_length': avg_length,
-            'sentence_count': len(sentences),
-            'length_variability': length_variability,  # Higher values indicate more variety
-            'complex_sentences': len([l for l in lengths if l > 15]),
-            'short_sentences': short_sentences
-        }
+        return self.counts(doc).sentence_structure()
 
     def _analyze_academic_usage(self, doc) -> dict:
         """Analyze academic language usage"""
-        words = [token.text.lower() for token in doc if token.is_alpha]
-        academic_used = [word for word in words if word in self.academic_words]
-        
-        return {
-            'academic_words_count': len(academic_used),
-            'academic_ratio': len(academic_used) / len(words) if words else 0,
-            'academic_words_used': list(set(academic_used))
-        }
+        return self.counts(doc).academic_usage()
     
     def _analyze_advanced_vocabulary(self, doc) -> dict:
         """Analyze usage of advanced (non-academic but sophisticated) vocabulary"""
-        words = [token.text.lower() for token in doc if token.is_alpha]
-        advanced_used = [word for word in words if word in self.advanced_vocabulary]
-        
-        # Calculate lexical density (proportion of content words)
-        content_words = [token.text.lower() for token in doc if token.is_alpha and not token.is_stop]
-        lexical_density = len(content_words) / len(words) if words else 0
-        
-        return {
-            'advanced_words_count': len(advanced_used),
-            'advanced_ratio': len(advanced_used) / len(words) if words else 0,
-            'lexical_density': lexical_density,
-            'advanced_words_used': list(set(advanced_used))
-        }
+        return self.counts(doc).advanced_usage()
 
-    def _compile_results(self, analysis: dict) -> dict:
+    def _compile_results(self, analysis: dict, suggest_synonyms: bool = True, include=None) -> dict:
         """Calculate final scores and compile feedback"""
         # Calculate component scores (0-1 scale)
         diversity_score = min(analysis['lexical_diversity']['diversity_ratio'] * 1.8, 1)
@@ -298,7 +424,7 @@ class LexicalService:
         band_score = 1 + (overall_score * 8)
         
         # Generate feedback
-        feedback = self._generate_feedback(analysis)
+        feedback = self._generate_feedback(analysis, suggest_synonyms, include)
         
         return {
             'overall_score': round(band_score, 1),
@@ -308,18 +434,21 @@ class LexicalService:
                 'academic_usage': max(1, round(academic_score * 9, 1)),
                 'advanced_vocabulary': max(1, round(advanced_score * 9, 1))
             },
-            'detailed_analysis': analysis,
+            'detailed_analysis': analysis if fields.wants(include, "details") else {},
             'feedback': feedback
         }
 
-    def _generate_feedback(self, analysis: dict) -> dict:
-        """Generate detailed feedback with specific improvements"""
+    def _generate_feedback(self, analysis: dict, suggest_synonyms: bool = True, include=None) -> dict:
+        """Generate detailed feedback with specific improvements (WordNet lookups are optional)"""
         feedback = {
             'general_feedback': [],
             'strengths': [],
             'improvements': [],
             'detailed_suggestions': {}
         }
+        suggest = fields.wants(include, "suggestions")
+        if not suggest and not fields.wants(include, "feedback"):
+            return feedback
         
         # Analyze vocabulary diversity
         diversity_ratio = analysis['lexical_diversity']['diversity_ratio']
@@ -329,11 +458,11 @@ class LexicalService:
         # More nuanced thresholds for diversity
         if diversity_ratio < 0.35:
             feedback['general_feedback'].append("Your vocabulary range needs improvement.")
-            if repeated_words:
+            if repeated_words and suggest:
                 feedback['detailed_suggestions']['repeated_words'] = {
                     'issue': "Frequently repeated words",
                     'examples': repeated_words,
-                    'suggestions': self._suggest_alternatives(repeated_words)
+                    'suggestions': self._suggest_alternatives(repeated_words) if suggest_synonyms else {}
                 }
         elif diversity_ratio < 0.45:
             feedback['strengths'].append("You have a good foundation in vocabulary usage.")
@@ -358,7 +487,7 @@ class LexicalService:
         )
         
         if combined_sophisticated_ratio < 0.1:
-            if basic_words:
+            if basic_words and suggest:
                 feedback['detailed_suggestions']['basic_vocabulary'] = {
                     'issue': "Simple word choices",
                     'examples': basic_words[:5],  # Limit to 5 examples
@@ -381,11 +510,12 @@ class LexicalService:
         
         # Only suggest academic words if both academic AND advanced vocabulary are low
         if academic_data['academic_ratio'] < 0.03 and advanced_ratio < 0.03:
-            feedback['detailed_suggestions']['vocabulary_enhancement'] = {
-                'issue': "Limited formal vocabulary",
-                'academic_examples': academic_data['academic_words_used'],
-                'suggestions': {'linking_phrases': self._suggest_linking_phrases()}
-            }
+            if suggest:
+                feedback['detailed_suggestions']['vocabulary_enhancement'] = {
+                    'issue': "Limited formal vocabulary",
+                    'academic_examples': academic_data['academic_words_used'],
+                    'suggestions': {'linking_phrases': self._suggest_linking_phrases()}
+                }
             feedback['improvements'].append("Try to incorporate more formal or academic vocabulary.")
         elif academic_data['academic_ratio'] >= 0.03:
             feedback['strengths'].append("Good use of academic vocabulary.")
@@ -399,13 +529,16 @@ class LexicalService:
         # Analyze sentence structure
         sentence_data = analysis['sentence_structure']
         if sentence_data['length_variability'] < 3 and sentence_data['short_sentences']:
-            feedback['detailed_suggestions']['sentence_structure'] = {
-                'issue': "Limited sentence variety",
-                'examples': sentence_data['short_sentences'][:2],  # Limit examples
-                'suggestions': {'linking_phrases': self._suggest_linking_phrases()}
-            }
+            if suggest:
+                feedback['detailed_suggestions']['sentence_structure'] = {
+                    'issue': "Limited sentence variety",
+                    'examples': sentence_data['short_sentences'][:2],  # Limit examples
+                    'suggestions': {'linking_phrases': self._suggest_linking_phrases()}
+                }
             feedback['improvements'].append("Try varying your sentence structures and lengths more.")
         elif sentence_data['length_variability'] >= 5:
             feedback['strengths'].append("Good variety in sentence structures and lengths.")
 
+        if not fields.wants(include, "feedback"):
+            feedback.update(general_feedback=[], strengths=[], improvements=[])
         return feedback
\ No newline at end of file
@@ -0,0 +1,289 @@
+"""In-process spelling check backed by a symmetric-delete (SymSpell) index.
+
+Every dictionary word is stored under all strings reachable by deleting up
+to `max_edit` characters from its prefix. A misspelling is looked up by
+generating its own deletes, so candidates come from a few binary searches
+instead of an edit-distance scan over the vocabulary.
+
+The index is one file of fixed-width arrays (hashes sorted for searchsorted,
+word ids, frequencies, UTF-8 word bytes) behind a small JSON header, opened
+with np.memmap so API workers share the pages instead of each building it.
+
+    python -m app.services.spelling_service build frequency_dictionary_en.txt spelling.idx
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import struct
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .. import config
+from ..metrics import model_load_timer
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"SYMSPEL1"
+_ALIGN = 8
+
+# Words the checker looks at: letters only, at least two of them, not part of
+# a contraction or an identifier
+WORD_PATTERN = re.compile(r"(?<![\w'’-])[A-Za-z]{2,}(?![\w'’-])")
+
+# What may sit between a sentence end and the next sentence's first word
+_SENTENCE_OPENERS = "\"'“‘([ \t\r"
+
+
+def _hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _deletes(word: str, max_edit: int) -> set:
+    """word plus every string reachable by deleting up to max_edit characters"""
+    variants = {word}
+    for n in range(1, min(max_edit, len(word) - 1) + 1):
+        for positions in combinations(range(len(word)), n):
+            variants.add("".join(c for i, c in enumerate(word) if i not in positions))
+    return variants
+
+
+def _starts_sentence(text: str, offset: int) -> bool:
+    """Whether the word at offset opens the text, a line or a sentence"""
+    i = offset - 1
+    while i >= 0 and text[i] in _SENTENCE_OPENERS:
+        i -= 1
+    return i < 0 or text[i] in ".!?\n"
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (transpositions count as one edit); limit + 1 when above limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def read_wordlist(path: str) -> Dict[str, int]:
+    """'word count' lines (SymSpell frequency dictionary format); a bare word counts once"""
+    counts: Dict[str, int] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if not parts or not parts[0].isalpha():
+                continue
+            word = parts[0].lower()
+            count = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 1
+            counts[word] = counts.get(word, 0) + count
+    return counts
+
+
+def build_index(counts: Dict[str, int], path: str, max_edit: int = 2, prefix_length: int = 7) -> None:
+    """Write the symmetric-delete index for a word -> frequency mapping to path"""
+    # Word ids follow hash order so the word hash array doubles as the exact-match lookup
+    words = sorted(counts, key=_hash)
+    word_hash = np.array([_hash(w) for w in words], dtype=np.uint64)
+    word_freq = np.array([counts[w] for w in words], dtype=np.uint64)
+    encoded = [w.encode("utf-8") for w in words]
+    word_offsets = np.zeros(len(words) + 1, dtype=np.uint64)
+    word_offsets[1:] = np.cumsum([len(e) for e in encoded])
+    word_bytes = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+    pairs = {}
+    for word_id, word in enumerate(words):
+        for variant in _deletes(word[:prefix_length], max_edit):
+            pairs.setdefault(_hash(variant), set()).add(word_id)
+    delete_hash = np.array([h for h in sorted(pairs) for _ in pairs[h]], dtype=np.uint64)
+    delete_word = np.array([i for h in sorted(pairs) for i in sorted(pairs[h])], dtype=np.uint32)
+
+    arrays = {
+        "word_hash": word_hash, "word_freq": word_freq, "word_offsets": word_offsets,
+        "word_bytes": word_bytes, "delete_hash": delete_hash, "delete_word": delete_word,
+    }
+    digest = hashlib.sha256(json.dumps(sorted(counts.items())).encode("utf-8")).hexdigest()[:12]
+    header = {
+        "max_edit": max_edit, "prefix_length": prefix_length, "words": len(words),
+        "fingerprint": f"{digest}-{max_edit}-{prefix_length}", "arrays": {},
+    }
+    # Array offsets are relative to the (aligned) end of the header
+    offset = 0
+    for name, array in arrays.items():
+        header["arrays"][name] = {"dtype": array.dtype.str, "offset": offset, "count": int(array.size)}
+        offset += -(-array.nbytes // _ALIGN) * _ALIGN
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = -(-(len(MAGIC) + 4 + len(header_bytes)) // _ALIGN) * _ALIGN
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + header["arrays"][name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+
+
+def _read_header(path: str) -> Tuple[dict, int]:
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a spelling index")
+        (size,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(size))
+    return header, -(-(len(MAGIC) + 4 + size) // _ALIGN) * _ALIGN
+
+
+def index_fingerprint(path: Optional[str] = None) -> Optional[str]:
+    """Build fingerprint of the configured index (None without one); part of the scorer version"""
+    path = path or config.SPELLING_INDEX_PATH
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return _read_header(path)[0]["fingerprint"]
+    except (OSError, ValueError) as e:
+        logger.error(f"Unreadable spelling index {path}: {e}")
+        return None
+
+
+class SpellingIndex:
+    """Memory-mapped symmetric-delete dictionary"""
+
+    def __init__(self, path: str):
+        header, data_start = _read_header(path)
+        self.path = path
+        self.max_edit = header["max_edit"]
+        self.prefix_length = header["prefix_length"]
+        self.fingerprint = header["fingerprint"]
+        for name, spec in header["arrays"].items():
+            array = (
+                np.memmap(path, dtype=np.dtype(spec["dtype"]), mode="r",
+                          offset=data_start + spec["offset"], shape=(spec["count"],))
+                if spec["count"] else np.zeros(0, dtype=np.dtype(spec["dtype"]))
+            )
+            setattr(self, name, array)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> Optional["SpellingIndex"]:
+        """Open the configured index, building it from SPELLING_WORDLIST if needed; None without either"""
+        path = path or config.SPELLING_INDEX_PATH
+        if not path:
+            return None
+        if not os.path.exists(path):
+            if not config.SPELLING_WORDLIST:
+                return None
+            with model_load_timer("spelling_index_build"):
+                build_index(read_wordlist(config.SPELLING_WORDLIST), path,
+                            config.SPELLING_MAX_EDIT, config.SPELLING_PREFIX_LENGTH)
+        with model_load_timer("spelling_index"):
+            return cls(path)
+
+    def _word(self, word_id: int) -> str:
+        start, end = int(self.word_offsets[word_id]), int(self.word_offsets[word_id + 1])
+        return self.word_bytes[start:end].tobytes().decode("utf-8")
+
+    def _find(self, hashes: np.ndarray, value: int) -> Tuple[int, int]:
+        value = np.uint64(value)
+        return int(np.searchsorted(hashes, value, "left")), int(np.searchsorted(hashes, value, "right"))
+
+    def frequency(self, word: str) -> int:
+        """Corpus count of word (0 when it is not in the dictionary)"""
+        start, end = self._find(self.word_hash, _hash(word))
+        for word_id in range(start, end):
+            if self._word(word_id) == word:
+                return int(self.word_freq[word_id])
+        return 0
+
+    def __contains__(self, word: str) -> bool:
+        return self.frequency(word) > 0
+
+    def suggest(self, word: str, limit: int = 5) -> List[Tuple[str, int]]:
+        """(suggestion, distance) for the closest dictionary words, most frequent first"""
+        # One vectorized binary search for all of the word's deletes
+        hashes = np.array([_hash(v) for v in _deletes(word[:self.prefix_length], self.max_edit)], dtype=np.uint64)
+        starts = np.searchsorted(self.delete_hash, hashes, "left")
+        ends = np.searchsorted(self.delete_hash, hashes, "right")
+        word_ids = set()
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            if end > start:
+                word_ids.update(self.delete_word[start:end].tolist())
+        found = []
+        for word_id in word_ids:
+            candidate = self._word(word_id)
+            distance = edit_distance(word, candidate, self.max_edit)
+            if distance <= self.max_edit:
+                found.append((distance, -int(self.word_freq[word_id]), candidate))
+        found.sort()
+        return [(candidate, distance) for distance, _, candidate in found[:limit]]
+
+
+class SpellingService:
+    """Flags unknown words as TYPOS matches in GrammarService's normalized format"""
+
+    RULE_ID = "SYMSPELL_SPELLING"
+
+    def __init__(self, index: SpellingIndex, max_suggestions: int = 5):
+        self.index = index
+        self.max_suggestions = max_suggestions
+
+    def check(self, text: str) -> List[Dict]:
+        matches = []
+        for m in WORD_PATTERN.finditer(text):
+            token = m.group(0)
+            word = token.lower()
+            if word in self.index:
+                continue
+            # Unknown capitalized words are most likely names and all-caps ones
+            # acronyms, except at the start of a sentence where every word is capitalized
+            if token.isupper() or (token[0].isupper() and not _starts_sentence(text, m.start())):
+                continue
+            suggestions = [s for s, _ in self.index.suggest(word, self.max_suggestions)]
+            matches.append({
+                "offset": m.start(),
+                "length": len(token),
+                "message": "Possible spelling mistake found.",
+                "replacements": suggestions,
+                "category": "TYPOS",
+                "rule_id": self.RULE_ID,
+            })
+        return matches
+
+
+def main(argv: Iterable[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Spelling index tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build an index from a 'word count' frequency list")
+    build.add_argument("wordlist")
+    build.add_argument("out", nargs="?", default=config.SPELLING_INDEX_PATH)
+    build.add_argument("--max-edit", type=int, default=config.SPELLING_MAX_EDIT)
+    build.add_argument("--prefix-length", type=int, default=config.SPELLING_PREFIX_LENGTH)
+    check = commands.add_parser("check", help="list spelling matches for a text")
+    check.add_argument("text")
+    check.add_argument("--index", default=config.SPELLING_INDEX_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        counts = read_wordlist(args.wordlist)
+        build_index(counts, args.out, args.max_edit, args.prefix_length)
+        print(f"Indexed {len(counts)} words into {args.out}")
+    else:
+        service = SpellingService(SpellingIndex(args.index))
+        print(json.dumps(service.check(args.text), indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
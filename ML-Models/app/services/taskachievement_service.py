@@ -1,21 +1,91 @@
-from typing import Dict, Any, List
-import spacy
-from transformers import pipeline
-from sentence_transformers import SentenceTransformer
+from typing import Dict, Any, List, Tuple
+import re
+from spacy.pipeline import Sentencizer
 import nltk
 import logging
 from ..schemas.submission import SubmissionCreate
+from ..metrics import timed, model_load_timer
+from ..batching import MicroBatcher
+from ..model_server import load_spacy, load_encoder, load_zero_shot
+from .. import fields, signals
+from .. import config
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Cue words per task element, used instead of zero-shot NLI in "fast" mode
+ELEMENT_KEYWORDS = {
+    "position": ["believe", "opinion", "agree", "disagree", "argue", "view", "think"],
+    "arguments": ["because", "reason", "firstly", "secondly", "furthermore", "moreover", "since"],
+    "examples": ["example", "instance", "such as", "illustrate", "case"],
+    "conclusion": ["in conclusion", "to sum up", "in summary", "overall", "therefore"],
+    "overview": ["this essay", "discuss", "debate", "issue", "both"],
+    "multiple_views": ["some people", "others", "on the other hand", "whereas", "however"],
+    "opinion": ["i believe", "in my opinion", "i think", "personally", "my view"],
+    "problem": ["problem", "issue", "challenge", "concern", "difficulty"],
+    "causes": ["cause", "due to", "result of", "lead to", "reason"],
+    "solutions": ["solution", "solve", "tackle", "measure", "should"],
+    "evaluation": ["effective", "benefit", "drawback", "advantage", "disadvantage"],
+}
+
+# Label descriptions embedded with MiniLM in "standard" mode
+ELEMENT_DESCRIPTIONS = {
+    "position": "The writer clearly states their own position on the issue.",
+    "arguments": "The writer gives reasons and arguments to support a view.",
+    "examples": "The writer supports points with specific examples.",
+    "conclusion": "The essay ends with a conclusion summarising the main points.",
+    "overview": "The writer introduces the topic and gives an overview of the issue.",
+    "multiple_views": "The essay discusses both sides and different points of view.",
+    "opinion": "The writer gives a personal opinion.",
+    "problem": "The essay describes a problem and its impact.",
+    "causes": "The essay explains the causes of the problem.",
+    "solutions": "The essay proposes solutions to the problem.",
+    "evaluation": "The writer evaluates how effective the solutions would be.",
+}
+
+# MiniLM cosine similarities to the descriptions rarely leave [0.1, 0.5];
+# stretch that band onto [0, 1] so the 0.4 coverage threshold still applies
+SIMILARITY_FLOOR, SIMILARITY_CEILING = 0.1, 0.5
+
+_WORD = re.compile(r"\S+")
+
+
+def split_windows(text: str, size: int, overlap: float = 0.25) -> List[Tuple[int, int]]:
+    """Character spans of overlapping `size`-word windows covering text (one span when it fits)"""
+    words = [m.span() for m in _WORD.finditer(text)]
+    if len(words) <= size:
+        return [(0, len(text))]
+    # Fewest full-size windows whose overlap is at least `overlap`, spread evenly to the last word
+    stride = max(1, int(size * (1 - overlap)))
+    count = -(-(len(words) - size) // stride) + 1
+    firsts = [round(i * (len(words) - size) / (count - 1)) for i in range(count)]
+    return [(words[first][0], words[first + size - 1][1]) for first in firsts]
+
+
+def pool_scores(values: List[float], how: str) -> float:
+    """Combine per-window scores: mean (whole essay) or max (best window)"""
+    if how == "mean":
+        return sum(values) / len(values)
+    if how == "max":
+        return max(values)
+    raise ValueError(f"Unknown window pooling {how!r}; expected 'mean' or 'max'")
+
+
+def _cosine(a, b) -> float:
+    import numpy as np
+
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b) + 1e-9))
+
 class TaskAchievementService:
     def __init__(self):
         try:
             # Load NLP models
-            self.nlp = spacy.load("en_core_web_md")
-            self.semantic_model = SentenceTransformer("all-MiniLM-L6-v2")
-            self.text_classifier = pipeline("zero-shot-classification")
+            with model_load_timer("spacy_en_core_web_md.task_achievement"):
+                self.nlp = load_spacy("en_core_web_md")
+            with model_load_timer("minilm_l6_v2"):
+                self.semantic_model = load_encoder("all-MiniLM-L6-v2")
+            with model_load_timer("zero_shot_classifier"):
+                self.text_classifier = load_zero_shot()
 
             # Download required NLTK data
             nltk.download("punkt", quiet=True)
@@ -48,12 +118,82 @@ class TaskAchievementService:
                 "conclusion": ["therefore", "thus", "consequently", "in conclusion", "overall"],
             }
 
+            # Fast mode: tokenizer + rule-based sentences, keyword patterns per element
+            self.sentencizer = Sentencizer()
+            self.element_patterns = {
+                element: re.compile(r"\b(?:" + "|".join(re.escape(k) for k in keywords) + r")\b")
+                for element, keywords in ELEMENT_KEYWORDS.items()
+            }
+            # Standard mode: description embeddings, encoded on first use
+            self._element_embeddings = {}
+
+            # Concurrent submissions share batched MiniLM / zero-shot calls
+            self.encoder = MicroBatcher(
+                "minilm_encode", self._encode_batch,
+                max_batch_size=config.INFERENCE_BATCH_MAX_SIZE,
+                max_wait_ms=config.INFERENCE_BATCH_MAX_WAIT_MS
+            )
+            self.classifier = MicroBatcher(
+                "zero_shot", self._classify_batch,
+                max_batch_size=config.INFERENCE_BATCH_MAX_SIZE,
+                max_wait_ms=config.INFERENCE_BATCH_MAX_WAIT_MS
+            )
+
             logger.info("Task Achievement service initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Task Achievement service: {e}")
             raise
 
-    def analyze_submission(self, submission: SubmissionCreate) -> Dict[str, Any]:
+    def _encode_batch(self, texts: List[str], group=None) -> List[Any]:
+        """One MiniLM forward pass for a batch of texts"""
+        import numpy as np
+
+        embeddings = np.asarray(self.semantic_model.encode(texts, batch_size=len(texts)))
+        if embeddings.ndim == 1:
+            embeddings = embeddings.reshape(len(texts), -1)
+        return list(embeddings)
+
+    def _classify_batch(self, texts: List[str], group) -> List[Dict[str, Any]]:
+        """One zero-shot pass for texts sharing the same (labels, multi_label)"""
+        labels, multi_label = group
+        results = self.text_classifier(
+            texts if len(texts) > 1 else texts[0],
+            candidate_labels=list(labels),
+            multi_label=multi_label,
+            batch_size=len(texts) * len(labels)
+        )
+        return [results] if isinstance(results, dict) else list(results)
+
+    def _encode(self, *texts: str) -> List[Any]:
+        """MiniLM embeddings via the shared micro-batcher (recorded per submission)"""
+        return signals.encode(self.encoder.map, texts)
+
+    @staticmethod
+    def _windows(text: str, size: int) -> Tuple[List[str], List[Tuple[int, int]]]:
+        """Window texts and spans; an essay that fits is passed through unchanged"""
+        spans = split_windows(text, size, config.WINDOW_OVERLAP)
+        if len(spans) == 1:
+            return [text], spans
+        return [text[start:end] for start, end in spans], spans
+
+    def _zero_shot_element_scores(self, text: str, elements: List[str]) -> Dict[str, Any]:
+        """Full-mode element scores: zero-shot NLI per window, all windows in one batch"""
+        texts, spans = self._windows(text, config.ZERO_SHOT_WINDOW_WORDS)
+        results = signals.classify_many(self.classifier.map, texts, (tuple(elements), True))
+        per_window = [dict(zip(result["labels"], result["scores"])) for result in results]
+        return {
+            "labels": list(elements),
+            "scores": [
+                pool_scores([scores[e] for scores in per_window], config.WINDOW_POOLING_ELEMENTS)
+                for e in elements
+            ],
+            "windows": [
+                {"start": start, "end": end, "scores": scores} for (start, end), scores in zip(spans, per_window)
+            ],
+        }
+
+    @timed("task_achievement", "analyze_submission")
+    def analyze_submission(self, submission: SubmissionCreate, mode: str = None) -> Dict[str, Any]:
         """Analyze a submission and return structured results."""
         try:
             if not submission.text or not submission.task_type:
@@ -65,35 +205,41 @@ class TaskAchievementService:
             # Get question details if available
             question_desc = getattr(submission, 'question_desc', None)
             question_requirements = getattr(submission, 'question_requirements', None)
+            mode = mode or getattr(submission, 'mode', None) or "full"
+            include = fields.normalize(getattr(submission, 'include', None))
 
             analysis = self.analyze_task_achievement(
                 text=text, 
                 task_type=task_type,
                 question_desc=question_desc,
-                question_requirements=question_requirements
+                question_requirements=question_requirements,
+                mode=mode,
+                include=include
             )
 
             # Convert band score to percentage
             grade_percentage = (analysis["band_score"] - 1) * (100 / 8)
 
+            # Suggestions and the detailed analysis are built once, and only when asked for
+            feedback = {
+                "strengths": analysis["feedback"]["strengths"],
+                "improvements": analysis["feedback"]["improvements"],
+                "specific_suggestions": (
+                    self._generate_specific_suggestions(analysis) if fields.wants(include, "suggestions") else {}
+                )
+            }
             return {
                 "grade": max(0, min(100, grade_percentage)),
                 "ielts_score": max(1, min(9, analysis["band_score"])),
                 "task_achievement_score": analysis["band_score"],
-                "task_achievement_feedback": {
-                    "strengths": analysis["feedback"]["strengths"],
-                    "improvements": analysis["feedback"]["improvements"],
-                    "specific_suggestions": self._generate_specific_suggestions(analysis)
-                },
+                "task_achievement_feedback": feedback,
                 "task_achievement_analysis": {
                     "band_score": analysis["band_score"],
                     "component_scores": analysis["component_scores"],
-                    "detailed_analysis": self._generate_detailed_analysis(analysis),
-                    "feedback": {
-                        "strengths": analysis["feedback"]["strengths"],
-                        "improvements": analysis["feedback"]["improvements"],
-                        "specific_suggestions": self._generate_specific_suggestions(analysis)
-                    }
+                    "detailed_analysis": (
+                        self._generate_detailed_analysis(analysis) if fields.wants(include, "details") else {}
+                    ),
+                    "feedback": dict(feedback)
                 }
             }
 
@@ -103,32 +249,55 @@ class TaskAchievementService:
 
     def analyze_task_achievement(self, *, text: str, task_type: str, 
                            question_desc: str = None, 
-                           question_requirements: str = None) -> Dict[str, Any]:
-        """Main analysis method for task achievement."""
+                           question_requirements: str = None,
+                           mode: str = "full", include=None) -> Dict[str, Any]:
+        """Main analysis method for task achievement.
+
+        mode: "full" (zero-shot + MiniLM), "standard" (MiniLM only) or
+        "fast" (keywords and word overlap, no transformers). Strengths and
+        improvements are only listed when include asks for "feedback".
+        """
         try:
-            doc = self.nlp(text)
+            if mode == "fast":
+                with timed("task_achievement", "tokenize"):
+                    doc = self.sentencizer(self.nlp.make_doc(text))
+            else:
+                with timed("task_achievement", "spacy_parse"):
+                    doc = signals.parse(self.nlp, text)
+
+            if mode == "fast":
+                question_alignment = self._analyze_question_overlap(
+                    text, question_desc, question_requirements
+                )
+            elif question_desc or question_requirements:
+                question_alignment = self._analyze_question_alignment(
+                    text, question_desc, question_requirements
+                )
+            else:
+                question_alignment = None
 
             # Perform analysis
             analysis = {
                 "text": text,  # Store the original text for reference
                 "topic_relevance": self._analyze_topic_relevance(
-                    text, task_type, question_desc, question_requirements
+                    text, task_type, question_desc, question_requirements, mode
                 ),
                 "word_count": self._check_word_count(doc, task_type),
                 "paragraphs": self._analyze_paragraphs(doc),
                 # Note: coherence is calculated elsewhere but kept for reference
                 "coherence_score": 0.0,  # Placeholder, not used in task achievement score
-                "question_alignment": self._analyze_question_alignment(
-                    text, question_desc, question_requirements
-                ) if question_desc or question_requirements else None
+                "question_alignment": question_alignment
             }
 
             # Calculate band score with improved weighting
             band_score = self._calculate_band_score(analysis, task_type)
 
             # Compile feedback
-            strengths = self._identify_strengths(analysis)
-            improvements = self._identify_improvements(analysis)
+            strengths, improvements = [], []
+            if fields.wants(include, "feedback"):
+                with timed("task_achievement", "feedback"):
+                    strengths = self._identify_strengths(analysis)
+                    improvements = self._identify_improvements(analysis)
             wc = analysis["word_count"]["word_count"]
             min_w, max_w = 200, 300
             wc_frac = min(1.0, max(0.0, (wc - min_w) / (max_w - min_w)))
@@ -158,36 +327,46 @@ class TaskAchievementService:
     
     def _analyze_topic_relevance(self, text: str, task_type: str, 
                                question_desc: str = None, 
-                               question_requirements: str = None) -> Dict[str, Any]:
+                               question_requirements: str = None,
+                               mode: str = "full") -> Dict[str, Any]:
         """Analyze topic adherence using classification and semantic similarity."""
         try:
             # Use task-specific topics based on task type
             candidate_topics = self.task_requirements[task_type]["elements"]
 
-            # Zero-shot classification for task elements
-            classification = self.text_classifier(
-                text, 
-                candidate_labels=candidate_topics,
-                multi_label=True
-            )
+            # Score task elements with the engine for this mode
+            if mode == "fast":
+                with timed("task_achievement", "element_keywords"):
+                    classification = self._keyword_element_scores(text, candidate_topics)
+            elif mode == "standard":
+                with timed("task_achievement", "element_similarity"):
+                    classification = self._embedding_element_scores(text, candidate_topics)
+            else:
+                with timed("task_achievement", "zero_shot"):
+                    classification = self._zero_shot_element_scores(text, candidate_topics)
             
             # Calculate base topic score from task type requirements
             base_topic_score = sum(classification["scores"]) / len(classification["scores"])
             
             # Calculate semantic similarity with question if available
             question_similarity = 0.0
+            window_similarities = None
             if question_desc or question_requirements:
                 question_text = " ".join(filter(None, [question_desc, question_requirements]))
-                # Get embeddings
-                text_embedding = self.semantic_model.encode(text)
-                question_embedding = self.semantic_model.encode(question_text)
-                
-                # Compute cosine similarity
-                from sklearn.metrics.pairwise import cosine_similarity
-                import numpy as np
-                question_similarity = float(cosine_similarity(
-                    [text_embedding], [question_embedding]
-                )[0][0])
+                if mode == "fast":
+                    question_similarity = self._word_overlap(text, question_text)
+                else:
+                    # Every essay window and the question in one batch
+                    texts, spans = self._windows(text, config.ENCODE_WINDOW_WORDS)
+                    with timed("task_achievement", "minilm_encode"):
+                        *window_embeddings, question_embedding = self._encode(*texts, question_text)
+                    similarities = [_cosine(emb, question_embedding) for emb in window_embeddings]
+                    question_similarity = pool_scores(similarities, config.WINDOW_POOLING_SIMILARITY)
+                    if len(spans) > 1:
+                        window_similarities = [
+                            {"start": start, "end": end, "score": score}
+                            for (start, end), score in zip(spans, similarities)
+                        ]
                 
             # Final topic score: weighted combination of base score and question similarity
             final_topic_score = base_topic_score
@@ -195,18 +374,103 @@ class TaskAchievementService:
                 # Give more weight to question similarity when available
                 final_topic_score = (base_topic_score * 0.4) + (question_similarity * 0.6)
 
-            return {
+            result = {
                 "topic_adherence": final_topic_score,
                 "element_scores": dict(zip(classification["labels"], classification["scores"])),
                 "question_similarity": question_similarity if question_desc or question_requirements else None,
                 "is_on_topic": final_topic_score > 0.5
             }
+            # Per-window scores when the essay was longer than one window
+            window_scores = {}
+            if len(classification.get("windows", [])) > 1:
+                window_scores["element_scores"] = classification["windows"]
+            if window_similarities:
+                window_scores["question_similarity"] = window_similarities
+            if window_scores:
+                result["window_scores"] = window_scores
+            return result
 
         except Exception as e:
             logger.error(f"Error in topic relevance analysis: {e}")
             return {"topic_adherence": 0.5, "element_scores": {}, "is_on_topic": True}
 
     
+    def _keyword_element_scores(self, text: str, elements: List[str]) -> Dict[str, List]:
+        """Fast-mode element scores: two cue-word hits count as full coverage"""
+        text_lower = text.lower()
+        scores = [
+            min(1.0, len(self.element_patterns[element].findall(text_lower)) / 2)
+            for element in elements
+        ]
+        return {"labels": list(elements), "scores": scores}
+
+    def _embedding_element_scores(self, text: str, elements: List[str]) -> Dict[str, List]:
+        """Standard-mode element scores: MiniLM similarity to each element's description"""
+        import numpy as np
+
+        missing = [element for element in elements if element not in self._element_embeddings]
+        if missing:
+            with timed("task_achievement", "minilm_encode"):
+                encoded = self.semantic_model.encode([ELEMENT_DESCRIPTIONS[e] for e in missing])
+            self._element_embeddings.update(zip(missing, encoded))
+
+        texts, spans = self._windows(text, config.ENCODE_WINDOW_WORDS)
+        with timed("task_achievement", "minilm_encode"):
+            window_matrix = np.stack(self._encode(*texts))
+        label_matrix = np.stack([self._element_embeddings[element] for element in elements])
+        # windows x elements cosine similarities, stretched onto [0, 1]
+        sims = (window_matrix @ label_matrix.T) / (
+            np.outer(np.linalg.norm(window_matrix, axis=1), np.linalg.norm(label_matrix, axis=1)) + 1e-9
+        )
+        span = SIMILARITY_CEILING - SIMILARITY_FLOOR
+        stretched = np.clip((sims - SIMILARITY_FLOOR) / span, 0.0, 1.0)
+        scores = [
+            float(pool_scores(list(stretched[:, i]), config.WINDOW_POOLING_ELEMENTS)) for i in range(len(elements))
+        ]
+        windows = [
+            {"start": start, "end": end, "scores": dict(zip(elements, map(float, row)))}
+            for (start, end), row in zip(spans, stretched)
+        ]
+        return {"labels": list(elements), "scores": scores, "windows": windows}
+
+    def _content_words(self, text: str) -> set:
+        """Lower-cased content words from the tokenizer alone"""
+        return {
+            token.lower_ for token in self.nlp.make_doc(text)
+            if token.is_alpha and not token.is_stop and len(token) > 3
+        }
+
+    def _word_overlap(self, text: str, question_text: str) -> float:
+        """Share of the question's content words that appear in the text"""
+        question_words = self._content_words(question_text)
+        if not question_words:
+            return 0.0
+        return len(question_words & self._content_words(text)) / len(question_words)
+
+    @timed("task_achievement", "question_alignment")
+    def _analyze_question_overlap(self, text: str, question_desc: str = None,
+                                  question_requirements: str = None) -> Dict[str, Any]:
+        """Fast-mode question alignment from content-word overlap (no parser, no embeddings)."""
+        if not question_desc and not question_requirements:
+            return None
+
+        combined_question = " ".join(filter(None, [question_desc, question_requirements]))
+        key_words = sorted(self._content_words(combined_question))
+        text_words = self._content_words(text)
+        addressed = [word for word in key_words if word in text_words]
+        missing = [word for word in key_words if word not in text_words]
+        coverage = len(addressed) / len(key_words) if key_words else 0.0
+
+        return {
+            "overall_score": 0.5 + 0.5 * coverage if key_words else 0.5,
+            "addressed_elements": addressed,
+            "missing_elements": missing,
+            "total_elements": len(key_words),
+            "addressed_count": len(addressed),
+            "semantic_similarity": coverage
+        }
+
+    @timed("task_achievement", "question_alignment")
     def _analyze_question_alignment(self, text: str, question_desc: str = None, 
                                 question_requirements: str = None) -> Dict[str, Any]:
         """Analyze how well the submission aligns with the specific question."""
@@ -216,15 +480,14 @@ class TaskAchievementService:
         try:
             combined_question = " ".join(filter(None, [question_desc, question_requirements]))
             # Extract key phrases from question
-            question_doc = self.nlp(combined_question)
+            with timed("task_achievement", "question_parse"):
+                question_doc = signals.parse(self.nlp, combined_question)
             key_phrases = [
                 chunk.text for chunk in question_doc.noun_chunks
                 if len(chunk.text.split()) > 1 or not chunk.root.is_stop
             ]
 
-            # Analyze the text
-            text_doc = self.nlp(text)
-            text_lower = text_doc.text.lower()
+            text_lower = text.lower()
             addressed_phrases = []
             missing_phrases = []
 
@@ -234,29 +497,27 @@ class TaskAchievementService:
                 else:
                     missing_phrases.append(phrase)
 
+            # Every embedding this method needs (phrases, essay windows, question), queued as one batch
+            windows, _ = self._windows(text, config.ENCODE_WINDOW_WORDS)
+            with timed("task_achievement", "minilm_encode"):
+                embeddings = self._encode(*key_phrases, *windows, combined_question)
+            phrase_embs = embeddings[:len(key_phrases)]
+            window_embs, ques_emb = embeddings[len(key_phrases):-1], embeddings[-1]
+
             # ─── Smooth semantic alignment ───────────────────────────────
             if not key_phrases:
                 alignment_score = 0.5
             else:
-                from sklearn.metrics.pairwise import cosine_similarity
-                sims = []
-                for phrase in key_phrases:
-                    phrase_emb = self.semantic_model.encode(phrase)
-                    # find best sentence match
-                    best = max(
-                        cosine_similarity([phrase_emb], [sent.vector])[0][0]
-                        for sent in text_doc.sents if sent.text.strip()
-                    )
-                    sims.append(best)
+                # Best-matching essay window per phrase, both in MiniLM space (spaCy's
+                # word vectors have another dimension)
+                sims = [max(_cosine(phrase_emb, window_emb) for window_emb in window_embs) for phrase_emb in phrase_embs]
                 avg_sim = sum(sims) / len(sims)        # in [0.0,1.0]
                 alignment_score = 0.5 + 0.5 * avg_sim   # maps to [0.5,1.0]
 
-            # Compute overall question↔text embedding similarity
-            text_emb = self.semantic_model.encode(text)
-            ques_emb = self.semantic_model.encode(combined_question)
-            text_e2 = text_emb.reshape(1, -1)
-            ques_e2 = ques_emb.reshape(1, -1)
-            question_similarity = float(cosine_similarity(text_e2, ques_e2)[0][0])
+            # Compute overall question↔text embedding similarity, pooled over the essay windows
+            question_similarity = pool_scores(
+                [_cosine(emb, ques_emb) for emb in window_embs], config.WINDOW_POOLING_SIMILARITY
+            )
 
             return {
                 "overall_score": alignment_score,
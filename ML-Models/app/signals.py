@@ -0,0 +1,290 @@
+"""Raw model signals behind a grading result, stored per submission.
+
+While the pipeline grades a submission it activates a SubmissionSignals
+collector for every analyzer stage. The analyzers route their model calls
+through the helpers here (parse, check, encode, classify), which
+
+- record the spaCy docs, LanguageTool matches, MiniLM embeddings and
+  zero-shot outputs so they can be persisted in submission_signals, and
+- serve repeats from what is already recorded, so the essay is parsed once
+  per submission instead of once per analyzer.
+
+A collector rebuilt from a stored row replays those signals, which lets the
+scoring formulas be re-run without any model inference.
+"""
+import contextvars
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence
+
+from .metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+_current: "contextvars.ContextVar[Optional[SubmissionSignals]]" = contextvars.ContextVar("signals", default=None)
+
+
+def _digest(*parts: Any) -> str:
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+class SubmissionSignals:
+    """Model outputs for one submission, shared by its analyzer stages"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs: Dict[str, Future] = {}
+        self._doc_bin: Optional[bytes] = None  # stored docs, decoded on first parse
+        self.matches: Optional[List[Dict[str, Any]]] = None
+        self.embeddings: Dict[str, Any] = {}
+        self.zero_shot: Dict[str, Dict[str, Any]] = {}
+
+    # --- recording / replay ---------------------------------------------
+
+    def parse(self, nlp, text: str):
+        """spaCy doc for text; concurrent stages asking for the same text share one parse"""
+        with self._lock:
+            self._load_docs(nlp)
+            future = self._docs.get(text)
+            owner = future is None
+            if owner:
+                future = self._docs[text] = Future()
+        record_cache("signals_doc", not owner)
+        if owner:
+            try:
+                future.set_result(nlp(text))
+            except BaseException as e:
+                with self._lock:
+                    del self._docs[text]
+                future.set_exception(e)
+        return future.result()
+
+    def check(self, run: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """LanguageTool matches (normalized dicts) for the essay"""
+        if self.matches is None:
+            self.matches = run()
+        return self.matches
+
+    def encode(self, encode: Callable[[Sequence[str]], List[Any]], texts: Sequence[str]) -> List[Any]:
+        """Embeddings for texts, encoding only those not recorded yet"""
+        keys = [_digest(text) for text in texts]
+        missing = list(dict.fromkeys(text for text, key in zip(texts, keys) if key not in self.embeddings))
+        if missing:
+            for text, vector in zip(missing, encode(missing)):
+                self.embeddings[_digest(text)] = vector
+        record_cache("signals_embedding", not missing)
+        return [self.embeddings[key] for key in keys]
+
+    def classify(self, classify: Callable[[str, Hashable], Dict[str, Any]], text: str, group: Hashable) -> Dict[str, Any]:
+        """Zero-shot result for text and its (labels, multi_label) group"""
+        key = _digest(text, group)
+        result = self.zero_shot.get(key)
+        record_cache("signals_zero_shot", result is not None)
+        if result is None:
+            result = self.zero_shot[key] = classify(text, group)
+        return result
+
+    def classify_many(self, classify_many: Callable[[Sequence[str], Hashable], List[Dict[str, Any]]],
+                      texts: Sequence[str], group: Hashable) -> List[Dict[str, Any]]:
+        """Zero-shot results for several texts, classifying only those not recorded yet (in one call)"""
+        keys = [_digest(text, group) for text in texts]
+        missing = list(dict.fromkeys(text for text, key in zip(texts, keys) if key not in self.zero_shot))
+        if missing:
+            for text, result in zip(missing, classify_many(missing, group)):
+                self.zero_shot[_digest(text, group)] = result
+        record_cache("signals_zero_shot", not missing)
+        return [self.zero_shot[key] for key in keys]
+
+    # --- storage ---------------------------------------------------------
+
+    def to_columns(self) -> Dict[str, Any]:
+        """Column values for StoredSignals: DocBin, matches, float16 embeddings"""
+        import numpy as np
+        from spacy.tokens import DocBin
+
+        with self._lock:
+            docs = [f.result() for f in self._docs.values() if f.done() and not f.exception()]
+        keys = list(self.embeddings)
+        vectors = np.vstack([np.asarray(self.embeddings[k], dtype=np.float16) for k in keys]) if keys else None
+        return {
+            "doc_bin": DocBin(docs=docs).to_bytes() if docs else self._doc_bin,
+            "grammar_matches": self.matches,
+            "embedding_keys": keys or None,
+            "embedding_dim": int(vectors.shape[1]) if vectors is not None else None,
+            "embeddings": vectors.tobytes() if vectors is not None else None,
+            "zero_shot": [
+                {"key": key, "labels": list(r["labels"]), "scores": [float(s) for s in r["scores"]]}
+                for key, r in self.zero_shot.items()
+            ] or None,
+        }
+
+    @classmethod
+    def from_row(cls, row) -> "SubmissionSignals":
+        """Collector that replays a stored row (attribute access or mapping)"""
+        import numpy as np
+
+        get = row.get if isinstance(row, dict) else lambda name: getattr(row, name)
+        signals = cls()
+        signals._doc_bin = get("doc_bin")
+        signals.matches = get("grammar_matches")
+        keys, blob = get("embedding_keys"), get("embeddings")
+        if keys and blob:
+            vectors = np.frombuffer(blob, dtype=np.float16).reshape(len(keys), get("embedding_dim"))
+            signals.embeddings = {key: vector.astype(np.float32) for key, vector in zip(keys, vectors)}
+        for entry in get("zero_shot") or []:
+            signals.zero_shot[entry["key"]] = {"labels": entry["labels"], "scores": entry["scores"]}
+        return signals
+
+    def _load_docs(self, nlp) -> None:
+        """Decode stored docs against the analyzer's vocab (restores word vectors too)"""
+        if self._doc_bin is None:
+            return
+        from spacy.tokens import DocBin
+
+        for doc in DocBin().from_bytes(self._doc_bin).get_docs(nlp.vocab):
+            future = Future()
+            future.set_result(doc)
+            self._docs.setdefault(doc.text, future)
+        self._doc_bin = None
+
+
+@contextmanager
+def collecting(signals: Optional[SubmissionSignals]):
+    """Route this thread's model calls through signals (no-op for None)"""
+    token = _current.set(signals)
+    try:
+        yield signals
+    finally:
+        _current.reset(token)
+
+
+def current() -> Optional[SubmissionSignals]:
+    return _current.get()
+
+
+def parse(nlp, text: str):
+    signals = _current.get()
+    return signals.parse(nlp, text) if signals is not None else nlp(text)
+
+
+def check(run: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    signals = _current.get()
+    return signals.check(run) if signals is not None else run()
+
+
+def encode(encode_fn: Callable[[Sequence[str]], List[Any]], texts: Sequence[str]) -> List[Any]:
+    signals = _current.get()
+    return signals.encode(encode_fn, texts) if signals is not None else encode_fn(texts)
+
+
+def classify(classify_fn: Callable[[str, Hashable], Dict[str, Any]], text: str, group: Hashable) -> Dict[str, Any]:
+    signals = _current.get()
+    return signals.classify(classify_fn, text, group) if signals is not None else classify_fn(text, group)
+
+
+def classify_many(classify_many_fn: Callable[[Sequence[str], Hashable], List[Dict[str, Any]]],
+                  texts: Sequence[str], group: Hashable) -> List[Dict[str, Any]]:
+    signals = _current.get()
+    return signals.classify_many(classify_many_fn, texts, group) if signals is not None \
+        else classify_many_fn(texts, group)
+
+
+class SignalStore:
+    """Persists SubmissionSignals rows keyed by submission id"""
+
+    def __init__(self, session_factory, executor=None):
+        self.session_factory = session_factory
+        # Saves run off the request path (FairScheduler, bulk class) when given
+        self.executor = executor
+
+    def save(self, submission_id: int, signals: SubmissionSignals, scorer_version: str = None,
+             grading_mode: str = None) -> None:
+        from .models.stored_signals import StoredSignals
+
+        db = self.session_factory()
+        try:
+            db.merge(StoredSignals(
+                submission_id=submission_id, scorer_version=scorer_version, grading_mode=grading_mode,
+                **signals.to_columns()
+            ))
+            db.commit()
+        except Exception as e:
+            # Signals are an optimization for later re-scoring; never fail grading over them
+            db.rollback()
+            logger.error(f"Failed to store signals for submission {submission_id}: {e}")
+        finally:
+            db.close()
+
+    def save_when_complete(self, submission_id: int, result: Dict[str, Any]) -> None:
+        """Save the result's signals once every analyzer (including late ones) has returned.
+
+        A cached result has no signals of its own; those of the submission it
+        was computed for ('signals_from') are copied instead.
+        """
+        signals = result.get("signals")
+        if signals is None:
+            source = result.get("signals_from")
+            if source is not None and source != submission_id:
+                self._run(self.copy, source, submission_id)
+            return
+        pending = list(result.get("pending", {}).values())
+        save = partial(self._submit, submission_id, signals, result.get("scorer_version"), result.get("grading_mode"))
+        if not pending:
+            save()
+            return
+        remaining = [len(pending)]
+        lock = threading.Lock()
+
+        def on_done(_):
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                save()
+        for future in pending:
+            future.add_done_callback(on_done)
+
+    def _submit(self, submission_id, signals, scorer_version, grading_mode) -> None:
+        self._run(self.save, submission_id, signals, scorer_version, grading_mode)
+
+    def _run(self, fn, *args) -> None:
+        if self.executor is None:
+            fn(*args)
+        else:
+            self.executor.submit(fn, *args, priority_class="bulk")
+
+    def copy(self, source_id: int, submission_id: int) -> bool:
+        """Store source_id's signals row again under submission_id (False when it has none)"""
+        from .models.stored_signals import StoredSignals
+
+        db = self.session_factory()
+        try:
+            row = db.get(StoredSignals, source_id)
+            if row is None:
+                logger.info(f"No stored signals for submission {source_id} to copy to {submission_id}")
+                return False
+            columns = {column.name: getattr(row, column.name) for column in StoredSignals.__table__.columns
+                       if column.name not in ("submission_id", "created_at")}
+            db.merge(StoredSignals(submission_id=submission_id, **columns))
+            db.commit()
+            return True
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to copy signals of submission {source_id} to {submission_id}: {e}")
+            return False
+        finally:
+            db.close()
+
+    def load(self, submission_id: int) -> Optional[SubmissionSignals]:
+        from .models.stored_signals import StoredSignals
+
+        db = self.session_factory()
+        try:
+            row = db.get(StoredSignals, submission_id)
+            return SubmissionSignals.from_row(row) if row is not None else None
+        finally:
+            db.close()
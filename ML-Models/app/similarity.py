@@ -0,0 +1,301 @@
+"""Near-duplicate detection over every stored submission (MinHash + LSH).
+
+Each essay is reduced to the set of its k-word shingles (lowercased words)
+and summarized by a MinHash signature of NUM_PERM values: the share of equal
+values between two signatures estimates the Jaccard similarity of their
+shingle sets. Signatures are cut into BANDS bands; essays that agree on a
+whole band land in the same bucket, so a query only compares against the
+handful of rows sharing a bucket with it instead of every stored essay.
+
+The index lives in one append-only file: a small JSON header (the MinHash
+parameters) followed by fixed-size (submission id, signature) records, one
+per insert. Loading reads the records back and rebuilds the buckets; a file
+written with other parameters is discarded and rebuilt from the database.
+
+    python -m app.similarity build       # (re)index every stored submission
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from . import config
+from .metrics import registry, timed
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MINHASH1"
+_ALIGN = 8
+_PRIME = np.uint64((1 << 31) - 1)
+_WORD = re.compile(r"\w+")
+# Shingles per block when hashing very long essays (bounds the temporary matrix)
+_BLOCK = 4096
+
+INDEXED_SUBMISSIONS = registry.gauge(
+    "ielts_similarity_indexed_submissions",
+    "Submissions in the near-duplicate index",
+)
+
+
+def shingles(text: str, size: int) -> List[str]:
+    """Distinct size-word shingles of text (the whole text when it is shorter)"""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return list({" ".join(words[i:i + size]) for i in range(len(words) - size + 1)})
+
+
+class MinHashIndex:
+    """In-memory LSH buckets over a signature matrix, optionally backed by an append-only file"""
+
+    def __init__(self, num_perm: int = None, bands: int = None, shingle_words: int = None,
+                 path: Optional[str] = None, seed: int = 1):
+        self.num_perm = num_perm or config.SIMILARITY_NUM_PERM
+        self.bands = bands or config.SIMILARITY_BANDS
+        if self.num_perm % self.bands:
+            raise ValueError(f"{self.num_perm} permutations do not split into {self.bands} bands")
+        self.rows = self.num_perm // self.bands
+        self.shingle_words = shingle_words or config.SIMILARITY_SHINGLE_WORDS
+        self.seed = seed
+        self.path = path
+        # h(x) = (a * x + b) mod 2^31 - 1 with a, b, x below the prime: fits uint64, and the
+        # result fits the uint32 signature values
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, int(_PRIME), size=self.num_perm).astype(np.uint64)
+        self._b = rng.randint(0, int(_PRIME), size=self.num_perm).astype(np.uint64)
+        self.record = np.dtype([("id", "<u8"), ("signature", "<u4", (self.num_perm,))])
+
+        self._lock = threading.Lock()
+        self._ids = np.zeros(0, dtype=np.uint64)
+        self._signatures = np.zeros((0, self.num_perm), dtype=np.uint32)
+        self._size = 0
+        self._rows: Dict[int, int] = {}  # submission id -> signature row
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(self.bands)]
+        # Newest stored id sync() has looked at; only sync() moves it, since ids indexed
+        # by check() can run ahead of rows other processes are still committing
+        self.synced_max_id = 0
+        self._synced_at = 0.0
+        if path:
+            self._open()
+
+    @property
+    def header(self) -> Dict[str, Any]:
+        return {"num_perm": self.num_perm, "bands": self.bands, "shingle_words": self.shingle_words, "seed": self.seed}
+
+    def __len__(self) -> int:
+        return self._size
+
+    # --- signatures ------------------------------------------------------
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash signature of text's shingles (None for text without words)"""
+        pieces = shingles(text, self.shingle_words)
+        if not pieces:
+            return None
+        hashes = np.fromiter((zlib.crc32(p.encode("utf-8")) for p in pieces), dtype=np.uint64, count=len(pieces))
+        hashes %= _PRIME
+        signature = np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        for start in range(0, len(hashes), _BLOCK):
+            block = hashes[start:start + _BLOCK, None]
+            np.minimum(signature, ((block * self._a + self._b) % _PRIME).min(axis=0), out=signature)
+        return signature.astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        return [hash(signature[i * self.rows:(i + 1) * self.rows].tobytes()) for i in range(self.bands)]
+
+    # --- updates ---------------------------------------------------------
+
+    def add(self, submission_id: int, text: str) -> Optional[np.ndarray]:
+        """Index one submission (and append it to the file); returns its signature"""
+        signature = self.signature(text)
+        if signature is not None:
+            self.add_many([(submission_id, signature)])
+        return signature
+
+    def add_many(self, entries: Iterable[Tuple[int, np.ndarray]], persist: bool = True) -> int:
+        """Index (submission id, signature) pairs; ids already present are skipped"""
+        entries = [(int(i), s) for i, s in entries]
+        with self._lock:
+            self._reserve(self._size + len(entries))
+            added = []
+            for submission_id, signature in entries:
+                if submission_id in self._rows:
+                    continue
+                added.append((submission_id, signature))
+                row = self._size
+                self._ids[row] = submission_id
+                self._signatures[row] = signature
+                self._rows[submission_id] = row
+                for band, key in enumerate(self._band_keys(signature)):
+                    self._buckets[band].setdefault(key, []).append(row)
+                self._size += 1
+            if not added:
+                return 0
+            if persist and self.path:
+                records = np.zeros(len(added), dtype=self.record)
+                records["id"] = [i for i, _ in added]
+                records["signature"] = [s for _, s in added]
+                # One write per batch: concurrent appenders never interleave inside a record
+                with open(self.path, "ab") as f:
+                    f.write(records.tobytes())
+        INDEXED_SUBMISSIONS.set(self._size)
+        return len(added)
+
+    def _reserve(self, size: int) -> None:
+        if size <= len(self._ids):
+            return
+        capacity = max(size, 2 * len(self._ids), 1024)
+        ids = np.zeros(capacity, dtype=np.uint64)
+        signatures = np.zeros((capacity, self.num_perm), dtype=np.uint32)
+        ids[:self._size] = self._ids[:self._size]
+        signatures[:self._size] = self._signatures[:self._size]
+        self._ids, self._signatures = ids, signatures
+
+    # --- queries ---------------------------------------------------------
+
+    def query(self, text: str = None, signature: np.ndarray = None, top_k: int = None,
+              min_jaccard: float = None, exclude: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Indexed submissions sharing an LSH bucket with text, best Jaccard estimate first"""
+        top_k = config.SIMILARITY_TOP_K if top_k is None else top_k
+        min_jaccard = config.SIMILARITY_MIN_JACCARD if min_jaccard is None else min_jaccard
+        if signature is None:
+            signature = self.signature(text or "")
+        if signature is None:
+            return []
+        with self._lock:
+            candidates = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                candidates.update(self._buckets[band].get(key, ()))
+            if not candidates:
+                return []
+            rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            estimates = (self._signatures[rows] == signature).mean(axis=1)
+            ids = self._ids[rows]
+        order = np.argsort(-estimates, kind="stable")
+        matches = []
+        for i in order:
+            if estimates[i] < min_jaccard or len(matches) >= top_k:
+                break
+            if exclude is not None and int(ids[i]) == exclude:
+                continue
+            matches.append({"submission_id": int(ids[i]), "jaccard": round(float(estimates[i]), 3)})
+        return matches
+
+    def check(self, submission_id: int, text: str, session_factory=None) -> List[Dict[str, Any]]:
+        """Top matches among earlier submissions, then index this one (the request path)"""
+        with timed("similarity", "check"):
+            if session_factory is not None and time.monotonic() - self._synced_at > config.SIMILARITY_SYNC_SECONDS:
+                self.sync(session_factory)
+            signature = self.signature(text)
+            if signature is None:
+                return []
+            matches = self.query(signature=signature, exclude=submission_id)
+            self.add_many([(submission_id, signature)])
+            return matches
+
+    # --- persistence -----------------------------------------------------
+
+    def sync(self, session_factory, batch_size: int = 1000, overlap: int = None) -> int:
+        """Index stored submissions not in the index yet (rows written by other processes).
+
+        Ids are allocated before their rows commit, so the last `overlap` ids
+        below synced_max_id are read again in case a lower one landed late.
+        """
+        from .models.submission import Submission
+
+        overlap = config.SIMILARITY_SYNC_OVERLAP if overlap is None else overlap
+        self._synced_at = time.monotonic()
+        added = 0
+        after = max(0, self.synced_max_id - overlap)
+        db = session_factory()
+        try:
+            while True:
+                ids = [
+                    row.id for row in db.query(Submission.id)
+                    .filter(Submission.id > after)
+                    .order_by(Submission.id)
+                    .limit(batch_size)
+                ]
+                if not ids:
+                    break
+                with self._lock:
+                    missing = [i for i in ids if i not in self._rows]
+                if missing:
+                    rows = db.query(Submission.id, Submission.text).filter(Submission.id.in_(missing)).all()
+                    entries = [(row.id, self.signature(row.text or "")) for row in rows]
+                    added += self.add_many([(i, s) for i, s in entries if s is not None])
+                # Rows without words are skipped but still count as seen
+                after = ids[-1]
+                self.synced_max_id = max(self.synced_max_id, after)
+        finally:
+            db.close()
+        if added:
+            logger.info(f"Indexed {added} submissions for near-duplicate detection")
+        return added
+
+    def _open(self) -> None:
+        """Load the file's records, or start a new file when it is missing or has other parameters"""
+        header_bytes = json.dumps(self.header).encode("utf-8")
+        data_start = -(-(len(MAGIC) + 4 + len(header_bytes)) // _ALIGN) * _ALIGN
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "rb") as f:
+                    if f.read(len(MAGIC)) == MAGIC:
+                        (size,) = struct.unpack("<I", f.read(4))
+                        if json.loads(f.read(size)) == self.header:
+                            self._load(data_start)
+                            return
+                logger.warning(f"{self.path} was built with other MinHash settings; rebuilding it")
+            except (OSError, ValueError) as e:
+                logger.error(f"Unreadable similarity index {self.path}: {e}; rebuilding it")
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+            f.write(b"\0" * (data_start - f.tell()))
+        os.replace(tmp, self.path)
+
+    def _load(self, data_start: int) -> None:
+        count = (os.path.getsize(self.path) - data_start) // self.record.itemsize
+        # A record cut short by a crash is ignored (and overwritten by the next append)
+        records = np.fromfile(self.path, dtype=self.record, count=count, offset=data_start)
+        with open(self.path, "r+b") as f:
+            f.truncate(data_start + count * self.record.itemsize)
+        self.add_many(zip(records["id"], records["signature"]), persist=False)
+
+
+def load(session_factory=None, path: Optional[str] = None) -> Optional[MinHashIndex]:
+    """The configured index, caught up with the database (None when disabled)"""
+    if not config.SIMILARITY_ENABLED:
+        return None
+    index = MinHashIndex(path=path or config.SIMILARITY_INDEX_PATH)
+    if session_factory is not None:
+        index.sync(session_factory)
+    return index
+
+
+def main(argv: Optional[List[str]] = None):
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Near-duplicate index over stored submissions")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("--path", default=config.SIMILARITY_INDEX_PATH)
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.path):
+        os.remove(args.path)
+    start = time.perf_counter()
+    index = MinHashIndex(path=args.path)
+    index.sync(SessionLocal)
+    print(f"Indexed {len(index)} submissions into {args.path} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Tuple
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+COALESCED_REQUESTS = registry.counter(
+    "ielts_singleflight_requests_total",
+    "Computations requested through single-flight, by whether they ran (leader) or waited (follower)",
+    ("flight", "role"),
+)
+INFLIGHT_KEYS = registry.gauge(
+    "ielts_singleflight_inflight_keys",
+    "Distinct keys currently being computed",
+    ("flight",),
+)
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one computation.
+
+    The first caller (leader) runs the function; callers arriving while it
+    runs (followers) block on the same future and get the same result or
+    exception. Nothing is kept once the computation finishes, so this sits
+    in front of a cache rather than replacing it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Return (result, shared); shared is True when another caller did the work"""
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._flights[key] = future
+                INFLIGHT_KEYS.inc(flight=self.name)
+
+        if not leader:
+            COALESCED_REQUESTS.inc(flight=self.name, role="follower")
+            return future.result(), True
+
+        COALESCED_REQUESTS.inc(flight=self.name, role="leader")
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._flights[key]
+            INFLIGHT_KEYS.dec(flight=self.name)
+
+    def inflight(self) -> int:
+        with self._lock:
+            return len(self._flights)
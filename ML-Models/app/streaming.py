@@ -0,0 +1,110 @@
+"""Paragraph-at-a-time spaCy processing for very long texts.
+
+The lexical and coherence analyzers normally parse the whole essay as one
+Doc. In fast mode, above STREAM_THRESHOLD_CHARS, they switch to
+stream_docs(), which cuts the text into paragraph chunks and yields one Doc
+per chunk, so only a chunk's tokens are alive at a time and the metrics are
+built up in accumulators instead.
+
+Chunks are cut in front of paragraph breaks that follow a sentence end, so
+the break opens the next chunk as it opens the next sentence: every token (whitespace
+tokens included) and every sentencizer boundary comes out exactly as it
+would in the full Doc. Paragraphs over the chunk size are cut after a
+sentence end too. In the tokenizer + sentencizer mode each chunk's last
+sentence is carried into the next chunk, so the streamed docs split into
+exactly the full Doc's sentences (unless a single sentence is longer than
+a chunk). With the statistical parser, sentence boundaries and tags can
+still differ from the full Doc right at a cut, so the other modes only
+stream when a caller asks for it explicitly.
+"""
+import re
+from typing import Iterator, Optional
+
+from . import config
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+# A sentence end plus the single space spaCy keeps on its last token; any
+# further whitespace opens the next sentence
+_SENTENCE_END = re.compile(r"[.!?][\"')\]]* ")
+# Paragraphs are only cut off after a sentence end; an unpunctuated line
+# (a heading, say) runs into the next sentence in the full Doc, so it stays
+# in the same chunk
+_CLOSED = re.compile(r"[.!?][\"')\]]* ?$")
+
+
+class TextTooLongError(ValueError):
+    """Input above MAX_TEXT_CHARS"""
+
+
+def enforce_limit(text: str, limit: Optional[int] = None) -> None:
+    limit = limit or config.MAX_TEXT_CHARS
+    if len(text) > limit:
+        raise TextTooLongError(f"Text is {len(text)} characters; the limit is {limit}")
+
+
+def should_stream(text: str, stream: Optional[bool] = None, fast: bool = False) -> bool:
+    """Explicit choice, else stream above STREAM_THRESHOLD_CHARS in fast mode (where it is exact)"""
+    if stream is not None:
+        return stream
+    return fast and len(text) > config.STREAM_THRESHOLD_CHARS
+
+
+def _split_long(piece: str, max_chars: int) -> Iterator[str]:
+    """piece in parts of at most max_chars, cut after a sentence end where possible"""
+    while len(piece) > max_chars:
+        cut = 0
+        for match in _SENTENCE_END.finditer(piece, 0, max_chars):
+            cut = match.end()
+        if not cut:
+            cut = piece.rfind(" ", 0, max_chars) + 1 or max_chars
+        yield piece[:cut]
+        piece = piece[cut:]
+    if piece:
+        yield piece
+
+
+def iter_chunks(text: str, max_chars: Optional[int] = None) -> Iterator[str]:
+    """Paragraph chunks of text; "".join(iter_chunks(text)) == text"""
+    max_chars = max_chars or config.STREAM_CHUNK_CHARS
+    start = 0
+    for match in _PARAGRAPH_BREAK.finditer(text):
+        if match.start() > start and _CLOSED.search(text, max(start, match.start() - 16), match.start()):
+            yield from _split_long(text[start:match.start()], max_chars)
+            start = match.start()
+    yield from _split_long(text[start:], max_chars)
+
+
+def _sentence_aligned(nlp, sentencizer, chunks: Iterator[str], max_chars: int):
+    """Tokenizer + sentencizer docs that hold whole sentences only.
+
+    A chunk's last sentence may continue in the next chunk, so it is carried
+    over and parsed again in front of it; the docs then split into exactly
+    the full Doc's sentences.
+    """
+    carry = ""
+    for chunk in chunks:
+        doc = sentencizer(nlp.make_doc(carry + chunk))
+        last = None
+        for last in doc.sents:
+            pass
+        if last is None or last.start == 0 and len(doc.text) <= max_chars:
+            carry = doc.text
+            continue
+        if last.start == 0:  # one sentence longer than a chunk: cut it anyway
+            yield doc
+            carry = ""
+            continue
+        yield doc[:last.start].as_doc()
+        carry = doc.text[last.start_char:]
+    if carry:
+        yield sentencizer(nlp.make_doc(carry))
+
+
+def stream_docs(nlp, text: str, sentencizer=None, max_chars: Optional[int] = None,
+                batch_size: Optional[int] = None):
+    """One Doc per chunk: tokenizer + sentencizer when given, else the full pipeline via nlp.pipe"""
+    max_chars = max_chars or config.STREAM_CHUNK_CHARS
+    chunks = iter_chunks(text, max_chars)
+    if sentencizer is not None:
+        return _sentence_aligned(nlp, sentencizer, chunks, max_chars)
+    return nlp.pipe(chunks, batch_size=batch_size or config.STREAM_BATCH_SIZE)
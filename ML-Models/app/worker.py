@@ -0,0 +1,205 @@
+"""Grading worker: claims jobs from the grading_jobs table and writes results back.
+
+Run any number of these, on any number of machines pointed at the same
+database:  python -m app.worker [--concurrency N] [--once]
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from . import config
+from .database import SessionLocal, engine, add_missing_columns
+from .job_queue import JobQueue
+from .metrics import registry
+from .models.grading_job import GradingJob
+from .models.submission import Submission
+from .schemas.submission import SubmissionCreate
+from .services.grading_pipeline import GradingPipeline
+
+logger = logging.getLogger(__name__)
+
+WORKER_BUSY = registry.gauge(
+    "ielts_worker_busy_jobs",
+    "Jobs this worker is currently grading",
+)
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class GradingWorker:
+    """Polls the queue, grades up to `concurrency` jobs at a time and keeps their leases alive"""
+
+    def __init__(self, queue: JobQueue, pipeline: GradingPipeline, session_factory,
+                 worker_id: str = None, concurrency: int = None, poll_interval: float = None,
+                 result_cache=None, signal_store=None):
+        self.queue = queue
+        self.pipeline = pipeline
+        self.session_factory = session_factory
+        self.worker_id = worker_id or default_worker_id()
+        self.concurrency = concurrency or config.WORKER_CONCURRENCY
+        self.poll_interval = config.WORKER_POLL_INTERVAL_S if poll_interval is None else poll_interval
+        self.result_cache = result_cache
+        self.signal_store = signal_store
+        self.stop_event = threading.Event()
+        self._draining = threading.Event()
+        self._active: Dict[int, GradingJob] = {}
+        self._active_lock = threading.Lock()
+
+    def run(self, once: bool = False) -> None:
+        """Work until stop() (or, with once=True, until the queue has nothing runnable)"""
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="lease-heartbeat", daemon=True)
+        heartbeat.start()
+        logger.info(f"Worker {self.worker_id} started with concurrency {self.concurrency}")
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job") as pool:
+            while not self.stop_event.is_set():
+                with self._active_lock:
+                    free = self.concurrency - len(self._active)
+                jobs = self.queue.claim(self.worker_id, limit=free) if free > 0 else []
+                for job in jobs:
+                    with self._active_lock:
+                        self._active[job.id] = job
+                    pool.submit(self._run_job, job)
+                if once and not jobs:
+                    with self._active_lock:
+                        idle = not self._active
+                    if idle:
+                        break
+                if not jobs:
+                    self.stop_event.wait(self.poll_interval)
+        # Leaving the executor block waited for in-flight jobs; leases no longer need renewing
+        self.stop_event.set()
+        self._draining.set()
+        logger.info(f"Worker {self.worker_id} stopped")
+
+    def stop(self, *_) -> None:
+        """Stop claiming; jobs already running are finished first"""
+        self.stop_event.set()
+
+    def _heartbeat_loop(self) -> None:
+        interval = max(0.05, self.queue.lease_seconds / 3)
+        # Keeps running after stop() until in-flight jobs are done
+        while not self._draining.wait(interval):
+            with self._active_lock:
+                job_ids = list(self._active)
+            for job_id in job_ids:
+                try:
+                    if not self.queue.heartbeat(job_id, self.worker_id):
+                        logger.warning(f"Lost the lease on grading job {job_id}")
+                except Exception as e:
+                    logger.error(f"Lease heartbeat failed for job {job_id}: {e}")
+
+    def _run_job(self, job: GradingJob) -> None:
+        try:
+            with WORKER_BUSY.track_inprogress():
+                self.process(job)
+        except Exception as e:
+            logger.error(f"Grading job {job.id} failed (attempt {job.attempts}): {e}", exc_info=True)
+            try:
+                self.queue.fail(job.id, self.worker_id, f"{type(e).__name__}: {e}")
+            except Exception as release_error:
+                # The lease will expire and the job will be retried anyway
+                logger.error(f"Could not release job {job.id}: {release_error}")
+        finally:
+            with self._active_lock:
+                self._active.pop(job.id, None)
+
+    def process(self, job: GradingJob) -> bool:
+        """Grade one job's submission; results and job completion commit together"""
+        db = self.session_factory()
+        try:
+            row = db.query(Submission).filter(Submission.id == job.submission_id).first()
+            if row is None:
+                raise LookupError(f"Submission {job.submission_id} no longer exists")
+            submission = SubmissionCreate(
+                text=row.text,
+                task_type=row.task_type,
+                question_number=row.question_number,
+                question_desc=row.question_desc,
+                question_requirements=row.question_requirements,
+                locale=row.locale or config.GRAMMAR_DEFAULT_LOCALE,
+                mode=job.mode or "full",
+            )
+        finally:
+            db.close()
+
+        result, key = self._grade(submission, job)
+
+        db = self.session_factory()
+        try:
+            if not self.queue.complete(job.id, self.worker_id, db=db):
+                # Another worker owns the job now; its result will be written instead
+                db.rollback()
+                logger.warning(f"Discarding result for job {job.id}: lease lost")
+                return False
+            row = db.query(Submission).filter(Submission.id == job.submission_id).first()
+            GradingPipeline.apply(row, result)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        if result['pending']:
+            self.pipeline.finish_in_background(job.submission_id, result['pending'], self.session_factory)
+        if self.signal_store is not None:
+            self.signal_store.save_when_complete(job.submission_id, result)
+            if key:
+                self.result_cache.link(key, job.submission_id, result)
+        return True
+
+    def _grade(self, submission: SubmissionCreate, job: GradingJob) -> Tuple[Dict, Optional[str]]:
+        """The result and its cache key (None without a result cache)"""
+        mode = submission.mode
+        key = self.result_cache.key_for(submission, mode) if self.result_cache is not None else None
+        cached = self.result_cache.get(key) if key else None
+        if cached is not None:
+            return {**cached, 'pending': {}}, key
+        result = self.pipeline.grade(
+            submission, mode=mode, priority_class=job.priority_class or "bulk", tenant=job.tenant
+        )
+        if key:
+            self.result_cache.put(key, result)
+        return result, key
+
+
+def build_worker(worker_id: Optional[str] = None, concurrency: Optional[int] = None) -> GradingWorker:
+    """Load the analyzers and wire a worker to the application database"""
+    from .result_cache import ResultCache
+    from .signals import SignalStore
+    from .services.grading_pipeline import SCORER_VERSION
+    from . import models
+
+    models.Base.metadata.create_all(bind=engine)
+    add_missing_columns(engine)
+    return GradingWorker(
+        JobQueue(SessionLocal), GradingPipeline.load(), SessionLocal,
+        worker_id=worker_id, concurrency=concurrency,
+        result_cache=ResultCache(SessionLocal, SCORER_VERSION, config.RESULT_CACHE_SIZE),
+        signal_store=SignalStore(SessionLocal) if config.STORE_SIGNALS else None,
+    )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Grade queued submissions")
+    parser.add_argument("--worker-id", default=None, help="defaults to hostname-pid")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--once", action="store_true", help="exit when nothing is runnable")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    worker = build_worker(args.worker_id, args.concurrency)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run(once=args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import pytest
 import sys
 import os
+from unittest.mock import MagicMock, patch
 
 # Add the app directory to the path so we can import modules from it
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -15,4 +16,17 @@ def sample_texts():
         'empty': "",
         'short': "Short text.",
         'repeated_words': "The cat and the dog are animals. The cat is small. The cat is fast."
-    }
\ No newline at end of file
+    }
+
+
+@pytest.fixture(scope="session")
+def make_grammar_service():
+    """Build GrammarService through __init__ with LanguageTool and the spelling index stubbed out"""
+    from app.services.grammar_service import GrammarService
+
+    def make(tool_factory=MagicMock, spelling_index=None, rule_profile=None):
+        with patch("app.services.grammar_service.language_tool_python.LanguageTool",
+                   side_effect=lambda locale: tool_factory()), \
+                patch("app.services.grammar_service.SpellingIndex.load", return_value=spelling_index):
+            return GrammarService(rule_profile)
+    return make
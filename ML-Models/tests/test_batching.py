@@ -0,0 +1,78 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+from app.batching import MicroBatcher
+
+
+class RecordingModel:
+    """Batch function that records each batch and doubles its inputs"""
+
+    def __init__(self, delay=0.0):
+        self.batches = []
+        self.delay = delay
+        self.threads = set()
+
+    def __call__(self, items, group):
+        self.batches.append((group, list(items)))
+        self.threads.add(threading.current_thread().name)
+        time.sleep(self.delay)
+        return [item * 2 for item in items]
+
+
+def test_concurrent_callers_share_a_batch():
+    model = RecordingModel(delay=0.05)
+    batcher = MicroBatcher("test_share", model, max_batch_size=64, max_wait_ms=200)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(batcher, range(16)))
+
+    assert results == [i * 2 for i in range(16)]
+    # Far fewer model calls than callers, all on the batcher thread
+    assert len(model.batches) < 16
+    assert model.threads == {"batcher-test_share"}
+
+
+def test_lone_caller_skips_the_wait():
+    model = RecordingModel()
+    batcher = MicroBatcher("test_lone", model, max_wait_ms=500)
+
+    start = time.perf_counter()
+    assert batcher.map([1, 2, 3]) == [2, 4, 6]
+    assert time.perf_counter() - start < 0.25
+    # One caller's items always travel together
+    assert model.batches == [(None, [1, 2, 3])]
+
+
+def test_groups_are_never_mixed():
+    model = RecordingModel(delay=0.02)
+    batcher = MicroBatcher("test_groups", model, max_wait_ms=100)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futures = [pool.submit(batcher, i, "labels-a" if i % 2 else "labels-b") for i in range(8)]
+        assert [f.result() for f in futures] == [i * 2 for i in range(8)]
+
+    for group, items in model.batches:
+        assert all((item % 2 == 1) == (group == "labels-a") for item in items)
+
+
+def test_batch_errors_reach_every_caller():
+    def broken(items, group):
+        raise ValueError("model exploded")
+
+    batcher = MicroBatcher("test_errors", broken, max_wait_ms=50)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(batcher, i) for i in range(4)]
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result()
+
+
+def test_zero_wait_runs_inline():
+    model = RecordingModel()
+    batcher = MicroBatcher("test_inline", model, max_wait_ms=0)
+
+    assert batcher(21) == 42
+    assert model.threads == {threading.current_thread().name}
+    assert batcher._worker is None
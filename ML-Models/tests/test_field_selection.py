@@ -0,0 +1,97 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+import spacy
+from pydantic import ValidationError
+
+from app.evaluatiuon.field_selection_benchmark import benchmark_include
+from app.models.submission import Submission
+from app.result_cache import cache_key
+from app.schemas.submission import SubmissionCreate, SubmissionResponse
+from app.services.CoherenceCohensionService import CoherenceCohesionService
+from app.services.grading_pipeline import GradingPipeline
+from app.services.lexical_service import LexicalService
+from app.services.taskachievement_service import TaskAchievementService
+
+TEXT = """Some people believe that cities should invest in public transport. However, others argue that roads matter more.
+
+Firstly, buses reduce traffic because they carry many passengers. For example, London has cut congestion. it is good.
+
+In conclusion, i think public transport is the better investment because it helps everyone."""
+
+
+@pytest.fixture(scope="module")
+def pipeline(make_grammar_service):
+    nlp = spacy.blank("en")
+    with patch("app.services.lexical_service.load_spacy", return_value=nlp), \
+            patch("app.services.CoherenceCohensionService.load_spacy", return_value=nlp), \
+            patch("app.services.taskachievement_service.load_spacy", return_value=nlp), \
+            patch("app.services.taskachievement_service.load_encoder", return_value=MagicMock()), \
+            patch("app.services.taskachievement_service.load_zero_shot", return_value=MagicMock()), \
+            patch("nltk.download"):
+        lexical, coherence, task = LexicalService(), CoherenceCohesionService(), TaskAchievementService()
+    return GradingPipeline(make_grammar_service(), lexical, coherence, task, max_workers=2, reserved_workers={})
+
+
+def submission(include=None):
+    return SubmissionCreate(text=TEXT, task_type="argument", question_number=1, mode="fast", include=include)
+
+
+def test_score_only_keeps_every_band_and_skips_the_feedback(pipeline):
+    full = pipeline.grade(submission())
+    with patch.object(TaskAchievementService, "_generate_specific_suggestions") as suggestions, \
+            patch.object(TaskAchievementService, "_generate_detailed_analysis") as detailed, \
+            patch.object(CoherenceCohesionService, "_paragraph_detail") as paragraphs:
+        scores = pipeline.grade(submission(include=[]))
+
+    assert (scores['ielts_score'], scores['grade']) == (full['ielts_score'], full['grade'])
+    for key in ('grammar_analysis', 'lexical_analysis', 'coherence_analysis'):
+        assert scores[key]['overall_score'] == full[key]['overall_score']
+    assert scores['task_analysis']['ielts_score'] == full['task_analysis']['ielts_score']
+    suggestions.assert_not_called()
+    detailed.assert_not_called()
+    paragraphs.assert_not_called()
+
+    assert scores['grammar_analysis']['sentence_analysis'] == []
+    assert scores['grammar_analysis']['error_details'] == []
+    assert scores['grammar_analysis']['error_categories'] == full['grammar_analysis']['error_categories']
+    assert scores['lexical_analysis']['detailed_analysis'] == {}
+    assert scores['lexical_analysis']['feedback']['detailed_suggestions'] == {}
+    assert scores['coherence_analysis']['feedback'] == {'strengths': [], 'improvements': [], 'detailed_suggestions': {}}
+    assert scores['task_analysis']['task_achievement_feedback']['strengths'] == []
+    assert full['grammar_analysis']['sentence_analysis'] and full['coherence_analysis']['detailed_analysis']
+
+
+def test_sections_are_selected_independently(pipeline):
+    full = pipeline.grade(submission())
+    result = pipeline.grade(submission(include=["sentences", "feedback"]))
+
+    assert result['grammar_analysis']['sentence_analysis'] == full['grammar_analysis']['sentence_analysis']
+    assert result['grammar_analysis']['feedback'] == full['grammar_analysis']['feedback']
+    assert result['lexical_analysis']['feedback']['strengths'] == full['lexical_analysis']['feedback']['strengths']
+    assert result['task_analysis']['task_achievement_feedback']['specific_suggestions'] == {}
+    assert full['task_analysis']['task_achievement_feedback']['specific_suggestions']
+
+
+def test_include_is_validated_and_part_of_the_cache_key():
+    with pytest.raises(ValidationError):
+        submission(include=["everything"])
+    assert cache_key(submission(), "fast", "v1") != cache_key(submission(include=[]), "fast", "v1")
+    assert cache_key(submission(include=["details", "feedback"]), "fast", "v1") == \
+        cache_key(submission(include=["feedback", "details"]), "fast", "v1")
+
+
+def test_score_only_response_still_validates(pipeline):
+    result = pipeline.grade(submission(include=[]))
+    row = Submission(id=1, text=TEXT, task_type="argument", question_number=1)
+    GradingPipeline.apply(row, result)
+    SubmissionResponse.model_validate(GradingPipeline.response_payload(row, result))
+
+
+def test_benchmark_reports_savings_per_analyzer(pipeline):
+    item = {'text': TEXT, 'task_type': "argument", 'question_number': 1, 'question_desc': None}
+    results = benchmark_include(pipeline, [item, item], mode="fast")
+
+    assert set(results) == {'grammar', 'lexical', 'task_achievement', 'coherence', 'total'}
+    assert all(results[name]['same_band'] == 1.0 for name in ('grammar', 'lexical', 'coherence'))
+    assert results['total']['mean_bytes'] < results['total']['full_mean_bytes']
@@ -0,0 +1,248 @@
+import threading
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+import spacy
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.submission import Submission
+
+from app.services.grading_pipeline import GradingPipeline, GRADING_MODES, MODE_ENGINES
+from app.schemas.submission import SubmissionCreate
+
+SAMPLE_TEXT = """Some people believe that cities should invest in public transport. However, others argue that roads matter more.
+
+Firstly, buses reduce traffic because they carry many passengers. For example, London has cut congestion.
+
+In conclusion, i think public transport is the better investment."""
+
+
+@pytest.fixture
+def fake_services():
+    """Analyzer doubles returning the minimal fields the pipeline reads"""
+    grammar = MagicMock()
+    grammar.analyze_grammar.return_value = {
+        "score": 7.0, "feedback": "Good",
+        "errors": [{"context": "could of gone", "message": "Use 'have'", "category": "GRAMMAR", "sentence_id": 0}],
+        "sentences": [{"sentence_id": 0, "start": 0, "end": 66, "error_count": 1, "error_density": 0.1, "score": 0.5}]
+    }
+    lexical = MagicMock()
+    lexical.analyze_lexical.return_value = {"overall_score": 6.0, "feedback": {}}
+    coherence = MagicMock()
+    coherence.analyze_coherence_cohesion.return_value = {"overall_score": 6.5, "feedback": {}}
+    task = MagicMock()
+    task.analyze_submission.return_value = {
+        "ielts_score": 6.5, "task_achievement_feedback": {}, "task_achievement_analysis": {}
+    }
+    return grammar, lexical, coherence, task
+
+
+def make_submission(mode="full"):
+    return SubmissionCreate(text=SAMPLE_TEXT, task_type="argument", question_number=1, mode=mode)
+
+
+def test_pipeline_passes_mode_to_every_analyzer(fake_services):
+    grammar, lexical, coherence, task = fake_services
+    pipeline = GradingPipeline(grammar, lexical, coherence, task)
+
+    result = pipeline.grade(make_submission("fast"))
+
+    assert result['grading_mode'] == "fast"
+    sentence = result['grammar_analysis']['sentence_analysis'][0]
+    assert sentence['sentence'] == "Some people believe that cities should invest in public transport."
+    assert (sentence['error_count'], sentence['score']) == (1, 0.5)
+    assert grammar.analyze_grammar.call_args.kwargs['mode'] == "fast"
+    assert grammar.analyze_grammar.call_args.kwargs['locale'] == "en-GB"
+    assert lexical.analyze_lexical.call_args.kwargs['mode'] == "fast"
+    assert coherence.analyze_coherence_cohesion.call_args.kwargs['mode'] == "fast"
+    assert task.analyze_submission.call_args.kwargs['mode'] == "fast"
+    # (7 + 6 + 6.5 + 6.5) / 4 = 6.5
+    assert result['ielts_score'] == 6.5
+    assert result['grade'] == pytest.approx(68.75)
+
+
+def test_pipeline_rejects_unknown_mode(fake_services):
+    pipeline = GradingPipeline(*fake_services)
+    with pytest.raises(ValueError):
+        pipeline.grade(make_submission(), mode="turbo")
+
+
+def test_combine_scores_rounds_and_clamps():
+    scores = {'grammar': 6.0, 'lexical': 6.0, 'task_achievement': 6.0, 'coherence': 6.4}
+    assert GradingPipeline.combine_scores(scores) == (6.0, 62.5)
+    assert GradingPipeline.combine_scores(dict.fromkeys(scores, 0.0))[0] == 1.0
+
+
+def test_combine_scores_renormalizes_over_available_components():
+    assert GradingPipeline.combine_scores({'grammar': 8.0, 'lexical': 6.0})[0] == 7.0
+    assert GradingPipeline.combine_scores({'grammar': 8.0, 'coherence': None})[0] == 8.0
+    assert GradingPipeline.combine_scores({}) == (None, None)
+
+
+@pytest.fixture
+def session_factory():
+    """In-memory database shared across threads"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def test_budget_returns_partial_result_and_finishes_in_background(fake_services, session_factory):
+    """A stalled analyzer is flagged missing, then written to the row when it returns"""
+    grammar, lexical, coherence, task = fake_services
+    release = threading.Event()
+    stalled_result = dict(task.analyze_submission.return_value, ielts_score=8.5)
+
+    def stalled(submission, mode):
+        release.wait(5)
+        return stalled_result
+    task.analyze_submission.side_effect = stalled
+
+    pipeline = GradingPipeline(grammar, lexical, coherence, task)
+    result = pipeline.grade(make_submission(), budget_ms=100)
+
+    assert result['missing_components'] == ['task_achievement']
+    assert result['task_analysis'] is None
+    # Overall band from grammar 7, lexical 6, coherence 6.5 only
+    assert result['ielts_score'] == 6.5
+
+    db = session_factory()
+    row = Submission(text=SAMPLE_TEXT, task_type="argument", question_number=1)
+    GradingPipeline.apply(row, result)
+    db.add(row)
+    db.commit()
+    assert row.grading_status == "partial"
+
+    pipeline.finish_in_background(row.id, result['pending'], session_factory)
+    release.set()
+    result['pending']['task_achievement'].result(timeout=5)
+    pipeline.executor.shutdown(wait=True)
+
+    db.expire_all()
+    row = db.query(Submission).filter(Submission.id == row.id).first()
+    assert row.grading_status == "complete"
+    assert row.missing_components == []
+    assert row.task_achievement_score == 8.5
+    # (7 + 6 + 8.5 + 6.5) / 4 = 7.0
+    assert row.ielts_score == 7.0
+    db.close()
+
+
+def test_stage_timeout_applies_without_budget(fake_services):
+    grammar, lexical, coherence, task = fake_services
+    release = threading.Event()
+    grammar.analyze_grammar.side_effect = lambda text, mode, locale=None, include=None: release.wait(5) and {}
+
+    pipeline = GradingPipeline(grammar, lexical, coherence, task, stage_timeouts_ms={'grammar': 50})
+    result = pipeline.grade(make_submission())
+    release.set()
+
+    assert result['missing_components'] == ['grammar']
+    assert result['grammar_analysis'] is None
+
+
+def test_grade_stream_yields_components_as_they_finish(fake_services):
+    grammar, lexical, coherence, task = fake_services
+    release_task, release_grammar = threading.Event(), threading.Event()
+    task_result = task.analyze_submission.return_value
+    task.analyze_submission.side_effect = lambda submission, mode: release_task.wait(5) and task_result
+    grammar.analyze_grammar.side_effect = lambda text, mode, locale=None, include=None: release_grammar.wait(5) and {}
+
+    pipeline = GradingPipeline(grammar, lexical, coherence, task, stage_timeouts_ms={'grammar': 100})
+    events = pipeline.grade_stream(make_submission())
+    first = [next(events), next(events)]
+    release_task.set()
+    rest = list(events)
+    release_grammar.set()
+
+    assert sorted(name for _, name, _ in first) == ['coherence', 'lexical']
+    assert [(kind, name) for kind, name, _ in rest] == [('component', 'task_achievement'), ('result', None)]
+    result = rest[-1][2]
+    assert result['missing_components'] == ['grammar']
+    assert result['task_analysis'] == task_result
+    # Overall band from lexical 6, coherence 6.5 and task achievement 6.5
+    assert result['ielts_score'] == 6.5
+
+
+def test_grade_stream_applies_the_overall_budget(fake_services):
+    grammar, lexical, coherence, task = fake_services
+    release = threading.Event()
+    coherence.analyze_coherence_cohesion.side_effect = lambda text, mode, include=None: release.wait(5) and {}
+    task.analyze_submission.side_effect = lambda submission, mode: release.wait(5) and {}
+
+    pipeline = GradingPipeline(grammar, lexical, coherence, task, stage_timeouts_ms={})
+    start = time.monotonic()
+    events = list(pipeline.grade_stream(make_submission(), budget_ms=100))
+    elapsed = time.monotonic() - start
+    release.set()
+
+    assert elapsed < 2
+    assert sorted(name for kind, name, _ in events if kind == "component") == ['grammar', 'lexical']
+    kind, _, result = events[-1]
+    assert kind == "result"
+    assert result['missing_components'] == ['task_achievement', 'coherence']
+    assert set(result['pending']) == {'task_achievement', 'coherence'}
+
+
+def test_every_mode_documents_its_engines():
+    assert set(MODE_ENGINES) == set(GRADING_MODES)
+    for engines in MODE_ENGINES.values():
+        assert set(engines) == {'grammar', 'lexical', 'coherence', 'task_achievement'}
+
+
+def test_grammar_heuristics_flag_common_errors(make_grammar_service):
+    """Fast grammar rules run without LanguageTool and report exact spans"""
+    service = make_grammar_service()
+    text = "He could of gone. i think it was a apple. this is alot of work ,really."
+
+    matches = service._heuristic_check(text)
+    found = {m["rule_id"]: text[m["offset"]:m["offset"] + m["length"]] for m in matches}
+
+    assert found["FAST_MODAL_OF"] == "could of"
+    assert found["FAST_LOWERCASE_I"] == "i"
+    assert found["FAST_A_AN"] == "a apple"
+    assert found["FAST_ALOT"] == "alot"
+    assert found["FAST_SENTENCE_START"] == "this"
+    assert "FAST_SPACE_BEFORE_PUNCT" in found
+    assert [m["offset"] for m in matches] == sorted(m["offset"] for m in matches)
+
+
+def test_grammar_errors_map_to_their_sentences(make_grammar_service):
+    """Every error is returned with its sentence id; sentence scores reflect error density"""
+    service = make_grammar_service()
+    text = "The first sentence is fine. He could of gone. i think it was a apple.\n\nAll good here"
+
+    result = service.score_matches(text, service._heuristic_check(text))
+    sentences = result["sentences"]
+
+    assert [text[s["start"]:s["end"]] for s in sentences] == [
+        "The first sentence is fine.", "He could of gone.", "i think it was a apple.", "All good here"
+    ]
+    assert {e["rule_id"]: e["sentence_id"] for e in result["errors"]} == {
+        "FAST_MODAL_OF": 1, "FAST_LOWERCASE_I": 2, "FAST_SENTENCE_START": 2, "FAST_A_AN": 2
+    }
+    assert len(result["errors"]) == result["raw_error_count"]
+    assert sentences[0]["score"] == sentences[3]["score"] == 1.0
+    assert sentences[2]["error_density"] > sentences[1]["error_density"] > 0
+    # Contexts stay inside the sentence
+    assert all(e["context"] in text[sentences[e["sentence_id"]]["start"]:sentences[e["sentence_id"]]["end"]]
+               for e in result["errors"])
+
+
+def test_coherence_fast_mode_needs_only_a_tokenizer():
+    """The phrase index finds linking devices once per sentence without a parser"""
+    from app.services.CoherenceCohensionService import CoherenceCohesionService
+
+    with patch('spacy.load', return_value=spacy.blank("en")):
+        service = CoherenceCohesionService()
+
+    result = service.analyze_coherence_cohesion(SAMPLE_TEXT, mode="fast")
+    devices = result['detailed_analysis']['linking_device_usage']['device_distribution']
+
+    assert devices['contrast'] >= 1       # "However"
+    assert devices['conclusion'] >= 1     # "In conclusion"
+    assert devices['example'] >= 1        # "For example"
+    assert 1 <= result['overall_score'] <= 9
@@ -0,0 +1,132 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.submission import Submission
+from app.models.grading_job import GradingJob
+from app.job_queue import JobQueue
+from app.worker import GradingWorker
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """File-backed database so each session gets its own connection, as separate workers would"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def enqueue(queue, session_factory, text="An essay.", **kwargs):
+    db = session_factory()
+    try:
+        row = Submission(text=text, task_type="argument", question_number=1, grading_status="queued")
+        db.add(row)
+        db.flush()
+        job = queue.enqueue(db, row.id, **kwargs)
+        return job.id, job.submission_id
+    finally:
+        db.close()
+
+
+def test_idempotency_key_returns_the_original_job(session_factory):
+    queue = JobQueue(session_factory)
+    first = enqueue(queue, session_factory, idempotency_key="req-1")
+    retry = enqueue(queue, session_factory, idempotency_key="req-1")
+
+    assert retry == first
+    db = session_factory()
+    assert db.query(Submission).count() == 1
+    assert db.query(GradingJob).count() == 1
+    db.close()
+
+
+def test_each_job_is_claimed_by_exactly_one_worker(session_factory):
+    queue = JobQueue(session_factory)
+    for i in range(20):
+        enqueue(queue, session_factory, text=f"essay {i}")
+
+    def drain(worker_id):
+        claimed = []
+        while True:
+            jobs = queue.claim(worker_id, limit=2)
+            if not jobs:
+                return claimed
+            claimed.extend(job.id for job in jobs)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(drain, [f"worker-{i}" for i in range(4)]))
+
+    all_claimed = [job_id for claimed in results for job_id in claimed]
+    assert sorted(all_claimed) == list(range(1, 21))
+
+
+def test_higher_priority_is_claimed_first(session_factory):
+    queue = JobQueue(session_factory)
+    low, _ = enqueue(queue, session_factory, priority=0)
+    high, _ = enqueue(queue, session_factory, priority=10)
+
+    assert [job.id for job in queue.claim("w", limit=2)] == [high, low]
+
+
+def test_expired_lease_is_recovered_by_another_worker(session_factory):
+    queue = JobQueue(session_factory, lease_seconds=0.5)
+    job_id, _ = enqueue(queue, session_factory)
+
+    assert [job.id for job in queue.claim("crashed")] == [job_id]
+    assert queue.claim("survivor") == []
+    time.sleep(0.6)
+
+    reclaimed = queue.claim("survivor")
+    assert [job.id for job in reclaimed] == [job_id]
+    assert reclaimed[0].attempts == 2
+    # The original holder can no longer renew or complete it
+    assert not queue.heartbeat(job_id, "crashed")
+    assert not queue.complete(job_id, "crashed")
+    assert queue.complete(job_id, "survivor")
+
+
+def test_failures_back_off_then_fail_the_submission(session_factory):
+    queue = JobQueue(session_factory, max_attempts=2, retry_delay_seconds=0.05)
+    job_id, submission_id = enqueue(queue, session_factory)
+
+    queue.claim("w")
+    assert queue.fail(job_id, "w", "boom") == "queued"
+    assert queue.claim("w") == []  # still backing off
+    time.sleep(0.1)
+    queue.claim("w")
+    assert queue.fail(job_id, "w", "boom again") == "failed"
+
+    job = queue.get(job_id)
+    assert (job.status, job.last_error) == ("failed", "boom again")
+    db = session_factory()
+    assert db.get(Submission, submission_id).grading_status == "failed"
+    db.close()
+    assert queue.stats()["failed"] == 1
+
+
+def test_worker_grades_and_writes_back(session_factory):
+    pipeline = MagicMock()
+    pipeline.grade.return_value = {
+        'grading_mode': "fast", 'ielts_score': 6.5, 'grade': 68.75,
+        'grammar_analysis': {"overall_score": 7.0, "raw_score": 0.1, "feedback": "Good"},
+        'lexical_analysis': {"overall_score": 6.0, "feedback": {}},
+        'task_analysis': {"ielts_score": 6.5, "task_achievement_feedback": {}, "task_achievement_analysis": {}},
+        'coherence_analysis': {"overall_score": 6.5, "feedback": {}},
+        'missing_components': [], 'pending': {},
+    }
+    queue = JobQueue(session_factory)
+    job_id, submission_id = enqueue(queue, session_factory, mode="fast")
+
+    worker = GradingWorker(queue, pipeline, session_factory, worker_id="w1", concurrency=2, poll_interval=0.01)
+    worker.run(once=True)
+
+    assert pipeline.grade.call_args.kwargs['mode'] == "fast"
+    assert queue.get(job_id).status == "done"
+    db = session_factory()
+    row = db.get(Submission, submission_id)
+    assert (row.ielts_score, row.grading_status, row.lexical_score) == (6.5, "complete", 6.0)
+    db.close()
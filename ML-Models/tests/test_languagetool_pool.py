@@ -0,0 +1,114 @@
+import threading
+
+from app.services.languagetool_pool import LanguageToolPool
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeTool:
+    def __init__(self, locale):
+        self.locale = locale
+        self.closed = False
+
+    def check(self, text):
+        return [f"{self.locale}:{text}"]
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(clock, **kwargs):
+    started = []
+
+    def factory(locale):
+        started.append(locale)
+        return FakeTool(locale)
+    options = dict(default_locale="en-GB", idle_seconds=60, warm_share=0.2, window_seconds=600, max_instances=3)
+    options.update(kwargs)
+    return LanguageToolPool(factory, clock=clock, **options), started
+
+
+def test_backends_start_lazily_per_locale():
+    pool, started = make_pool(FakeClock())
+    assert started == []
+    assert pool.check("en-US", "color") == ["en-US:color"]
+    assert pool.check(None, "colour") == ["en-GB:colour"]
+    pool.check("en-US", "center")
+    assert started == ["en-US", "en-GB"]
+
+
+def test_concurrent_first_checks_start_one_backend():
+    pool, started = make_pool(FakeClock())
+    threads = [threading.Thread(target=pool.check, args=("en-US", "text")) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert started == ["en-US"]
+
+
+def test_idle_low_traffic_locales_are_evicted_but_busy_ones_stay_warm():
+    clock = FakeClock()
+    pool, _ = make_pool(clock)
+    for _ in range(7):
+        pool.check("en-GB", "text")
+    for _ in range(2):
+        pool.check("en-US", "text")
+    pool.check("en-AU", "text")
+    au = pool.get("en-AU")
+
+    clock.now += 120
+    # en-US has 20% of the traffic, en-AU 10%: only en-AU goes
+    assert pool.sweep() == ["en-AU"]
+    assert au.closed
+    assert {tool.locale for tool in pool.loaded()} == {"en-GB", "en-US"}
+
+    # Once the window has passed nobody is warm, but the default locale is never evicted
+    clock.now += 1000
+    assert pool.sweep() == ["en-US"]
+    assert [tool.locale for tool in pool.loaded()] == ["en-GB"]
+
+
+def test_capacity_evicts_the_least_used_idle_backend():
+    clock = FakeClock()
+    pool, _ = make_pool(clock, max_instances=3)
+    pool.check("en-GB", "text")
+    pool.check("en-US", "text")
+    pool.check("en-US", "text")
+    pool.check("en-AU", "text")
+    au = pool.get("en-AU")
+    pool.check("en-NZ", "text")
+    # The default locale and the backend just started are never candidates;
+    # en-AU has less traffic than en-US
+    assert {tool.locale for tool in pool.loaded()} == {"en-GB", "en-US", "en-NZ"}
+    assert au.closed
+
+
+def test_a_new_backend_is_not_evicted_to_make_room_for_itself():
+    pool, _ = make_pool(FakeClock(), max_instances=1)
+    pool.check("en-NZ", "text")
+    pool.check("en-NZ", "text")
+    nz = pool.get("en-NZ")
+    # en-AU has the least traffic, but it is the backend being started
+    assert pool.check("en-AU", "text") == ["en-AU:text"]
+    assert nz.closed and not pool.get("en-AU").closed
+
+
+def test_stats_report_share_memory_and_latency():
+    pool, _ = make_pool(FakeClock())
+    for _ in range(3):
+        pool.check("en-GB", "text")
+    pool.check("en-US", "text")
+
+    stats = pool.stats()["locales"]
+    assert stats["en-GB"]["traffic_share"] == 0.75
+    assert stats["en-GB"]["kept_warm"] and stats["en-US"]["kept_warm"]
+    assert stats["en-US"]["checks"] >= 1 and stats["en-US"]["mean_check_ms"] is not None
+    # Fake tools run no local server process
+    assert stats["en-US"]["rss_bytes"] is None
@@ -2,7 +2,7 @@
 import pytest
 from unittest.mock import patch, MagicMock
 import spacy
-from app.services.lexical_service import LexicalService
+from app.services.lexical_service import LexicalCounts, LexicalService
 @pytest.fixture
 def lexical_service():
     return LexicalService()
@@ -99,7 +99,7 @@ def test_analyze_academic_usage(lexical_service):
 
 def test_error_handling():
     """Test error handling in analyze_lexical method"""
-    with patch.object(LexicalService, '_analyze_lexical_diversity', side_effect=Exception("Test error")):
+    with patch.object(LexicalCounts, 'lexical_diversity', side_effect=Exception("Test error")):
         service = LexicalService()
         with pytest.raises(Exception):
             service.analyze_lexical("Test text")
@@ -0,0 +1,96 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.evaluatiuon.load_test import (
+    LoadTester, build_payloads, load_corpus, parse_metrics, percentile, scale_text, stage_deltas
+)
+
+
+class _FakeApi(BaseHTTPRequestHandler):
+    """Minimal stand-in for the grading API"""
+    calls = 0
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length))
+        type(self).calls += 1
+        status = 500 if payload['text'].startswith('FAIL') else 200
+        self.send_response(status)
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def do_GET(self):
+        calls = type(self).calls
+        body = (
+            '# TYPE ielts_stage_duration_seconds histogram\n'
+            f'ielts_stage_duration_seconds_sum{{service="grammar",stage="languagetool_check"}} {calls * 0.5}\n'
+            f'ielts_stage_duration_seconds_count{{service="grammar",stage="languagetool_check"}} {calls}\n'
+        )
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(body.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_api():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeApi)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_scale_text_changes_length():
+    """Length-scaled variants grow and shrink the word count"""
+    text = "One two three four.\n\nFive six seven eight."
+    assert len(scale_text(text, 2).split()) >= 16
+    assert len(scale_text(text, 0.5).split()) == 4
+    assert scale_text(text, 1) == text
+
+
+def test_load_corpus_reads_dataset():
+    """The bundled dataset yields its non-blank essays with mapped task types"""
+    corpus = load_corpus()
+    assert len(corpus) >= 10
+    assert {'text', 'task_type', 'question_number', 'question_desc'} <= set(corpus[0])
+    assert len(build_payloads(corpus[:3], [1, 2])) == 6
+
+
+def test_parse_metrics_and_stage_deltas():
+    """Stage time is the difference between two scrapes"""
+    before = parse_metrics(
+        'ielts_stage_duration_seconds_sum{service="lexical",stage="spacy_parse"} 1.0\n'
+        'ielts_stage_duration_seconds_count{service="lexical",stage="spacy_parse"} 2\n'
+    )
+    after = parse_metrics(
+        'ielts_stage_duration_seconds_sum{service="lexical",stage="spacy_parse"} 4.0\n'
+        'ielts_stage_duration_seconds_count{service="lexical",stage="spacy_parse"} 8\n'
+    )
+    deltas = stage_deltas(before, after)
+    assert deltas['lexical.spacy_parse'] == {'calls': 6, 'total_seconds': 3.0, 'mean_seconds': 0.5}
+
+
+def test_percentile_interpolates():
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([], 99) is None
+
+
+def test_run_against_fake_api(fake_api):
+    """A closed-loop run reports throughput, errors and server stage times"""
+    payloads = [
+        {'text': 'A fine essay.', 'task_type': 'argument', 'question_number': 1},
+        {'text': 'FAIL this one.', 'task_type': 'argument', 'question_number': 2},
+    ]
+    summary = LoadTester(fake_api, payloads, concurrency=2, total_requests=10).run()
+
+    assert summary['requests'] == 10
+    assert summary['error_rate'] == pytest.approx(0.5)
+    assert summary['errors'] == {'HTTP 500': 5}
+    assert summary['latency_seconds']['p99'] is not None
+    assert summary['stages']['grammar.languagetool_check']['calls'] == 10
@@ -0,0 +1,58 @@
+import random
+
+from app.evaluatiuon.memory_profile import analyzer_calls, growth, mutate, peak_allocations, string_store_sizes
+
+
+class _FakeVocab:
+    def __init__(self):
+        self.strings = set()
+
+    def __len__(self):
+        return len(self.strings)
+
+
+class _FakeNLP:
+    """Records every token it sees, like spaCy's StringStore does"""
+    def __init__(self):
+        self.vocab = _FakeVocab()
+
+    def __call__(self, text):
+        self.vocab.strings.update(text.split())
+        return text
+
+
+class _FakeLexicalService:
+    def __init__(self):
+        self.nlp = _FakeNLP()
+
+    def analyze_lexical(self, text):
+        return [word.upper() for word in self.nlp(text).split()]
+
+
+CORPUS = [{'text': 'the quick brown fox jumps over the lazy dog ' * 20,
+           'task_type': 'argument', 'question_desc': None}]
+
+
+def test_mutate_injects_unseen_tokens():
+    rng = random.Random(1)
+    text = 'alpha beta gamma delta ' * 25
+    mutated = mutate(text, rng, rate=0.5)
+    assert len(mutated.split()) == len(text.split())
+    assert set(mutated.split()) - set(text.split())
+
+
+def test_peak_allocations_per_analyzer():
+    services = {'lexical': _FakeLexicalService()}
+    results = peak_allocations(analyzer_calls(services), CORPUS)
+    assert results['lexical']['peak_alloc_mb_max'] >= 0
+    assert set(results['lexical']) == {'peak_alloc_mb_max', 'peak_alloc_mb_mean', 'rss_delta_mb_max'}
+
+
+def test_growth_tracks_string_store():
+    services = {'lexical': _FakeLexicalService()}
+    summary = growth(services, analyzer_calls(services), CORPUS, requests=20, sample_every=5, mutation_rate=0.2)
+
+    assert [s['request'] for s in summary['samples']] == [0, 5, 10, 15, 20]
+    assert summary['lexical.strings_growth_per_request'] > 0
+    assert 'rss_growth_kb_per_request' in summary
+    assert string_store_sizes(services)['lexical.strings'] == summary['samples'][-1]['lexical.strings']
@@ -0,0 +1,80 @@
+import pytest
+
+from app.metrics import MetricsRegistry, Histogram, timed, record_cache, registry, STAGE_SECONDS
+
+
+class TestMetrics:
+
+    @pytest.fixture
+    def local_registry(self):
+        """Fresh registry so tests don't see each other's observations"""
+        return MetricsRegistry()
+
+    def test_histogram_buckets_are_cumulative(self, local_registry):
+        """Observations land in the right bucket and render cumulatively"""
+        hist = local_registry.histogram("test_seconds", "Test histogram", ("stage",), buckets=(0.1, 1.0))
+        hist.observe(0.05, stage="parse")
+        hist.observe(0.5, stage="parse")
+        hist.observe(5.0, stage="parse")
+
+        text = local_registry.render()
+        assert 'test_seconds_bucket{stage="parse",le="0.1"} 1' in text
+        assert 'test_seconds_bucket{stage="parse",le="1"} 2' in text
+        assert 'test_seconds_bucket{stage="parse",le="+Inf"} 3' in text
+        assert 'test_seconds_count{stage="parse"} 3' in text
+        assert "# TYPE test_seconds histogram" in text
+
+    def test_wrong_labels_rejected(self, local_registry):
+        """Label sets must match the declared label names"""
+        counter = local_registry.counter("test_total", "Test counter", ("cache",))
+        with pytest.raises(ValueError):
+            counter.inc(other="x")
+
+    def test_reregistering_returns_same_metric(self, local_registry):
+        """Modules can declare the same metric without clashing"""
+        first = local_registry.gauge("test_gauge", "Test gauge")
+        second = local_registry.gauge("test_gauge", "Test gauge")
+        assert first is second
+        with pytest.raises(ValueError):
+            local_registry.counter("test_gauge", "Now a counter")
+
+    def test_timed_as_decorator_and_context_manager(self):
+        """timed records one observation per call in either form"""
+        before = STAGE_SECONDS.snapshot(service="test", stage="decorated")["count"]
+
+        @timed("test", "decorated")
+        def work():
+            return 42
+
+        assert work() == 42
+        assert work() == 42
+        with timed("test", "decorated"):
+            pass
+
+        assert STAGE_SECONDS.snapshot(service="test", stage="decorated")["count"] == before + 3
+
+    def test_cache_hit_ratio_rendered(self):
+        """Cache lookups produce a derived hit ratio gauge"""
+        record_cache("unit_test_cache", hit=True)
+        record_cache("unit_test_cache", hit=False)
+
+        text = registry.render()
+        assert 'ielts_cache_requests_total{cache="unit_test_cache",result="hit"}' in text
+        assert 'ielts_cache_hit_ratio{cache="unit_test_cache"} 0.5' in text
+
+    def test_label_values_escaped(self):
+        """Quotes in label values don't break the exposition format"""
+        hist = Histogram("escape_seconds", "Escape test", ("stage",), buckets=(1.0,))
+        hist.observe(0.1, stage='say "hi"')
+        assert any('stage="say \\"hi\\""' in line for line in hist.render())
+
+    def test_model_load_timer_records_rss(self):
+        """Loading a model records its load time and resident memory delta"""
+        from app.metrics import model_load_timer, MODEL_LOAD_SECONDS, MODEL_RSS_BYTES, rss_bytes
+
+        with model_load_timer("unit_test_model"):
+            blob = bytearray(32 * 1024 * 1024)
+        assert MODEL_LOAD_SECONDS.value(model="unit_test_model") > 0
+        assert MODEL_RSS_BYTES.value(model="unit_test_model") >= 0
+        assert rss_bytes() > 0
+        del blob
@@ -0,0 +1,182 @@
+import socket
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pytest
+
+pytest.importorskip("msgpack")
+import spacy
+
+from app.model_server import (
+    ModelBackend, ModelServer, ModelClient, ModelServerError,
+    RemoteEncoder, RemoteZeroShot, RemoteLanguage,
+)
+
+
+class FakeEncoder:
+    """Deterministic 4-d embeddings; records batch sizes"""
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, batch_size=None):
+        self.batches.append(len(texts))
+        return np.array([[len(t), i, 0.5, -1.0] for i, t in enumerate(texts)], dtype=np.float32)
+
+
+def fake_classifier(texts, candidate_labels, multi_label, batch_size):
+    def classify(text):
+        scores = [0.9 if label in text else 0.1 for label in candidate_labels]
+        return {"sequence": text, "labels": list(candidate_labels), "scores": scores}
+    return classify(texts) if isinstance(texts, str) else [classify(t) for t in texts]
+
+
+@pytest.fixture
+def server(tmp_path):
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    encoder = FakeEncoder()
+    backend = ModelBackend(nlp, encoder, fake_classifier, max_wait_ms=50)
+    srv = ModelServer(str(tmp_path / "models.sock"), backend)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv, encoder
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_encode_returns_float32_rows(server):
+    srv, _ = server
+    encoder = RemoteEncoder(ModelClient(srv.server_address, timeout=5))
+
+    embeddings = encoder.encode(["short", "a longer sentence"])
+    assert embeddings.dtype == np.float32
+    assert embeddings.shape == (2, 4)
+    assert embeddings[1][0] == len("a longer sentence")
+    assert encoder.encode("one").shape == (4,)
+
+
+def test_zero_shot_matches_pipeline_shape(server):
+    srv, _ = server
+    classifier = RemoteZeroShot(ModelClient(srv.server_address, timeout=5))
+
+    result = classifier("education matters", candidate_labels=["education", "health"], multi_label=True)
+    assert result["sequence"] == "education matters"
+    assert result["labels"] == ["education", "health"]
+    assert result["scores"][0] > result["scores"][1]
+
+
+def test_parse_rebuilds_docs_locally(server):
+    srv, _ = server
+    nlp = RemoteLanguage(ModelClient(srv.server_address, timeout=5))
+
+    doc = nlp("Cities are growing. Transport must keep up.")
+    assert [sent.text for sent in doc.sents] == ["Cities are growing.", "Transport must keep up."]
+    assert [d.text for d in nlp.pipe(["One.", "Two words."])] == ["One.", "Two words."]
+    assert len(nlp.make_doc("no round trip")) == 3
+
+
+def test_workers_share_server_batches(server):
+    srv, encoder = server
+    client = ModelClient(srv.server_address, timeout=5)
+    remote = RemoteEncoder(client)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda i: remote.encode([f"text {i}"]), range(8)))
+
+    assert all(r.shape == (1, 4) for r in results)
+    assert sum(encoder.batches) == 8
+    assert len(encoder.batches) < 8
+
+
+def test_errors_and_reconnects(server):
+    srv, _ = server
+    client = ModelClient(srv.server_address, timeout=5)
+
+    with pytest.raises(ModelServerError, match="Unknown operation"):
+        client.call("translate", texts=["x"])
+    # A dropped connection is re-opened transparently
+    client._local.sock.shutdown(socket.SHUT_RDWR)
+    assert client.call("info")["ops"] == ["encode", "parse", "zero_shot"]
+
+
+def _scripted_server(path, replies):
+    """Unix socket server answering the n-th connection's request with replies[n]
+
+    A reply is raw bytes to send before closing, or None to never answer.
+    Returns the list of requests received, one entry per connection.
+    """
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen()
+    received = []
+
+    def answer(conn, reply):
+        received.append(conn.recv(65536))
+        if reply is None:
+            threading.Event().wait(1)
+        else:
+            conn.sendall(reply)
+        conn.close()
+
+    def serve():
+        for reply in replies:
+            conn, _ = listener.accept()
+            threading.Thread(target=answer, args=(conn, reply), daemon=True).start()
+        listener.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    return received
+
+
+def _ok_reply(result):
+    import msgpack
+
+    body = msgpack.packb({"ok": True, "result": result}, use_bin_type=True)
+    return struct.pack("!I", len(body)) + body
+
+
+def test_closed_before_any_response_is_retried(tmp_path):
+    path = str(tmp_path / "models.sock")
+    received = _scripted_server(path, [b"", _ok_reply({"ops": []})])
+
+    assert ModelClient(path, timeout=5).call("info") == {"ops": []}
+    assert len(received) == 2
+
+
+def test_server_not_listening_is_reported():
+    with pytest.raises(ModelServerError, match="unavailable"):
+        ModelClient("/nonexistent/models.sock", timeout=1).call("info")
+
+
+def test_timeouts_are_not_retried(tmp_path):
+    path = str(tmp_path / "models.sock")
+    received = _scripted_server(path, [None, _ok_reply({"ops": []})])
+
+    with pytest.raises(ModelServerError, match="timed out"):
+        ModelClient(path, timeout=0.2).call("info")
+    assert len(received) == 1
+
+
+def test_partial_responses_are_not_retried(tmp_path):
+    path = str(tmp_path / "models.sock")
+    received = _scripted_server(path, [_ok_reply({"ops": []})[:6], _ok_reply({"ops": []})])
+
+    with pytest.raises(ModelServerError, match="middle of a message"):
+        ModelClient(path, timeout=5).call("info")
+    assert len(received) == 1
+
+
+def test_server_reported_errors_are_not_retried(server):
+    srv, _ = server
+    calls = []
+
+    def failing(op, args):
+        calls.append(op)
+        raise RuntimeError("model crashed")
+    srv.backend.handle = failing
+
+    with pytest.raises(ModelServerError, match="model crashed"):
+        ModelClient(srv.server_address, timeout=5).call("info")
+    assert calls == ["info"]
@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+
+from app.profiling import SamplingProfiler, profile_call
+from app.scheduler import THREAD_NAME_PREFIX
+from app.schemas.submission import SubmissionCreate
+from app.services.grading_pipeline import GradingPipeline
+
+
+def _busy_leaf(duration):
+    end = time.perf_counter() + duration
+    total = 0
+    while time.perf_counter() < end:
+        total += 1
+    return total
+
+
+def _busy_parent(duration):
+    return _busy_leaf(duration)
+
+
+def _slow_grammar(text, **kwargs):
+    _busy_leaf(0.1)
+    return {"score": 7.0, "feedback": "Good", "errors": [], "sentences": []}
+
+
+def _other_request_grammar(text, **kwargs):
+    _busy_leaf(0.3)
+    return {"score": 5.0, "feedback": "Fair", "errors": [], "sentences": []}
+
+
+def _pipeline(max_workers=2):
+    grammar, lexical, coherence, task = MagicMock(), MagicMock(), MagicMock(), MagicMock()
+    grammar.analyze_grammar.side_effect = (
+        lambda text, **kwargs: (_other_request_grammar if text == "Other essay." else _slow_grammar)(text, **kwargs)
+    )
+    lexical.analyze_lexical.return_value = {"overall_score": 6.0, "feedback": {}}
+    coherence.analyze_coherence_cohesion.return_value = {"overall_score": 6.5, "feedback": {}}
+    task.analyze_submission.return_value = {"ielts_score": 6.5}
+    return GradingPipeline(grammar, lexical, coherence, task, max_workers=max_workers, reserved_workers={})
+
+
+class TestSamplingProfiler:
+
+    def test_profile_call_returns_result_and_samples(self):
+        """The wrapped call runs normally and the profiler collects stacks"""
+        result, profiler = profile_call(_busy_parent, 0.1, interval=0.001)
+
+        assert result > 0
+        assert profiler.sample_count > 0
+        assert profiler.duration >= 0.1
+
+    def test_collapsed_stacks_contain_call_chain(self):
+        """Collapsed output nests the leaf under its caller"""
+        _, profiler = profile_call(_busy_parent, 0.1, interval=0.001)
+        collapsed = profiler.to_collapsed()
+
+        chain_lines = [line for line in collapsed.splitlines() if "_busy_leaf" in line]
+        assert chain_lines
+        assert chain_lines[0].index("_busy_parent") < chain_lines[0].index("_busy_leaf")
+        assert int(chain_lines[0].rsplit(" ", 1)[1]) > 0
+
+    def test_speedscope_format(self):
+        """Speedscope export references valid frame indexes"""
+        _, profiler = profile_call(_busy_parent, 0.05, interval=0.001)
+        doc = profiler.to_speedscope("unit")
+
+        profile = doc["profiles"][0]
+        assert profile["type"] == "sampled"
+        assert len(profile["samples"]) == len(profile["weights"])
+        frame_count = len(doc["shared"]["frames"])
+        assert all(0 <= i < frame_count for sample in profile["samples"] for i in sample)
+
+    def test_top_functions_ranks_leaf_first(self):
+        """The busy leaf dominates self time"""
+        _, profiler = profile_call(_busy_parent, 0.1, interval=0.001)
+        top = profiler.top_functions(5)
+        assert "_busy_leaf" in top[0]["function"]
+        assert top[0]["self_samples"] <= top[0]["total_samples"]
+
+    def test_save_writes_all_formats(self, tmp_path):
+        """Saving produces speedscope, collapsed and summary files"""
+        _, profiler = profile_call(_busy_parent, 0.02, interval=0.001)
+        saved = profiler.save(str(tmp_path), name="abc")
+
+        assert saved["profile_id"] == "abc"
+        with open(saved["speedscope"]) as f:
+            assert json.load(f)["profiles"]
+        with open(saved["summary"]) as f:
+            assert json.load(f)["samples"] == profiler.sample_count
+
+
+    def test_scheduler_workers_are_sampled_while_grading(self):
+        """Analyzer frames running on the scheduler workers show up under the request's profile"""
+        pipeline = _pipeline()
+        submission = SubmissionCreate(text="An essay.", task_type="argument", question_number=1, mode="fast")
+
+        _, profiler = profile_call(pipeline.grade, submission, interval=0.001)
+        assert "_slow_grammar" not in profiler.to_collapsed()
+
+        result, profiler = profile_call(pipeline.grade, submission, interval=0.001,
+                                        thread_prefixes=(THREAD_NAME_PREFIX,))
+        assert result["grammar_analysis"]["overall_score"] == 7.0
+        worker_lines = [line for line in profiler.to_collapsed().splitlines() if "_slow_grammar" in line]
+        assert worker_lines and all(line.startswith("scheduler;") for line in worker_lines)
+
+    def test_other_requests_on_the_workers_are_not_sampled(self):
+        """A concurrent, unprofiled request's analyzers stay out of the profile"""
+        pipeline = _pipeline(max_workers=4)
+        other = SubmissionCreate(text="Other essay.", task_type="argument", question_number=1, mode="fast")
+        profiled = SubmissionCreate(text="An essay.", task_type="argument", question_number=1, mode="fast")
+
+        background = threading.Thread(target=pipeline.grade, args=(other,))
+        background.start()
+        try:
+            _, profiler = profile_call(pipeline.grade, profiled, interval=0.001,
+                                       thread_prefixes=(THREAD_NAME_PREFIX,))
+        finally:
+            background.join()
+
+        collapsed = profiler.to_collapsed()
+        assert "_slow_grammar" in collapsed
+        assert "_other_request_grammar" not in collapsed
@@ -0,0 +1,93 @@
+import json
+from unittest.mock import MagicMock
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.submission import Submission
+from app.rescore import rescore
+from app.services.grading_pipeline import GradingPipeline, SCORER_VERSION
+
+
+def fake_pipeline():
+    """Module-level so pool processes can unpickle it; every essay now scores 6.5"""
+    grammar = MagicMock()
+    grammar.analyze_grammar.return_value = {
+        "score": 7.0, "feedback": "Good", "errors": [{"context": "it go", "message": "Agreement"}]
+    }
+    lexical = MagicMock()
+    lexical.analyze_lexical.return_value = {"overall_score": 6.0, "feedback": {}}
+    coherence = MagicMock()
+    coherence.analyze_coherence_cohesion.return_value = {"overall_score": 6.5, "feedback": {}}
+    task = MagicMock()
+    task.analyze_submission.return_value = {
+        "ielts_score": 6.5, "task_achievement_feedback": {}, "task_achievement_analysis": {}
+    }
+    return GradingPipeline(grammar, lexical, coherence, task, max_workers=4, reserved_workers={})
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rescore.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    for i in range(7):
+        db.add(Submission(text=f"Essay {i}.", task_type="argument", question_number=1, grading_mode="fast",
+                          ielts_score=5.0, lexical_score=5.0, scorer_version="0-old"))
+    # Already on the current scorer: skipped by default
+    db.add(Submission(text="Current.", task_type="argument", question_number=1,
+                      ielts_score=8.0, scorer_version=SCORER_VERSION))
+    # Cannot be graded: reported, left untouched
+    db.add(Submission(text="Broken.", task_type=None, question_number=1, ielts_score=4.0))
+    db.commit()
+    db.close()
+    return factory
+
+
+def test_rescore_updates_stale_rows_and_reports_deltas(session_factory, tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.json")
+    report = rescore(session_factory, chunk_size=3, processes=0, checkpoint_path=checkpoint,
+                     pipeline_factory=fake_pipeline)
+
+    assert (report["rescored"], report["failed"], report["changed"]) == (7, 1, 7)
+    assert report["band_shifts"] == {"+1.5": 7}
+    assert report["component_mean_deltas"]["lexical"] == 1.0
+    assert report["errors"][0]["id"] == 9
+
+    db = session_factory()
+    rows = db.query(Submission).order_by(Submission.id).all()
+    assert all(row.scorer_version == SCORER_VERSION and row.ielts_score == 6.5 for row in rows[:7])
+    assert rows[7].ielts_score == 8.0
+    assert (rows[8].ielts_score, rows[8].scorer_version) == (4.0, None)
+    db.close()
+
+
+def test_interrupted_run_resumes_from_checkpoint(session_factory, tmp_path):
+    checkpoint = tmp_path / "checkpoint.json"
+    first = rescore(session_factory, chunk_size=2, processes=0, checkpoint_path=str(checkpoint),
+                    pipeline_factory=fake_pipeline, limit=4, only_stale=False)
+    assert first["rescored"] == 4
+    assert json.loads(checkpoint.read_text())["last_id"] == 4
+
+    second = rescore(session_factory, chunk_size=2, processes=0, checkpoint_path=str(checkpoint),
+                     pipeline_factory=fake_pipeline, only_stale=False)
+    # Totals carry over; the current-version row is included with only_stale=False
+    assert second["rescored"] == 8
+    assert second["failed"] == 1
+    assert not checkpoint.exists()
+
+
+def test_process_pool_matches_in_process_results(session_factory):
+    report = rescore(session_factory, chunk_size=4, processes=2, checkpoint_path=None,
+                     pipeline_factory=fake_pipeline)
+    assert (report["rescored"], report["failed"]) == (7, 1)
+    assert report["mean_delta"] == 1.5
+
+
+def test_from_signals_joins_stored_signals(session_factory):
+    # Rows without stored signals fall back to running the analyzers
+    report = rescore(session_factory, chunk_size=4, processes=0, checkpoint_path=None,
+                     pipeline_factory=fake_pipeline, from_signals=True)
+    assert (report["rescored"], report["failed"]) == (7, 1)
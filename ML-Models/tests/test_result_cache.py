@@ -0,0 +1,103 @@
+import time
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.cached_result import CachedResult
+from app.result_cache import ResultCache, cache_key
+from app.schemas.submission import SubmissionCreate
+
+RESULT = {'grading_mode': 'full', 'ielts_score': 6.5, 'grade': 68.75, 'missing_components': []}
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def make_submission(text="An essay.\n\nSecond paragraph.", **kwargs):
+    fields = dict(task_type="argument", question_number=1, question_desc="Discuss.")
+    fields.update(kwargs)
+    return SubmissionCreate(text=text, **fields)
+
+
+def test_cache_key_covers_every_input():
+    base = cache_key(make_submission(), "full", "v1")
+    assert cache_key(make_submission(task_type="Argument"), "full", "v1") == base
+    assert cache_key(make_submission(question_desc="Other."), "full", "v1") != base
+    assert cache_key(make_submission(question_requirements="Two views."), "full", "v1") != base
+    assert cache_key(make_submission(task_type="discussion"), "full", "v1") != base
+    assert cache_key(make_submission(), "fast", "v1") != base
+    assert cache_key(make_submission(), "full", "v2") != base
+
+
+@pytest.mark.parametrize("text, variant", [
+    ("Para one.\n\nHe go home.", "Para one.\r\n\r\nHe go home."),  # CRLF
+    ("Caf\u00e9 one.\n\nHe go home.", "Cafe\u0301 one.\n\nHe go home."),  # NFD "Café"
+    ("Para one.\n\nHe go home.", "Para  one.\n\nHe go home."),
+])
+def test_texts_with_other_offsets_never_share_a_key(text, variant):
+    # A shared key would hand back error offsets pointing at the wrong characters
+    assert variant.index("go") != text.index("go")
+    assert cache_key(make_submission(text=variant), "full", "v1") != cache_key(make_submission(text=text), "full", "v1")
+
+
+def test_memory_tier_is_bounded_lru(session_factory):
+    cache = ResultCache(session_factory, "v1", max_entries=2)
+    for key in ("a", "b"):
+        cache.put(key, RESULT)
+    cache.get("a")          # "b" is now least recently used
+    cache.put("c", RESULT)
+
+    assert list(cache._entries) == ["a", "c"]
+    # Evicted entries are still served from the database tier
+    assert cache.get("b") == RESULT
+    assert "b" in cache._entries
+
+
+def test_memory_hit_is_fast(session_factory):
+    cache = ResultCache(session_factory, "v1")
+    cache.put("k", RESULT)
+    start = time.perf_counter()
+    assert cache.get("k") == RESULT
+    assert time.perf_counter() - start < 0.005
+
+
+def test_partial_results_and_futures_are_not_cached(session_factory):
+    cache = ResultCache(session_factory, "v1")
+    cache.put("partial", {**RESULT, 'missing_components': ['grammar']})
+    cache.put("complete", {**RESULT, 'pending': {}})
+
+    assert cache.get("partial") is None
+    assert 'pending' not in cache.get("complete")
+
+
+def test_other_scorer_versions_are_never_served(session_factory):
+    old = ResultCache(session_factory, "v1")
+    old.put("k", RESULT)
+    new = ResultCache(session_factory, "v2")
+
+    assert new.get("k") is None
+    assert new.invalidate(all_versions=False)["database_rows"] == 1
+    db = session_factory()
+    assert db.query(CachedResult).count() == 0
+    db.close()
+
+
+def test_invalidate_clears_both_tiers(session_factory):
+    cache = ResultCache(session_factory, "v1")
+    cache.put("k", RESULT)
+
+    assert cache.invalidate() == {"memory_entries": 1, "database_rows": 1}
+    assert cache.get("k") is None
+    assert cache.stats()["database_rows"] == 0
+
+
+def test_disabled_cache_stores_nothing(session_factory):
+    cache = ResultCache(session_factory, "v1", max_entries=0)
+    cache.put("k", RESULT)
+    assert cache.get("k") is None
@@ -0,0 +1,127 @@
+from unittest.mock import patch
+
+import pytest
+import spacy
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.submission import Submission
+from app.revisions import RevisionGrader, apply_delta, make_delta, paragraph_units
+from app.services.CoherenceCohensionService import CoherenceCohesionService
+from app.services.grading_pipeline import GradingPipeline
+from app.services.lexical_service import LexicalService
+
+PARAGRAPHS = [
+    "Public transport is a significant issue in many cities. However, governments rarely invest enough in buses.",
+    "Firstly, i think cars are convenient. They let people travel whenever they want and they are comfortable.",
+    "In addition, housing costs near the centre are rising. Therefore many residents live far from their work.",
+    "In conclusion, cities should fund public services. This would reduce traffic and help the environment.",
+]
+
+
+class FakeTaskAchievement:
+    def analyze_submission(self, submission, mode="full"):
+        score = min(9, 4 + len(submission.text.split("\n\n")))
+        return {
+            "ielts_score": score,
+            "task_achievement_feedback": {"strengths": [], "improvements": [], "specific_suggestions": {}},
+            "task_achievement_analysis": {
+                "band_score": score, "component_scores": {}, "detailed_analysis": {},
+                "feedback": {"strengths": [], "improvements": [], "specific_suggestions": {}},
+            },
+        }
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+@pytest.fixture
+def pipeline(make_grammar_service):
+    nlp = spacy.blank("en")
+    with patch("app.services.lexical_service.load_spacy", return_value=nlp), \
+            patch("app.services.CoherenceCohensionService.load_spacy", return_value=nlp), patch("nltk.download"):
+        lexical, coherence = LexicalService(), CoherenceCohesionService()
+    grammar = make_grammar_service()
+    checked = []
+    check = grammar.check
+    grammar.check = lambda text, mode="full", locale=None: checked.append(text) or check(text, mode, locale)
+    pipeline = GradingPipeline(grammar, lexical, coherence, FakeTaskAchievement(), max_workers=2, reserved_workers={})
+    pipeline.checked = checked
+    return pipeline
+
+
+@pytest.fixture
+def submission(session_factory):
+    db = session_factory()
+    row = Submission(text="\n\n".join(PARAGRAPHS), task_type="argument", question_number=1,
+                     question_desc="Discuss transport.", grading_mode="fast")
+    db.add(row)
+    db.commit()
+    db.refresh(row)
+    yield db, row
+    db.close()
+
+
+def edit(paragraphs, index, text):
+    paragraphs = list(paragraphs)
+    paragraphs[index] = text
+    return paragraphs
+
+
+def test_delta_rebuilds_the_revision():
+    previous = "\n\n".join(PARAGRAPHS)
+    text = "\n\n".join([PARAGRAPHS[0], "A brand new paragraph.", PARAGRAPHS[2], PARAGRAPHS[3], "One more."])
+    delta = make_delta(previous, text)
+
+    assert apply_delta(previous, delta) == text
+    assert [op[0] for op in delta] == ["copy", "insert", "copy", "insert"]
+    assert apply_delta(text, make_delta(text, previous)) == previous
+    assert "".join(unit for _, unit in paragraph_units(text)) == text
+
+
+def test_revision_only_rechecks_changed_paragraphs(pipeline, session_factory, submission):
+    db, row = submission
+    grader = RevisionGrader(pipeline, session_factory, scorer_version="test")
+
+    grader.seed(row).result()  # stored when the submission was graded
+    assert pipeline.checked == [unit for _, unit in paragraph_units(row.text)]
+
+    pipeline.checked.clear()
+    first = grader.add(db, row, "\n\n".join(edit(PARAGRAPHS, 1, "Firstly, I think cars are convenient.")))
+    assert first.number == 1
+    assert first.paragraphs == {"count": 4, "changed": [1], "recomputed": [1], "reused": 3}
+    assert len(pipeline.checked) == 1
+
+    pipeline.checked.clear()
+    revised = edit(PARAGRAPHS, 1, "Firstly, I think cars are convenient.")
+    revised = edit(revised, 3, "In conclusion, cities should fund buses and trains.")
+    second = grader.add(db, row, "\n\n".join(revised))
+
+    assert second.number == 2
+    assert second.paragraphs == {"count": 4, "changed": [3], "recomputed": [3], "reused": 3}
+    assert pipeline.checked == [paragraph_units("\n\n".join(revised))[3][1]]
+    assert grader.texts(db, row)[2] == "\n\n".join(revised)
+
+
+def test_merged_paragraph_stats_match_whole_essay_analysis(pipeline, session_factory, submission):
+    db, row = submission
+    grader = RevisionGrader(pipeline, session_factory, scorer_version="test")
+    grader.seed(row).result()
+
+    text = "\n\n".join(edit(PARAGRAPHS, 2, "Moreover, there is a a shortage of houses. Rents are high."))
+    result = grader.grade(row, text, mode="fast", previous=row.text)
+
+    assert result["paragraphs"]["reused"] == 3
+    grammar = pipeline.grammar_service.analyze_grammar(text, mode="fast")
+    assert result["grammar_analysis"] == pipeline.format_grammar(grammar, text)
+    assert result["grammar_analysis"]["error_details"]
+    assert result["lexical_analysis"] == pipeline.lexical_service.analyze_lexical(text, mode="fast")
+    assert result["coherence_analysis"] == pipeline.coherence_service.analyze_coherence_cohesion(text, mode="fast")
+    expected, _ = pipeline.combine_scores(result["component_scores"])
+    assert result["ielts_score"] == expected
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.evaluatiuon.rule_profile_benchmark import benchmark_profiles
+from app.services.grammar_service import RULE_PROFILES
+
+
+class FakeTool:
+    """LanguageTool stand-in that honours the rule settings a profile applies"""
+
+    MATCHES = [
+        ("GRAMMAR", "HE_VERB_AGR"), ("STYLE", "PASSIVE_VOICE"), ("STYLE", "TOO_LONG_SENTENCE"),
+        ("TYPOGRAPHY", "EN_QUOTES"), ("TYPOS", "MORFOLOGIK_RULE_EN_GB"), ("PUNCTUATION", "COMMA_PARENTHESIS"),
+    ]
+
+    def __init__(self):
+        self.picky = False
+        self.disabled_categories = set()
+        self.disabled_rules = set()
+
+    def disable_spellchecking(self):
+        self.disabled_categories.add("TYPOS")
+
+    def check(self, text):
+        return [
+            SimpleNamespace(offset=i, errorLength=1, message=rule, replacements=[], category=category, ruleId=rule)
+            for i, (category, rule) in enumerate(self.MATCHES)
+            if category not in self.disabled_categories and rule not in self.disabled_rules
+        ]
+
+
+def test_profiles_configure_the_languagetool_rules(make_grammar_service):
+    service = make_grammar_service(FakeTool)
+    service.set_rule_profile("ielts-core")
+    rules = {m["rule_id"] for m in service._languagetool_check("text")}
+    assert rules == {"HE_VERB_AGR", "MORFOLOGIK_RULE_EN_GB", "COMMA_PARENTHESIS"}
+
+    service.set_rule_profile("strict")
+    assert service.pool.get().picky and len(service._languagetool_check("text")) == len(FakeTool.MATCHES)
+
+    # A local spelling index keeps LanguageTool's spelling rules off in every profile
+    service.spelling = SimpleNamespace(check=lambda text: [])
+    service.set_rule_profile("all")
+    assert "TYPOS" in service.pool.get().disabled_categories
+    with pytest.raises(ValueError):
+        service.set_rule_profile("lenient")
+
+
+def test_benchmark_reports_time_and_agreement_per_profile(make_grammar_service):
+    texts = ["word " * 50, "word " * 400]
+    results = benchmark_profiles(make_grammar_service(FakeTool), texts, list(RULE_PROFILES))
+
+    assert set(results) == set(RULE_PROFILES)
+    assert results["all"]["agreement"]["exact"] == 1.0
+    core = results["ielts-core"]
+    assert core["mean_errors"] == 3 and results["all"]["mean_errors"] == 6
+    assert 0 <= core["agreement"]["within_half_band"] <= 1
+    assert core["check_ms"]["p95"] >= core["check_ms"]["p50"] > 0
@@ -0,0 +1,46 @@
+import pytest
+
+from app.evaluatiuon.scaling_benchmark import fit_exponent, find_regressions, make_text, run_benchmark
+
+
+def test_make_text_hits_word_target():
+    """Synthetic essays have exactly the requested number of words"""
+    paragraphs = ["one two three", "four five six seven"]
+    for words in (2, 7, 50):
+        assert len(make_text(paragraphs, words).split()) == words
+
+
+def test_fit_exponent_recovers_power_law():
+    """Linear and quadratic curves give slopes of 1 and 2"""
+    sizes = [50, 100, 500, 1000, 5000]
+    assert fit_exponent(sizes, [n * 1e-5 for n in sizes]) == pytest.approx(1.0)
+    assert fit_exponent(sizes, [n * n * 1e-8 for n in sizes]) == pytest.approx(2.0)
+    assert fit_exponent([100], [0.1]) is None
+
+
+def test_run_benchmark_fits_each_analyzer():
+    """Every analyzer gets a curve and exponent; task achievement also gets a prompt curve"""
+    analyzers = {
+        'lexical': lambda essay, prompt: essay.split(),
+        'task_achievement': lambda essay, prompt: (essay.split(), prompt.split()),
+    }
+    results = run_benchmark(analyzers, ["a b c d e"], ["why is it so"], [50, 500], [10, 20], repeats=1)
+
+    assert [p['words'] for p in results['lexical']['essay_curve']] == [50, 500]
+    assert results['lexical']['essay_exponent'] is not None
+    assert 'prompt_curve' in results['task_achievement']
+    assert 'prompt_curve' not in results['lexical']
+
+
+def test_find_regressions_flags_exponent_and_slowdown():
+    baseline = {'coherence': {'essay_exponent': 1.0,
+                              'essay_curve': [{'words': 5000, 'seconds': 1.0}]}}
+    steady = {'coherence': {'essay_exponent': 1.05,
+                            'essay_curve': [{'words': 5000, 'seconds': 1.1}]}}
+    worse = {'coherence': {'essay_exponent': 1.6,
+                           'essay_curve': [{'words': 5000, 'seconds': 3.0}]}}
+
+    assert find_regressions(steady, baseline) == []
+    regressions = find_regressions(worse, baseline)
+    assert len(regressions) == 2
+    assert any('essay_exponent' in r for r in regressions)
@@ -0,0 +1,101 @@
+import threading
+import time
+import pytest
+
+from app.scheduler import FairScheduler, QUEUE_WAIT_SECONDS, parse_class_setting
+
+
+def blocker(scheduler, **kwargs):
+    """Occupy one worker until the returned event is set"""
+    release, started = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(5)
+    scheduler.submit(hold, **kwargs)
+    assert started.wait(5)
+    return release
+
+
+def run_in_order(scheduler, submissions):
+    """Queue tasks behind a busy single worker, then record the order they run in"""
+    order = []
+    release = blocker(scheduler, priority_class="bulk")
+    futures = [
+        scheduler.submit(order.append, label, priority_class=cls, tenant=tenant)
+        for label, cls, tenant in submissions
+    ]
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+    return order
+
+
+def test_reserved_workers_stay_free_for_interactive():
+    scheduler = FairScheduler(max_workers=3, reserved={"interactive": 1})
+    release = threading.Event()
+    running = []
+
+    def bulk_job():
+        running.append(1)
+        release.wait(5)
+        running.pop()
+
+    bulk = [scheduler.submit(bulk_job, priority_class="bulk") for _ in range(10)]
+    time.sleep(0.1)
+    assert len(running) == 2  # the third worker is held back
+
+    start = time.perf_counter()
+    assert scheduler.submit(lambda: "graded", priority_class="interactive").result(timeout=1) == "graded"
+    assert time.perf_counter() - start < 0.5
+
+    release.set()
+    for future in bulk:
+        future.result(timeout=5)
+    scheduler.shutdown()
+
+
+def test_classes_share_workers_by_weight():
+    scheduler = FairScheduler(max_workers=1, weights={"interactive": 3, "bulk": 1})
+    order = run_in_order(
+        scheduler,
+        [(f"b{i}", "bulk", None) for i in range(8)] + [(f"i{i}", "interactive", None) for i in range(8)]
+    )
+    first_eight = [label[0] for label in order[:8]]
+    assert first_eight.count("i") == 6
+    assert first_eight.count("b") == 2
+    scheduler.shutdown()
+
+
+def test_tenants_take_turns_within_a_class():
+    scheduler = FairScheduler(max_workers=1)
+    order = run_in_order(
+        scheduler,
+        [(f"teacher{i}", "bulk", "school-a") for i in range(4)] + [("student", "bulk", "school-b")]
+    )
+    assert order.index("student") == 1
+    scheduler.shutdown()
+
+
+def test_queue_wait_is_recorded_per_class():
+    scheduler = FairScheduler(max_workers=2)
+    before = QUEUE_WAIT_SECONDS.snapshot(priority_class="bulk")["count"]
+    scheduler.submit(lambda: None, priority_class="bulk").result(timeout=5)
+    assert QUEUE_WAIT_SECONDS.snapshot(priority_class="bulk")["count"] == before + 1
+    scheduler.shutdown()
+
+
+def test_task_errors_and_bad_configuration():
+    scheduler = FairScheduler(max_workers=2)
+
+    def fail():
+        raise ValueError("analyzer crashed")
+    with pytest.raises(ValueError):
+        scheduler.submit(fail).result(timeout=5)
+    with pytest.raises(ValueError):
+        scheduler.submit(fail, priority_class="urgent")
+    scheduler.shutdown()
+
+    with pytest.raises(ValueError):
+        FairScheduler(max_workers=2, reserved={"interactive": 2})
+    assert parse_class_setting("interactive=4, bulk=1") == {"interactive": 4.0, "bulk": 1.0}
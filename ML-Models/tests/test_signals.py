@@ -0,0 +1,130 @@
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+spacy = pytest.importorskip("spacy")
+
+from app import signals as signal_helpers
+from app.database import Base
+from app.models.submission import Submission
+from app.signals import SignalStore, SubmissionSignals, collecting
+
+
+@pytest.fixture
+def nlp():
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    return nlp
+
+
+class Counting:
+    """Callable that counts how often the model behind it runs"""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.calls = 0
+        self.vocab = getattr(fn, "vocab", None)
+
+    def __call__(self, *args):
+        self.calls += 1
+        return self.fn(*args)
+
+
+def recorded(nlp):
+    text = "The essay has two sentences. This is the second one."
+    signals = SubmissionSignals()
+    with collecting(signals):
+        signal_helpers.parse(nlp, text)
+        signal_helpers.check(lambda: [{"message": "Agreement", "offset": 4, "length": 5}])
+        signal_helpers.encode(lambda texts: [np.full(4, len(t), dtype=np.float32) for t in texts], ["a", "bb"])
+        signal_helpers.classify(lambda t, group: {"labels": ["education"], "scores": [0.9]}, text, ("education",))
+    return text, signals
+
+
+def test_parse_is_shared_between_stages(nlp):
+    parse = Counting(nlp)
+    signals = SubmissionSignals()
+    with collecting(signals):
+        first = signal_helpers.parse(parse, "One sentence. Two sentences.")
+        second = signal_helpers.parse(parse, "One sentence. Two sentences.")
+    assert first is second
+    assert parse.calls == 1
+    # Without a collector every call goes to the model
+    signal_helpers.parse(parse, "One sentence.")
+    assert parse.calls == 2
+
+
+def test_replayed_signals_skip_the_models(nlp):
+    text, signals = recorded(nlp)
+    replay = SubmissionSignals.from_row(signals.to_columns())
+
+    check = Counting(lambda: [])
+    encode = Counting(lambda texts: [np.zeros(4) for _ in texts])
+    classify = Counting(lambda t, group: {})
+    parse = Counting(nlp)
+    with collecting(replay):
+        doc = signal_helpers.parse(parse, text)
+        matches = signal_helpers.check(check)
+        vectors = signal_helpers.encode(encode, ["bb", "a"])
+        topics = signal_helpers.classify(classify, text, ("education",))
+
+    assert (parse.calls, check.calls, encode.calls, classify.calls) == (0, 0, 0, 0)
+    assert [s.text for s in doc.sents] == ["The essay has two sentences.", "This is the second one."]
+    assert matches[0]["message"] == "Agreement"
+    assert vectors[0].dtype == np.float32 and vectors[0][0] == 2.0  # float16 on disk
+    assert topics["scores"] == [0.9]
+
+    # Texts that were never recorded still go to the model
+    with collecting(replay):
+        signal_helpers.encode(encode, ["a", "new"])
+    assert encode.calls == 1
+
+
+def test_signal_store_round_trip(nlp, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'signals.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    db.add(Submission(text="Essay.", task_type="argument", question_number=1))
+    db.commit()
+    db.close()
+
+    text, signals = recorded(nlp)
+    store = SignalStore(factory)
+    store.save_when_complete(1, {"signals": signals, "scorer_version": "v-test", "pending": {}})
+
+    loaded = store.load(1)
+    assert loaded.matches == signals.matches
+    assert set(loaded.embeddings) == set(signals.embeddings)
+    assert store.load(2) is None
+
+
+def test_cache_hits_copy_the_signals_of_the_graded_submission(nlp, tmp_path):
+    from app.result_cache import ResultCache
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'signals.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = factory()
+    db.add_all([Submission(text="Essay.", task_type="argument", question_number=1) for _ in range(3)])
+    db.commit()
+    db.close()
+
+    _, signals = recorded(nlp)
+    store, cache = SignalStore(factory), ResultCache(factory, "v-test")
+    graded = {"ielts_score": 6.5, "signals": signals, "scorer_version": "v-test", "pending": {},
+              "missing_components": []}
+    cache.put("key", graded)
+    store.save_when_complete(1, graded)
+    cache.link("key", 1, graded)
+
+    # A memory hit in this process, and a database hit in another one
+    store.save_when_complete(2, {**cache.get("key"), "pending": {}})
+    other = ResultCache(factory, "v-test")
+    store.save_when_complete(3, {**other.get("key"), "pending": {}})
+
+    for submission_id in (2, 3):
+        copied = store.load(submission_id)
+        assert copied.matches == signals.matches
+        assert set(copied.embeddings) == set(signals.embeddings)
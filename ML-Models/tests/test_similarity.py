@@ -0,0 +1,126 @@
+import random
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.submission import Submission
+from app.similarity import MinHashIndex, shingles
+
+VOCABULARY = (
+    "city transport government people housing money work school health family technology environment "
+    "public private cost benefit problem solution reason example future society young older travel car"
+).split()
+
+
+def essay(seed, words=250):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(VOCABULARY) + rng.choice(["", "s", "ing", "ed"]) for _ in range(words))
+
+
+def edit(text, share, seed=0):
+    """text with share of its words replaced"""
+    rng = random.Random(seed)
+    words = text.split()
+    for i in rng.sample(range(len(words)), int(len(words) * share)):
+        words[i] = "changed%d" % i
+    return " ".join(words)
+
+
+def jaccard(a, b, size=5):
+    a, b = set(shingles(a, size)), set(shingles(b, size))
+    return len(a & b) / len(a | b)
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def test_near_duplicates_are_found_with_jaccard_estimates():
+    index = MinHashIndex()
+    for i in range(500):
+        index.add(i + 1, essay(i))
+    original = essay(42)
+    copy = edit(original, 0.03)
+
+    matches = index.query(copy)
+    assert matches[0]["submission_id"] == 43
+    assert matches[0]["jaccard"] == pytest.approx(jaccard(original, copy), abs=0.12)
+    assert len(matches) == 1  # unrelated essays share no buckets worth reporting
+    assert index.query(essay(10_000)) == []
+    assert index.query("") == []
+
+
+def test_index_persists_and_reloads(tmp_path):
+    path = str(tmp_path / "similarity.idx")
+    index = MinHashIndex(path=path)
+    for i in range(20):
+        index.add(i + 1, essay(i))
+    with open(path, "ab") as f:
+        f.write(b"\1\2\3")  # a record cut short by a crash
+
+    reloaded = MinHashIndex(path=path)
+    assert len(reloaded) == 20
+    assert reloaded.query(essay(7)) == index.query(essay(7))
+    reloaded.add(21, essay(99))
+    assert len(MinHashIndex(path=path)) == 21
+
+    # Other MinHash settings cannot reuse the signatures
+    assert len(MinHashIndex(num_perm=64, bands=16, path=path)) == 0
+
+
+def test_check_reports_earlier_submissions_and_indexes_the_new_one(session_factory):
+    db = session_factory()
+    texts = [essay(1), essay(2), edit(essay(1), 0.02)]
+    rows = [Submission(text=text, task_type="argument", question_number=1) for text in texts]
+    db.add_all(rows)
+    db.commit()
+
+    index = MinHashIndex()
+    assert index.check(rows[0].id, rows[0].text) == []
+    # Rows stored elsewhere (the queue worker) are picked up from the database
+    matches = index.check(rows[2].id, rows[2].text, session_factory)
+    assert [m["submission_id"] for m in matches] == [rows[0].id]
+    assert len(index) == 3
+    db.close()
+
+
+def test_sync_picks_up_lower_ids_committed_by_another_process(session_factory):
+    db = session_factory()
+    rows = [Submission(text=essay(i), task_type="argument", question_number=1) for i in range(4)]
+    db.add_all(rows)
+    db.commit()
+
+    # Process A grades 1 and 3; process B committed 2 and 4, which A has not synced yet
+    index = MinHashIndex()
+    index.add_many([(rows[0].id, index.signature(rows[0].text))])
+    index.check(rows[2].id, rows[2].text)
+    copy = edit(rows[1].text, 0.02)
+    db.add(Submission(text=copy, task_type="argument", question_number=1))
+    db.commit()
+
+    assert index.sync(session_factory) == 3  # ids 2, 4 and 5: nothing below the newest id is skipped
+    assert [m["submission_id"] for m in index.query(copy, exclude=5)] == [rows[1].id]
+    assert index.synced_max_id == 5 and index.sync(session_factory) == 0
+    db.close()
+
+
+def test_sync_rereads_ids_that_committed_after_a_higher_one(session_factory):
+    db = session_factory()
+    # Id 2 was allocated before id 3 but its transaction commits after the first sync
+    db.add_all([Submission(id=i, text=essay(i), task_type="argument", question_number=1) for i in (1, 3)])
+    db.commit()
+
+    index = MinHashIndex()
+    assert index.sync(session_factory) == 2 and index.synced_max_id == 3
+    db.add(Submission(id=2, text=essay(2), task_type="argument", question_number=1))
+    db.commit()
+
+    assert index.sync(session_factory) == 1
+    assert index.query(essay(2))[0]["submission_id"] == 2
+    db.close()
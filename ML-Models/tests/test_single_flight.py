@@ -0,0 +1,60 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+from app.single_flight import SingleFlight, COALESCED_REQUESTS
+
+
+def run_concurrently(flight, keys, func):
+    with ThreadPoolExecutor(max_workers=len(keys)) as pool:
+        futures = [pool.submit(flight.do, key, func) for key in keys]
+        return [future.result() for future in futures]
+
+
+def test_identical_keys_share_one_computation():
+    flight = SingleFlight("test_shared")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)  # long enough for every caller to join the flight
+        return {"band": 7.0}
+
+    results = run_concurrently(flight, ["essay"] * 8, compute)
+
+    assert len(calls) == 1
+    assert all(result == {"band": 7.0} for result, _ in results)
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert COALESCED_REQUESTS.value(flight="test_shared", role="follower") == 7
+    assert COALESCED_REQUESTS.value(flight="test_shared", role="leader") == 1
+    assert flight.inflight() == 0
+
+
+def test_distinct_keys_run_independently():
+    flight = SingleFlight("test_distinct")
+    barrier = threading.Barrier(2, timeout=5)
+
+    def compute():
+        barrier.wait()  # deadlocks if the two keys were serialized
+        return "done"
+
+    results = run_concurrently(flight, ["a", "b"], compute)
+    assert [shared for _, shared in results] == [False, False]
+
+
+def test_errors_reach_every_waiter_and_clear_the_key():
+    flight = SingleFlight("test_errors")
+
+    def fail():
+        time.sleep(0.1)
+        raise RuntimeError("analyzer crashed")
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(flight.do, "essay", fail) for _ in range(3)]
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
+
+    # The next call starts a fresh computation
+    assert flight.do("essay", lambda: "recovered") == ("recovered", False)
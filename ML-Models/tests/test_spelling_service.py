@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from app.services.spelling_service import (
+    SpellingIndex, SpellingService, build_index, edit_distance, index_fingerprint, read_wordlist,
+)
+
+WORDS = {
+    "receive": 900, "believe": 800, "government": 700, "environment": 650, "the": 5000, "should": 1200,
+    "invest": 300, "in": 4000, "public": 600, "transport": 500, "their": 1000, "there": 1100,
+    "people": 1500, "a": 6000, "lot": 400, "of": 5500, "believed": 100, "relieve": 50,
+}
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    wordlist = tmp_path / "words.txt"
+    wordlist.write_text("\n".join(f"{word} {count}" for word, count in WORDS.items()), encoding="utf-8")
+    path = str(tmp_path / "spelling.idx")
+    build_index(read_wordlist(str(wordlist)), path)
+    return path
+
+
+def test_lookup_through_the_memory_map(index_path):
+    index = SpellingIndex(index_path)
+    assert isinstance(index.delete_hash, np.memmap)
+    assert "government" in index and "goverment" not in index
+    assert index.frequency("people") == 1500
+
+    assert index.suggest("goverment")[0] == ("government", 1)
+    assert index.suggest("recieve")[0] == ("receive", 1)  # transposition is one edit
+    # Closest first, then the more frequent word
+    assert index.suggest("beleive") == [("believe", 1), ("receive", 2), ("believed", 2), ("relieve", 2)]
+    assert index.suggest("xylophone") == []
+    assert index_fingerprint(index_path) == index.fingerprint
+
+
+def test_edit_distance_stops_at_the_limit():
+    assert edit_distance("recieve", "receive", 2) == 1
+    assert edit_distance("kitten", "sitting", 3) == 3
+    assert edit_distance("a", "abcdef", 2) == 3
+
+
+def test_spelling_matches_feed_error_categories(index_path, make_grammar_service):
+    service = make_grammar_service(spelling_index=SpellingIndex(index_path))
+    text = "People should invest in public transport. The goverment should beleive in London alot"
+
+    result = service.score_matches(text, service._with_spelling(text, service._heuristic_check(text)))
+    typos = {text[e["offset"]:e["offset"] + e["length"]]: e for e in result["errors"]
+             if e["rule_id"] == "SYMSPELL_SPELLING"}
+
+    assert set(typos) == {"goverment", "beleive"}  # "London" looks like a name
+    assert typos["goverment"]["suggestion"] == "government"
+    assert typos["goverment"]["sentence_id"] == 1
+    # "alot" is reported once, by the fast rule that already covers it
+    assert [e["rule_id"] for e in result["errors"]].count("FAST_ALOT") == 1
+    assert result["error_categories"]["TYPOS"] == 3
+
+
+
+def test_sentence_initial_words_are_checked(index_path):
+    service = SpellingService(SpellingIndex(index_path))
+    text = "Goverment should invest. \u201cBeleive in London,\u201d people believe.\nRecieve a lot of NATO in Oxford"
+
+    flagged = {text[m["offset"]:m["offset"] + m["length"]]: m for m in service.check(text)}
+
+    # Capitalized only because they open a sentence, a quote or a line
+    assert set(flagged) == {"Goverment", "Beleive", "Recieve"}
+    assert flagged["Goverment"]["replacements"][0] == "government"
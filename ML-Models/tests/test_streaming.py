@@ -0,0 +1,136 @@
+import random
+from unittest.mock import patch
+
+import pytest
+import spacy
+from pydantic import ValidationError
+
+from app import config
+from app.schemas.submission import SubmissionCreate
+from app.services.CoherenceCohensionService import CoherenceCohesionService
+from app.services.lexical_service import LexicalCounts, LexicalService
+from app.streaming import TextTooLongError, iter_chunks, stream_docs
+
+WORDS = (
+    "the city however transport is a significant issue for residents and therefore many people "
+    "prefer cars in addition public services such as buses remain limited e.g. Mr. Smith U.S. "
+    "consequently governments should invest furthermore housing costs are rising"
+).split()
+
+
+def essay(seed, paragraphs=30, abbreviations=True):
+    rng = random.Random(seed)
+    # "a." and "e.g." are single tokens to spaCy, so they do not end a sentence
+    vocabulary = WORDS if abbreviations else [w for w in WORDS if "." not in w and len(w) > 1]
+
+    def sentence():
+        words = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(3, 25)))
+        return words.capitalize() + rng.choice([".", ".", "!", "?", '."'])
+
+    parts = []
+    for i in range(paragraphs):
+        paragraph = "Heading" if i % 9 == 0 else " ".join(sentence() for _ in range(rng.randint(1, 8)))
+        parts.append(paragraph + rng.choice(["", " "]) + rng.choice(["\n\n", "\n\n\n", "\n \n"]))
+    return "".join(parts)
+
+
+@pytest.fixture(scope="module")
+def nlp():
+    return spacy.blank("en")
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(config, "STREAM_CHUNK_CHARS", 300)
+
+
+@pytest.fixture
+def lexical(nlp):
+    with patch("app.services.lexical_service.load_spacy", return_value=nlp), patch("nltk.download"):
+        return LexicalService()
+
+
+@pytest.fixture
+def coherence(nlp):
+    with patch("app.services.CoherenceCohensionService.load_spacy", return_value=nlp), patch("nltk.download"):
+        return CoherenceCohesionService()
+
+
+def test_chunks_cover_the_text_and_end_at_paragraph_breaks():
+    text = essay(0)
+    chunks = list(iter_chunks(text, 300))
+
+    assert "".join(chunks) == text
+    assert len(chunks) > 10
+    assert all(len(chunk) <= 300 for chunk in chunks)
+
+
+def test_streamed_docs_match_the_full_doc(nlp, small_chunks):
+    sentencizer = spacy.pipeline.Sentencizer()
+    for seed in range(5):
+        text = essay(seed)
+        full = sentencizer(nlp.make_doc(text))
+        docs = list(stream_docs(nlp, text, sentencizer))
+
+        assert len(docs) > 1
+        assert [t.text for doc in docs for t in doc] == [t.text for t in full]
+        assert [s.text for doc in docs for s in doc.sents] == [s.text for s in full.sents]
+
+
+def test_streamed_lexical_analysis_is_identical(lexical, small_chunks):
+    for seed in range(3):
+        text = essay(seed)
+        assert lexical.analyze_lexical(text, mode="fast", stream=True) == \
+            lexical.analyze_lexical(text, mode="fast", stream=False)
+
+
+def test_whole_text_lexical_analysis_walks_the_doc_once(lexical):
+    with patch.object(LexicalCounts, "add", autospec=True, side_effect=LexicalCounts.add) as add:
+        lexical.analyze_lexical(essay(0), mode="fast", stream=False)
+    assert add.call_count == 1
+
+
+@pytest.mark.parametrize("mode", ["fast", "full"])
+def test_streamed_coherence_analysis_is_identical(coherence, small_chunks, mode):
+    if mode == "full":
+        coherence.nlp = spacy.blank("en")
+        coherence.nlp.add_pipe("sentencizer")
+    # nlp.pipe chunks carry no state across cuts, so an abbreviation at a cut
+    # could start a sentence there; the tokenizer-only mode handles that too
+    text = essay(1, abbreviations=mode == "fast")
+    assert coherence.analyze_coherence_cohesion(text, mode=mode, stream=True) == \
+        coherence.analyze_coherence_cohesion(text, mode=mode, stream=False)
+
+
+def test_long_texts_stream_by_default(lexical, monkeypatch):
+    monkeypatch.setattr(config, "STREAM_THRESHOLD_CHARS", 1000)
+    text = essay(2)
+    with patch("app.services.lexical_service.streaming.stream_docs", wraps=stream_docs) as streamed:
+        lexical.analyze_lexical(text, mode="fast")
+        lexical.analyze_lexical(text[:900], mode="fast")
+    assert streamed.call_count == 1
+
+
+def test_only_fast_mode_streams_by_default(coherence, monkeypatch):
+    monkeypatch.setattr(config, "STREAM_THRESHOLD_CHARS", 1000)
+    coherence.nlp = spacy.blank("en")
+    coherence.nlp.add_pipe("sentencizer")
+    text = essay(2)
+    with patch("app.services.CoherenceCohensionService.streaming.stream_docs", wraps=stream_docs) as streamed:
+        coherence.analyze_coherence_cohesion(text, mode="full")
+        assert streamed.call_count == 0
+        coherence.analyze_coherence_cohesion(text, mode="fast")
+        assert streamed.call_count == 1
+
+
+def test_texts_over_the_cap_are_rejected(lexical, coherence, monkeypatch):
+    monkeypatch.setattr(config, "MAX_TEXT_CHARS", 1000)
+    text = essay(3)
+    with pytest.raises(TextTooLongError):
+        lexical.analyze_lexical(text, mode="fast")
+    with pytest.raises(TextTooLongError):
+        coherence.analyze_coherence_cohesion(text, mode="fast")
+
+    limit = SubmissionCreate.model_fields["text"].metadata[0].max_length
+    with pytest.raises(ValidationError):
+        SubmissionCreate(text="x" * (limit + 1), task_type="Task 2", question_number=1)
@@ -0,0 +1,117 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app import config
+from app.batching import MicroBatcher
+from app.services.taskachievement_service import TaskAchievementService, _cosine, pool_scores, split_windows
+from app.signals import SubmissionSignals, collecting
+
+TOPICS = ["transport", "housing", "health"]
+
+
+def topic_vector(text):
+    """Toy encoder: counts of each topic word, so similarity tracks what a window is about"""
+    words = text.lower().split()
+    return np.array([words.count(topic) for topic in TOPICS] + [1.0], dtype=np.float32)
+
+
+@pytest.fixture
+def service():
+    batches = []
+
+    def encode_batch(texts, group=None):
+        batches.append(list(texts))
+        return [topic_vector(text) for text in texts]
+
+    def classify_batch(texts, group):
+        labels, _ = group
+        batches.append(list(texts))
+        return [
+            {"labels": list(labels), "scores": [min(1.0, text.count(label) / 5) for label in labels]}
+            for text in texts
+        ]
+
+    service = TaskAchievementService.__new__(TaskAchievementService)
+    service.encoder = MicroBatcher("test_encode", encode_batch, max_wait_ms=0)
+    service.classifier = MicroBatcher("test_zero_shot", classify_batch, max_wait_ms=0)
+    service.task_requirements = {"argument": {"elements": ["transport", "health"]}}
+    service.batches = batches
+    return service
+
+
+def test_windows_overlap_and_cover_the_essay():
+    text = " ".join(f"w{i}" for i in range(400))
+    spans = split_windows(text, 160, overlap=0.25)
+    windows = [text[start:end].split() for start, end in spans]
+
+    assert [len(w) for w in windows] == [160, 160, 160]
+    assert windows[0][-40:] == windows[1][:40]  # a quarter of each window repeats in the next
+    assert windows[-1][-1] == "w399"
+    assert split_windows("short essay", 160) == [(0, len("short essay"))]
+    assert pool_scores([0.2, 0.8], "mean") == 0.5 and pool_scores([0.2, 0.8], "max") == 0.8
+    with pytest.raises(ValueError):
+        pool_scores([0.2], "median")
+
+
+def test_question_similarity_covers_the_whole_essay(service, monkeypatch):
+    monkeypatch.setattr(config, "ENCODE_WINDOW_WORDS", 50)
+    monkeypatch.setattr(config, "ZERO_SHOT_WINDOW_WORDS", 50)
+    # The introduction is on transport; the rest of the essay is about housing
+    text = " ".join(["transport"] * 50 + ["housing"] * 150)
+
+    result = service._analyze_topic_relevance(text, "argument", question_desc="housing housing", mode="full")
+
+    similarities = result["window_scores"]["question_similarity"]
+    assert len(similarities) == 6
+    assert all(len(text[w["start"]:w["end"]].split()) == 50 for w in similarities)
+    assert similarities[0]["score"] < similarities[-1]["score"]
+    # Mean pooling: the housing windows dominate, unlike a truncated intro-only encode
+    assert result["question_similarity"] == pytest.approx(np.mean([w["score"] for w in similarities]))
+    assert result["question_similarity"] > 0.6
+    # Max pooling finds an element that appears in one window only
+    assert result["element_scores"]["transport"] == 1.0
+    # All zero-shot windows went out as one batch, the encode windows plus the question as another
+    assert [len(batch) for batch in service.batches] == [6, 7]
+
+
+def test_windows_are_recorded_and_replayed(service, monkeypatch):
+    monkeypatch.setattr(config, "ZERO_SHOT_WINDOW_WORDS", 50)
+    text = " ".join(["health"] * 120)
+    signals = SubmissionSignals()
+    with collecting(signals):
+        first = service._zero_shot_element_scores(text, ["health", "transport"])
+    replay = SubmissionSignals.from_row(signals.to_columns())
+    with collecting(replay):
+        second = service._zero_shot_element_scores(text, ["health", "transport"])
+
+    assert first["scores"] == second["scores"] == [1.0, 0.0]
+    assert len(service.batches) == 1
+
+
+class FakeDoc:
+    """Question parse with noun chunks; its 300-d word vectors must never meet the encoder's"""
+
+    def __init__(self, text):
+        self.text = text
+        self.noun_chunks = [
+            SimpleNamespace(text=word, root=SimpleNamespace(is_stop=False)) for word in text.split() if word in TOPICS
+        ]
+        self.sents = [SimpleNamespace(text=text, vector=np.ones(300, dtype=np.float32))]
+
+
+def test_question_alignment_compares_phrases_in_the_encoder_space(service, monkeypatch):
+    monkeypatch.setattr(config, "ENCODE_WINDOW_WORDS", 50)
+    service.nlp = FakeDoc
+    text = " ".join(["housing"] * 50 + ["transport"] * 50)
+
+    result = service._analyze_question_alignment(text, question_desc="transport and health")
+
+    assert result["addressed_elements"] == ["transport"] and result["missing_elements"] == ["health"]
+    assert result["total_elements"] == 2  # not the error fallback
+    windows = [topic_vector(window) for window in service._windows(text, 50)[0]]
+    best = [max(_cosine(topic_vector(phrase), w) for w in windows) for phrase in ("transport", "health")]
+    assert result["overall_score"] == pytest.approx(0.5 + 0.5 * np.mean(best))
+    assert result["overall_score"] > 0.6
+    assert 0 < result["semantic_similarity"] < 1
@@ -229,6 +229,23 @@ class TestTaskAchievementService:
         assert isinstance(result["addressed_elements"], list)
         assert isinstance(result["missing_elements"], list)
 
+    def test_fast_mode_skips_transformers(self, task_service, sample_submission):
+        """Fast mode scores elements and question overlap without MiniLM or zero-shot."""
+        task_service.nlp = spacy.blank("en")
+
+        result = task_service.analyze_task_achievement(
+            text=sample_submission.text,
+            task_type=sample_submission.task_type,
+            question_desc=sample_submission.question_desc,
+            mode="fast"
+        )
+
+        task_service.text_classifier.assert_not_called()
+        task_service.semantic_model.encode.assert_not_called()
+        assert result["topic_relevance"]["element_scores"]["position"] > 0  # "I believe"
+        assert "education" in result["question_alignment"]["addressed_elements"]
+        assert 1 <= result["band_score"] <= 9
+
     def test_check_word_count(self, task_service, mock_nlp):
         """Test word count checking functionality."""
         # Mock document with 5 tokens (defined in fixture)
@@ -400,21 +417,19 @@ class TestTaskAchievementService:
             assert len(result["task_achievement_feedback"]["improvements"]) > 0
             assert len(result["task_achievement_feedback"]["strengths"]) == 0
 
-    @patch("sklearn.metrics.pairwise.cosine_similarity")
-    def test_semantic_similarity_calculation(self, mock_cosine, task_service):
+    def test_semantic_similarity_calculation(self, task_service):
         """Test semantic similarity calculation in question alignment."""
-        mock_cosine.return_value = np.array([[0.75]])
-
         text = "Education is important for society's development."
         question = "Discuss the role of education in society."
 
-        # Mock the encode method to return 1D arrays as the actual implementation expects
-        with patch.object(task_service.semantic_model, "encode", side_effect=[
-            np.array([0.1, 0.2, 0.3]),  # 1D array for text
-            np.array([0.2, 0.3, 0.4])   # 1D array for question
-        ]):
+        # Key phrases, text windows and question are encoded together in one batched
+        # call, and every comparison stays in the encoder's space
+        with patch.object(task_service.semantic_model, "encode", return_value=np.array([
+            [0.1, 0.2, 0.3],  # key phrase from the mocked noun chunks
+            [0.2, 0.3, 0.4],  # text
+            [0.3, 0.4, 0.5],  # question
+        ])) as mock_encode:
             analysis = task_service._analyze_question_alignment(text, question)
             assert "overall_score" in analysis
-            assert analysis["overall_score"] > 0
-            # The mock should now be called since we'll properly reshape the 1D arrays to 2D
-            mock_cosine.assert_called_once()
\ No newline at end of file
+            assert analysis["overall_score"] > 0.5
+            mock_encode.assert_called_once()
\ No newline at end of file